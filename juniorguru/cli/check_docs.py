@@ -1,10 +1,10 @@
 from pathlib import Path
 
 import click
-from lxml import html
 
 from juniorguru.cli.web import build as build_web
 from juniorguru.lib import loggers
+from juniorguru.lib.site_index import SiteIndex
 
 
 logger = loggers.from_path(__file__)
@@ -36,18 +36,12 @@ def main(context, output_path, build):
     targets = set()
     static = set()
 
-    for doc_path in output_path.glob("**/*.html"):
-        logger.info(f"Reading {doc_path}")
+    for doc_path, entry in SiteIndex(output_path).build():
         doc_name = get_doc_name(output_path, doc_path)
         targets.add(doc_name)
-
-        html_tree = html.fromstring(doc_path.read_bytes())
-        for element in html_tree.cssselect("a[name]"):
-            targets.add(f"{doc_name}#{element.get('name')}")
-        for element in html_tree.cssselect("*[id]"):
-            targets.add(f"{doc_name}#{element.get('id')}")
-        for element in html_tree.cssselect("a[href]"):
-            href = element.get("href")
+        targets.update(f"{doc_name}#{name}" for name in entry["names"])
+        targets.update(f"{doc_name}#{id}" for id in entry["ids"])
+        for href in entry["links"]:
             try:
                 links.append((doc_name, normalize_link(output_path, doc_path, href)))
             except StaticFileLinkError:
@@ -56,8 +50,7 @@ def main(context, output_path, build):
                 )
             except ValueError:
                 pass  # logger.debug(f'Skipping: {href}')
-        for element in html_tree.cssselect("img[src]"):
-            src = element.get("data-src", element.get("src"))
+        for src in entry["images"]:
             try:
                 static.add(
                     (doc_name, normalize_static_link(output_path, doc_path, src))
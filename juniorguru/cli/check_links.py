@@ -1,11 +1,24 @@
+import asyncio
+import random
 import re
 import time
+from collections import defaultdict
+from datetime import timedelta
+from fnmatch import fnmatch
 from pathlib import Path
-from subprocess import PIPE, Popen
+from urllib.parse import urldefrag, urlparse
 
 import click
+import httpx
+from diskcache import Cache
 
+from juniorguru.cli.check_docs import get_doc_name
 from juniorguru.cli.web import build as build_web
+from juniorguru.lib import loggers
+from juniorguru.lib.async_utils import call_async
+from juniorguru.lib.cache import CACHE_DIR, get_cache
+from juniorguru.lib.cli import async_command
+from juniorguru.lib.site_index import SiteIndex
 
 
 USER_AGENT = (
@@ -13,129 +26,327 @@ USER_AGENT = (
     "Gecko/20100101 Firefox/117.0"
 )
 
+CHECK_LINKS_CACHE_DIR = Path(CACHE_DIR) / "check-links"
+
+MAX_CONNECTIONS = 20
+
+MAX_CONNECTIONS_PER_HOST = 2
+
+# Minimum delay between starting two requests to the same host
+HOST_DELAY = 1
+
+# https://www.python-httpx.org/advanced/timeouts/
+REQUEST_TIMEOUT = httpx.Timeout(15, connect=5)
+
+RETRIES = 3
+
+RETRY_DELAY = 5
+
+# Healthy links get checked again after this period, give or take a few
+# days, so that they don't all expire in the same night. Failed links
+# aren't remembered at all, so every run requests them again.
+HEALTHY_EXPIRE = timedelta(days=14)
+
+HEALTHY_EXPIRE_JITTER = timedelta(days=7)
+
+
+class Rule:
+    def __init__(self, pattern: str, note: str):
+        self.pattern = pattern
+        self.note = note
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.pattern!r}, {self.note!r})"
+
+
+class UrlRule(Rule):
+    """Links matching the pattern don't get checked at all"""
+
+    def matches(self, url: str) -> bool:
+        return fnmatch(url, f"*{self.pattern}*")
+
+
+class ReasonRule(Rule):
+    """Links failing for a reason matching the pattern only produce a warning"""
+
+    def __init__(self, pattern: str, note: str):
+        super().__init__(pattern, note)
+        self.pattern_re = re.compile(pattern)
+
+    def matches(self, reason: str) -> bool:
+        return bool(self.pattern_re.search(reason))
+
+
 EXCLUDE_URLS = [
-    "*static/*.*",  # local links to static files
-    "*.jobs.cz/rpd/*",  # expired job posts
-    "facebook.com/search/",  # HTTP_404 in response if user isn't logged in
-    "juniorguru.memberful.com",  # HTTP_403, rightfully
-    "support.discord.com",  # Discord ¯\_(ツ)_/¯
-    "economist.com",  # crawling protection?
-    "udemy.com",  # crawling protection?
-    "att.jobs",  # crawling protection?
-    "csob.cz",  # crawling protection?
-    "fiverr.com",  # crawling protection?
-    "twitter.com",  # crawling protection?
-    "upwork.com",  # crawling protection?
-    "docs.github.com",  # crawling protection?
-    "make.com",  # crawling protection?
-    "italki.com",  # crawling protection?
-    "glassdoor.com",  # crawling protection?
-    "oracle.com",  # crawling protection?
-    "open.spotify.com",  # crawling protection?
-    "startupjobs.cz/nabidka/",  # crawling protection?
-    "datacamp.com",  # crawling protection?
-    "meetup.com",  # crawling protection?
-    "navolnenoze.cz",  # crawling protection?
-    "robime.it",  # crawling protection?
-    "reddit.com",  # crawling protection?
-    "imysleni.cz",  # crawling protection?
+    UrlRule("*.jobs.cz/rpd/*", "expired job posts"),
+    UrlRule("facebook.com/search/", "HTTP_404 if user isn't logged in"),
+    UrlRule("juniorguru.memberful.com", "HTTP_403, rightfully"),
+    UrlRule("support.discord.com", "Discord ¯\\_(ツ)_/¯"),
+    UrlRule("economist.com", "crawling protection?"),
+    UrlRule("udemy.com", "crawling protection?"),
+    UrlRule("att.jobs", "crawling protection?"),
+    UrlRule("csob.cz", "crawling protection?"),
+    UrlRule("fiverr.com", "crawling protection?"),
+    UrlRule("twitter.com", "crawling protection?"),
+    UrlRule("upwork.com", "crawling protection?"),
+    UrlRule("docs.github.com", "crawling protection?"),
+    UrlRule("make.com", "crawling protection?"),
+    UrlRule("italki.com", "crawling protection?"),
+    UrlRule("glassdoor.com", "crawling protection?"),
+    UrlRule("oracle.com", "crawling protection?"),
+    UrlRule("open.spotify.com", "crawling protection?"),
+    UrlRule("startupjobs.cz/nabidka/", "crawling protection?"),
+    UrlRule("datacamp.com", "crawling protection?"),
+    UrlRule("meetup.com", "crawling protection?"),
+    UrlRule("navolnenoze.cz", "crawling protection?"),
+    UrlRule("robime.it", "crawling protection?"),
+    UrlRule("reddit.com", "crawling protection?"),
+    UrlRule("imysleni.cz", "crawling protection?"),
 ]
 
 EXCLUDE_REASONS = [
-    re.compile(r)
-    for r in [
-        r"^BLC_UNKNOWN$",  # crawling protection?
-        r"^ERRNO_EPROTO$",  # Czech TV website ¯\_(ツ)_/¯
-        r"^ERRNO_ENOTFOUND$",  # crawling protection? can't even find the domain name
-        r"^HTTP_999$",  # LinkedIn crawling protection
-        r"^HTTP_429$",  # Twitter crawling protection, also https://github.com/stevenvachon/broken-link-checker/issues/198
-        r"^HTTP_5\d\d$",  # server-side problem, can't do anything about that
-        r"HTTP_undefined",  # :notsureif:
-    ]
+    ReasonRule(r"^ERROR$", "crawling protection?"),
+    ReasonRule(r"^ERRNO_EPROTO$", "Czech TV website ¯\\_(ツ)_/¯"),
+    ReasonRule(r"^ERRNO_ENOTFOUND$", "can't even find the domain name"),
+    ReasonRule(r"^TIMEOUT$", "crawling protection? slow server?"),
+    ReasonRule(r"^HTTP_999$", "LinkedIn crawling protection"),
+    ReasonRule(r"^HTTP_429$", "crawling protection"),
+    ReasonRule(r"^HTTP_5\d\d$", "server-side problem, can't do anything about that"),
 ]
 
 
+logger = loggers.from_path(__file__)
+
+
 @click.command()
 @click.argument(
     "output_path", default="public", type=click.Path(exists=True, path_type=Path)
 )
 @click.option("--build/--no-build", default=True)
-@click.option("--retry/--no-retry", default=False)
+@click.option(
+    "--retry/--no-retry",
+    default=False,
+    help="Retry links which fail for a reason which might be temporary.",
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    default=True,
+    help="Check only links which are new or whose previous result expired.",
+)
 @click.pass_context
-def main(context, output_path, build, retry):
+def main(context, output_path, build, retry, use_cache):
     if build:
         context.invoke(build_web, output_path=output_path)
 
-    command = ["npx", "blcl"]
-    options = [
-        "--verbose",
-        "--follow",
-        "--recursive",
-        "--get",  # because some sites return strange codes in response to HEAD :(
-        f"--user-agent={USER_AGENT}",
-    ]
-
-    for url in EXCLUDE_URLS:
-        options.append(f"--exclude={url}")
-
-    # Internet is flaky... retrying 3 times makes us sure the problem is consistent
-    attempts = 1
-    if retry:
-        attempts = 3
-
-    broken = None
-    failed = 1
-    for attempt in range(attempts):
+    links = defaultdict(set)
+    for doc_path, entry in SiteIndex(output_path).build():
+        doc_name = get_doc_name(output_path, doc_path)
+        for url in get_external_urls(entry):
+            links[url].add(doc_name)
+    excluded_urls = [url for url in links if is_excluded_url(url)]
+    for url in excluded_urls:
+        del links[url]
+    logger.info(
+        f"Found {len(links)} external links to check, "
+        f"excluded {len(excluded_urls)} links"
+    )
+
+    results = check_links(links, retries=RETRIES if retry else 1, use_cache=use_cache)
+
+    warnings = []
+    errors = []
+    for url, reason in sorted(results.items()):
+        if reason is None:
+            continue
+        if is_excluded_reason(reason):
+            warnings.append((url, reason))
+        else:
+            errors.append((url, reason))
+
+    if warnings:
+        print()
+        print("Links not checked")
+        print("=" * 79)
+        for url, reason in warnings:
+            print(f"{reason}\t{url}")
+
+    if errors:
         print()
-        print(f"Attempt #{attempt + 1} of {attempts}")
+        print("Broken links")
         print("=" * 79)
-        broken = set()
-
-        with Popen(
-            command + options + [output_path],
-            stdout=PIPE,
-            bufsize=1,
-            universal_newlines=True,
-        ) as proc:
-            for line in proc.stdout:
-                print(line, end="")
-                if "BROKEN" in line:
-                    match = re.search(r"(http[^ \x1b]+)[^\(]+\(([^\)]+)\)", line)
-                    broken.add((match.group(1), match.group(2)))
-
-        failed = proc.returncode
-        if failed:
-            time.sleep(5)
+        for url, reason in errors:
+            print(f"{reason}\t{url}")
+            for doc_name in sorted(links[url]):
+                print(f"\t← {doc_name}")
+        raise click.Abort()
+
+
+@async_command
+async def check_links(
+    links: dict[str, set[str]], retries: int, use_cache: bool
+) -> dict[str, str | None]:
+    async with httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        follow_redirects=True,
+    ) as client:
+        checker = LinkChecker(client, retries=retries, use_cache=use_cache)
+        reasons = await asyncio.gather(*[checker.check(url) for url in links])
+    logger.info(str(checker.stats))
+    return dict(zip(links, reasons))
+
+
+class HostLimit:
+    def __init__(
+        self,
+        concurrency: int = MAX_CONNECTIONS_PER_HOST,
+        delay: float = HOST_DELAY,
+    ):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.lock = asyncio.Lock()
+        self.last_request_at = 0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            wait = self.last_request_at + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last_request_at = time.monotonic()
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+
+class CheckerStats:
+    def __init__(self):
+        self.cached = 0
+        self.healthy = 0
+        self.failed = 0
+        self.retried = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Links: {self.cached} cached, {self.healthy} healthy, "
+            f"{self.failed} failed, {self.retried} retries"
+        )
+
+
+class LinkChecker:
+    """
+    Checks external links, remembering the results
+
+    Each URL is requested with HEAD first, and if that doesn't succeed,
+    with GET, because some servers don't respond well to HEAD. Requests
+    to the same host are limited in number and spaced out. Healthy links
+    are remembered for a couple of weeks, so that only links which are new,
+    whose result expired, or which failed previously get requested.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        cache: Cache | None = None,
+        retries: int = 1,
+        retry_delay: float = RETRY_DELAY,
+        host_delay: float = HOST_DELAY,
+        use_cache: bool = True,
+    ):
+        self.client = client
+        self.cache = get_cache(str(CHECK_LINKS_CACHE_DIR)) if cache is None else cache
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.use_cache = use_cache
+        self.host_limits = defaultdict(lambda: HostLimit(delay=host_delay))
+        self.stats = CheckerStats()
+
+    async def check(self, url: str) -> str | None:
+        """Returns reason why the link is broken, or None if it's healthy"""
+        logger_c = logger["check"]
+        if self.use_cache:
+            result = await call_async(self.cache.get, url)
+            if result is not None and result["reason"] is None:
+                logger_c.debug(f"Cached {url}: OK")
+                self.stats.cached += 1
+                return None
+
+        for attempt in range(1, self.retries + 1):
+            reason = await self.fetch_reason(url)
+            if reason is None or not is_temporary_reason(reason):
+                break
+            if attempt < self.retries:
+                logger_c.debug(f"Retrying {url} ({reason}), attempt #{attempt}")
+                self.stats.retried += 1
+                await asyncio.sleep(self.retry_delay * attempt)
+
+        if reason is None:
+            logger_c.debug(f"Healthy {url}")
+            self.stats.healthy += 1
+            expire = HEALTHY_EXPIRE + random.random() * HEALTHY_EXPIRE_JITTER
+            await call_async(
+                self.cache.set,
+                url,
+                dict(reason=reason, checked_at=time.time()),
+                expire=expire.total_seconds(),
+                tag="check-links",
+            )
         else:
-            break
-
-    # https://github.com/stevenvachon/broken-link-checker/issues/169
-    if broken:
-        warnings = []
-        errors = []
-        for url, reason in broken:
-            relevant_list = None
-            for reason_re in EXCLUDE_REASONS:
-                if reason_re.search(reason):
-                    relevant_list = warnings
-                    break
-            if relevant_list is None:
-                relevant_list = errors
-            relevant_list.append((url, reason))
-
-        if warnings:
-            print()
-            print("Links not checked")
-            print("=" * 79)
-            for url, reason in warnings:
-                print(f"{reason}\t{url}")
-
-        if errors:
-            print()
-            print("Broken links")
-            print("=" * 79)
-            for url, reason in errors:
-                print(f"{reason}\t{url}")
-
-        if errors:
-            raise click.Abort()
+            logger_c.info(f"Failed {url}: {reason}")
+            self.stats.failed += 1
+            await call_async(self.cache.delete, url)
+        return reason
+
+    async def fetch_reason(self, url: str) -> str | None:
+        async with self.host_limits[urlparse(url).hostname]:
+            try:
+                response = await self.client.head(url)
+                if response.is_success:
+                    return None
+            except httpx.TimeoutException:
+                return "TIMEOUT"
+            except httpx.HTTPError:
+                pass
+            try:
+                async with self.client.stream("GET", url) as response:
+                    return None if response.is_success else get_reason(response)
+            except httpx.HTTPError as e:
+                return get_error_reason(e)
+
+
+def get_external_urls(entry: dict) -> set[str]:
+    urls = set()
+    for url in entry["links"] + entry["images"]:
+        if url and url.startswith(("http://", "https://")):
+            urls.add(urldefrag(url).url)
+    return urls
+
+
+def get_reason(response: httpx.Response) -> str:
+    return f"HTTP_{response.status_code}"
+
+
+def get_error_reason(error: httpx.HTTPError) -> str:
+    if isinstance(error, httpx.TimeoutException):
+        return "TIMEOUT"
+    if isinstance(error, httpx.ConnectError):
+        message = str(error).lower()
+        if "name or service not known" in message or "nodename nor servname" in message:
+            return "ERRNO_ENOTFOUND"
+        if "ssl" in message:
+            return "ERRNO_EPROTO"
+    return "ERROR"
+
+
+def is_temporary_reason(reason: str) -> bool:
+    return reason in ("TIMEOUT", "ERROR", "HTTP_429") or reason.startswith("HTTP_5")
+
+
+def is_excluded_url(url: str) -> bool:
+    return any(rule.matches(url) for rule in EXCLUDE_URLS)
+
+
+def is_excluded_reason(reason: str) -> bool:
+    return any(rule.matches(reason) for rule in EXCLUDE_REASONS)
@@ -1,21 +1,28 @@
 import filecmp
-import itertools
+import os
 import re
 import shutil
+import sqlite3
+from contextlib import closing
 from fnmatch import fnmatch
+from operator import itemgetter
 from pathlib import Path
 from pprint import pformat
-from sqlite3 import IntegrityError
+from time import perf_counter
+from typing import Generator
 
 import click
 from sqlite_utils import Database
-from sqlite_utils.db import NotFoundError, Table
+from sqlite_utils.db import Table
 
 from juniorguru.lib import loggers
+from juniorguru.lib.fingerprints import hash_file
 
 
 SNAPSHOT_FILE = ".persist-to-workspace-snapshot"
 
+SNAPSHOT_DB_DIR = ".persist-to-workspace-snapshot-db"
+
 PERSIST_DIR = "persist-to-workspace"
 
 SNAPSHOT_EXCLUDE = [
@@ -27,6 +34,7 @@ SNAPSHOT_EXCLUDE = [
     ".pytest_cache",
     ".vscode",
     SNAPSHOT_FILE,
+    SNAPSHOT_DB_DIR,
     PERSIST_DIR,
 ]
 
@@ -42,6 +50,21 @@ SCHEMA_TRANSFORMATIONS = {
 
 DIR_NOT_EMPTY_ERRNO = 39
 
+SOURCE_SCHEMA = "source"
+
+CHANGESET_SUFFIX = ".changeset"
+
+SCHEMA_SQL = (
+    "SELECT name, sql FROM {schema}.sqlite_master "
+    "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+)
+
+CONFLICTS_LIMIT = 10
+
+DISKCACHE_TIME_COLUMNS = ["store_time", "expire_time", "access_time"]
+
+DISKCACHE_VALUE_COLUMNS = ["tag", "size", "mode", "filename", "value"]
+
 
 logger = loggers.from_path(__file__)
 
@@ -61,11 +84,18 @@ def main():
 @main.command()
 @click.option("--file", default=SNAPSHOT_FILE, type=click.File(mode="w"))
 @click.option("--exclude", default=",".join(SNAPSHOT_EXCLUDE), type=CommaSeparated())
-def snapshot(file, exclude):
-    for path, mtime in take_snapshot(".", exclude=exclude):
+@click.option("--db-dir", default=SNAPSHOT_DB_DIR, type=click.Path(path_type=Path))
+@click.option("--hash/--no-hash", "use_hash", default=False)
+def snapshot(file, exclude, db_dir, use_hash):
+    shutil.rmtree(db_dir, ignore_errors=True)
+    for path, mtime, size in take_snapshot(".", exclude=exclude):
         logger.debug(path)
         assert " = " not in str(path)
-        file.write(f"{path} = {mtime}\n")
+        hash = hash_file(path) if use_hash else "-"
+        file.write(f"{path} = {mtime} {size} {hash}\n")
+        if path.suffix == ".db":
+            logger["db"].info(f"Backing up {path} to compare with it later")
+            backup_database(path, db_dir / path)
 
 
 @main.command()
@@ -78,26 +108,36 @@ def snapshot(file, exclude):
 @click.option(
     "--snapshot-exclude", default=",".join(SNAPSHOT_EXCLUDE), type=CommaSeparated()
 )
+@click.option(
+    "--snapshot-db-dir", default=SNAPSHOT_DB_DIR, type=click.Path(path_type=Path)
+)
 @click.option("--move/--no-move", default=False)
 def persist(
-    persist_dir, namespace, snapshot_file, snapshot_exclude, persist_exclude, move
+    persist_dir,
+    namespace,
+    snapshot_file,
+    snapshot_exclude,
+    snapshot_db_dir,
+    persist_exclude,
+    move,
 ):
     shutil.rmtree(persist_dir, ignore_errors=True)
     namespace_dir = persist_dir / namespace
     namespace_dir.mkdir(parents=True)
-    snapshot = {
-        Path(path): float(mtime)
-        for path, mtime in (line.split(" = ") for line in snapshot_file)
-    }
-    for path, mtime in take_snapshot(".", exclude=snapshot_exclude):
+    snapshot = dict(parse_snapshot_line(line) for line in snapshot_file)
+    for path, mtime, size in take_snapshot(".", exclude=snapshot_exclude):
         if any(fnmatch(path.name, pattern) for pattern in persist_exclude):
             logger.debug(f"Excluding {path}")
         elif path not in snapshot:
             logger["new"].info(path)
             persist_file(".", path, namespace_dir, move=move)
-        elif mtime > snapshot[path]:
+        elif is_modified(path, mtime, size, *snapshot[path]):
             logger["mod"].info(path)
-            persist_file(".", path, namespace_dir, move=move)
+            baseline_path = snapshot_db_dir / path
+            if path.suffix == ".db" and baseline_path.exists():
+                persist_changeset(path, baseline_path, namespace_dir)
+            else:
+                persist_file(".", path, namespace_dir, move=move)
     for path in (path for path in persist_dir.glob("**/*") if path.is_file()):
         logger.info(path)
 
@@ -118,18 +158,52 @@ def load(persist_dir, move, exclude):
         shutil.rmtree(persist_dir)
 
 
-def take_snapshot(dir, exclude=None):
-    exclude = [
-        (f"{pattern.rstrip('/')}/**/*" if Path(pattern).is_dir() else pattern)
-        for pattern in (exclude or [])
-    ]
-    excluded = itertools.chain.from_iterable(
-        Path(dir).glob(pattern) for pattern in exclude
-    )
-    included = Path(dir).glob("**/*")
-    for path in set(included) - set(excluded):
-        if path.is_file():
-            yield path.relative_to(dir), path.stat().st_mtime
+def take_snapshot(
+    dir: str | Path, exclude: list[str] | None = None
+) -> Generator[tuple[Path, float, int], None, None]:
+    """
+    Yields relative paths of all files in the directory, with their mtimes and sizes
+
+    Directories matching any of the exclude patterns are pruned, i.e.
+    the walk doesn't descend into them at all.
+    """
+    exclude = [pattern.rstrip("/") for pattern in (exclude or [])]
+    dirs = [(Path(dir), "")]
+    while dirs:
+        dir_path, prefix = dirs.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                relative_path = f"{prefix}{entry.name}"
+                if any(fnmatch(relative_path, pattern) for pattern in exclude):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append((entry.path, f"{relative_path}/"))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    yield Path(relative_path), stat.st_mtime, stat.st_size
+
+
+def parse_snapshot_line(line: str) -> tuple[Path, tuple[float, int, str | None]]:
+    path, value = line.rstrip("\n").split(" = ")
+    mtime, size, hash = value.split(" ")
+    return Path(path), (float(mtime), int(size), None if hash == "-" else hash)
+
+
+def is_modified(
+    path: Path,
+    mtime: float,
+    size: int,
+    snapshot_mtime: float,
+    snapshot_size: int,
+    snapshot_hash: str | None,
+) -> bool:
+    if size != snapshot_size:
+        return True
+    if mtime == snapshot_mtime:
+        return False
+    if snapshot_hash:
+        return hash_file(path) != snapshot_hash
+    return True
 
 
 def persist_file(source_dir, source_path, persist_dir, move=False):
@@ -140,11 +214,30 @@ def persist_file(source_dir, source_path, persist_dir, move=False):
     (shutil.move if move else shutil.copy2)(source_path, persist_path)
 
 
+def persist_changeset(source_path: Path, baseline_path: Path, persist_dir: Path):
+    changeset_path = persist_dir / f"{source_path}{CHANGESET_SUFFIX}"
+    changeset_path.parent.mkdir(parents=True, exist_ok=True)
+    create_changeset(source_path, baseline_path, changeset_path)
+
+
 def load_file(persist_dir, persist_path, source_dir, move=False):
     persist_size = persist_path.stat().st_size
     source_path = source_dir / persist_path.relative_to(persist_dir)
     source_path.parent.mkdir(parents=True, exist_ok=True)
-    if source_path.exists():
+    if source_path.suffix == CHANGESET_SUFFIX:
+        source_path = source_path.with_suffix("")
+        if not source_path.exists():
+            raise RuntimeError(
+                f"Unable to apply {persist_path}, {source_path} doesn't exist"
+            )
+        logger.info(
+            f"Merging {source_path} ({source_path.stat().st_size}b)"
+            f" with changes from {persist_path} ({persist_size}b)"
+        )
+        merge_databases(persist_path, source_path)
+        if move:
+            persist_path.unlink()
+    elif source_path.exists():
         source_size = source_path.stat().st_size
         if filecmp.cmp(persist_path, source_path, shallow=False):
             logger.info(
@@ -170,6 +263,55 @@ def load_file(persist_dir, persist_path, source_dir, move=False):
         (shutil.move if move else shutil.copy2)(persist_path, source_path)
 
 
+def backup_database(path: Path, backup_path: Path):
+    backup_path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(path)) as conn:
+        with closing(sqlite3.connect(backup_path)) as backup_conn:
+            conn.backup(backup_conn)
+
+
+def create_changeset(path: Path, baseline_path: Path, changeset_path: Path) -> int:
+    """
+    Creates a database with rows which have been written since the baseline
+
+    Tables which are new or have a changed schema are copied whole, other
+    tables get only rows which are new or differ from rows in the baseline.
+    Tables without any such rows are left out. The changeset can be then
+    merged to a database with the baseline data the same way as the whole
+    database could be.
+    """
+    changeset_path.unlink(missing_ok=True)
+    with closing(sqlite3.connect(changeset_path, isolation_level=None)) as conn:
+        conn.execute("ATTACH DATABASE ? AS current", [str(path)])
+        conn.execute("ATTACH DATABASE ? AS baseline", [str(baseline_path)])
+        baseline_schema = dict(conn.execute(SCHEMA_SQL.format(schema="baseline")))
+        rows_count = 0
+        conn.execute("BEGIN")
+        for name, sql in conn.execute(SCHEMA_SQL.format(schema="current")).fetchall():
+            conn.execute(sql)
+            insert_sql = (
+                f"INSERT INTO main.{quote(name)} SELECT * FROM current.{quote(name)}"
+            )
+            is_unchanged_schema = baseline_schema.get(name) == sql
+            if is_unchanged_schema:
+                insert_sql += f" EXCEPT SELECT * FROM baseline.{quote(name)}"
+            count = conn.execute(insert_sql).rowcount
+            if is_unchanged_schema and not count:
+                conn.execute(f"DROP TABLE main.{quote(name)}")
+                continue
+            logger["db"][name].debug(f"Changeset of {path} has {count} rows")
+            rows_count += count
+            indexes_sql = (
+                "SELECT sql FROM current.sqlite_master "
+                "WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL"
+            )
+            for (index_sql,) in conn.execute(indexes_sql, [name]).fetchall():
+                conn.execute(index_sql)
+        conn.execute("COMMIT")
+    logger["db"].info(f"Changeset of {path} has {rows_count} rows")
+    return rows_count
+
+
 def prepare_database_for_moving(path: Path):
     db = Database(path)
     db.disable_wal()
@@ -186,24 +328,54 @@ def merge_databases(path_from: Path, path_to: Path):
     logger["db"].info("Applying schema")
     db_to.executescript(make_schema_idempotent(db_from.schema))
 
-    for table_from in db_from.tables:
-        name = table_from.name
-        table_to = db_to[name]
-        if not table_to.exists():
-            raise RuntimeError(f"Table {name} should already exist!")
-        logger["db"][name].info(
-            f"Tables have {table_from.count} and {table_to.count} rows before merge"
-        )
+    # The source database gets attached to the target one, so that each
+    # table can be merged by a single set-based statement, and everything
+    # happens inside one transaction
+    db_to.execute(f"ATTACH DATABASE ? AS {SOURCE_SCHEMA}", [str(path_from)])
+    report = []
+    try:
+        db_to.execute("BEGIN")
+        for table_from in db_from.tables:
+            name = table_from.name
+            table_to = db_to[name]
+            if not table_to.exists():
+                raise RuntimeError(f"Table {name} should already exist!")
+            count_before = table_to.count
+            logger["db"][name].info(
+                f"Tables have {table_from.count} and {count_before} rows before merge"
+            )
 
-        if is_diskcache(table_from):
-            logger["db"][name].info("Detected DiskCache")
-            merge_diskcaches(table_from, table_to)
-        elif is_diskcache_settings(table_from):
-            logger["db"][name].info("Detected DiskCache settings")
-            merge_diskcache_settings(table_from, table_to)
-        else:
-            merge_tables(table_from, table_to)
-        logger["db"][name].info(f"Table has {table_to.count} rows after merge")
+            time_start = perf_counter()
+            if is_diskcache(table_from):
+                logger["db"][name].info("Detected DiskCache")
+                changes = merge_diskcaches(db_to, table_from, table_to)
+            elif is_diskcache_settings(table_from):
+                logger["db"][name].info("Detected DiskCache settings")
+                changes = merge_diskcache_settings(db_to, table_from, table_to)
+            else:
+                changes = merge_tables(db_to, table_from, table_to)
+            time = perf_counter() - time_start
+
+            count_after = table_to.count
+            logger["db"][name].info(f"Table has {count_after} rows after merge")
+            report.append((name, count_before, count_after, changes, time))
+        db_to.conn.commit()
+    except BaseException:
+        db_to.conn.rollback()
+        raise
+    finally:
+        db_to.execute(f"DETACH DATABASE {SOURCE_SCHEMA}")
+
+    for name, count_before, count_after, changes, time in sorted(
+        report, key=itemgetter(4), reverse=True
+    ):
+        logger["db"]["report"].info(
+            f"{name}: {count_before} → {count_after} rows, "
+            f"{changes} changes, {time:.3f}s"
+        )
+    logger["db"]["report"].info(
+        f"Merged {len(report)} tables in {sum(item[4] for item in report):.3f}s"
+    )
 
     # flush changes to disk, close all transactions
     db_to.close()
@@ -212,50 +384,79 @@ def merge_databases(path_from: Path, path_to: Path):
     Database(path_to).vacuum()
 
 
-def get_row_updates(row_from, row_to) -> dict:
-    if frozenset(row_from.keys()) != frozenset(row_to.keys()):
+def merge_tables(db: Database, table_from: Table, table_to: Table) -> int:
+    """
+    Merges table from the attached source database to the same table in the target
+
+    New rows get inserted. Existing rows only get their NULL values filled,
+    and if the tables have a different non-NULL value in the same column,
+    it's a conflict.
+    """
+    name = table_from.name
+    columns = list(table_from.columns_dict.keys())
+    if frozenset(columns) != frozenset(table_to.columns_dict.keys()):
         raise ValueError(
-            f"Rows don't match! {list(row_from.keys())!r} ≠ {list(row_to.keys())!r}"
+            f"Tables don't match! {columns!r} ≠ {list(table_to.columns_dict.keys())!r}"
         )
-    updates = {}
-    for column_name, value_from in row_from.items():
-        if value_from is not None:
-            value_to = row_to[column_name]
-            if value_to is None:
-                updates[column_name] = value_from
-            elif value_from != value_to:
-                raise RuntimeError(
-                    f"Conflict in column {column_name!r}! Values would be overwritten\n{pformat(row_from)}\n{pformat(row_to)}"
-                )
-    return updates
+    if table_from.use_rowid:
+        raise KeyError(f"Primary key not found in table {name!r}")
 
+    conflicts = db.execute(get_conflicts_sql(name, columns, table_from.pks))
+    if conflicts := conflicts.fetchall():
+        logger["db"][name].error(
+            "Conflicts found! This typically happens if two parallel scripts write values to the same column. Instead add a new column or a new 1:1 table"
+        )
+        raise RuntimeError(
+            f"Conflict in table {name!r}! Values would be overwritten\n{pformat(conflicts)}"
+        )
+    return db.execute(get_merge_sql(name, columns, table_from.pks)).rowcount
 
-def merge_tables(table_from: Table, table_to: Table):
-    logger_t = logger["db"][table_from.name]
 
-    for row_from in table_from.rows:
-        try:
-            pks = [row_from[pk] for pk in table_from.pks]
-        except KeyError:
-            raise KeyError(
-                f"Primary key {table_from.pks!r} not found in row:\n{pformat(row_from)}"
-            )
-        try:
-            row_to = table_to.get(pks)
-        except NotFoundError:
-            logger_t.debug(f"Inserting {pks!r}")
-            table_to.insert(row_from, pk=table_from.pks)
-        else:
-            try:
-                updates = get_row_updates(row_from, row_to)
-            except RuntimeError:
-                logger_t.error(
-                    "Conflicts found! This typically happens if two parallel scripts write values to the same column. Instead add a new column or a new 1:1 table"
-                )
-                raise
-            if updates:
-                logger_t.debug(f"Updating {pks!r} with {pformat(updates)}")
-                table_to.update(pks, updates)
+def get_conflicts_sql(name: str, columns: list[str], pks: list[str]) -> str:
+    join = " AND ".join(f"s.{quote(pk)} = m.{quote(pk)}" for pk in pks)
+    # Comparing NULL to anything results in NULL, so only non-NULL
+    # values which differ from each other are selected
+    where = " OR ".join(
+        f"s.{quote(column)} <> m.{quote(column)}"
+        for column in columns
+        if column not in pks
+    )
+    return (
+        f"SELECT s.* FROM {SOURCE_SCHEMA}.{quote(name)} AS s "
+        f"JOIN main.{quote(name)} AS m ON {join} "
+        f"WHERE {where or 'false'} LIMIT {CONFLICTS_LIMIT}"
+    )
+
+
+def get_merge_sql(name: str, columns: list[str], pks: list[str]) -> str:
+    updates = [column for column in columns if column not in pks]
+    if updates:
+        set_ = ", ".join(
+            f"{quote(column)} = coalesce({quote(column)}, excluded.{quote(column)})"
+            for column in updates
+        )
+        where = " OR ".join(
+            f"({quote(column)} IS NULL AND excluded.{quote(column)} IS NOT NULL)"
+            for column in updates
+        )
+        on_conflict = f"DO UPDATE SET {set_} WHERE {where}"
+    else:
+        on_conflict = "DO NOTHING"
+    return get_upsert_sql(name, columns, pks, on_conflict)
+
+
+def get_upsert_sql(
+    name: str, columns: list[str], conflict_columns: list[str], on_conflict: str
+) -> str:
+    columns_sql = ", ".join(map(quote, columns))
+    conflict_columns_sql = ", ".join(map(quote, conflict_columns))
+    # The 'WHERE true' is required to avoid a parsing ambiguity,
+    # see https://www.sqlite.org/lang_upsert.html
+    return (
+        f"INSERT INTO main.{quote(name)} ({columns_sql}) "
+        f"SELECT {columns_sql} FROM {SOURCE_SCHEMA}.{quote(name)} WHERE true "
+        f"ON CONFLICT ({conflict_columns_sql}) {on_conflict}"
+    )
 
 
 def is_diskcache(table: Table) -> bool:
@@ -263,48 +464,35 @@ def is_diskcache(table: Table) -> bool:
     return table.name == "Cache" and {"key", "raw", "filename", "value"} < columns
 
 
-def merge_diskcaches(table_from: Table, table_to: Table):
+def merge_diskcaches(db: Database, table_from: Table, table_to: Table) -> int:
     if not is_diskcache(table_from):
         raise ValueError(f"Table {table_from.name!r} (from) should be DiskCache!")
     if not is_diskcache(table_to):
         raise ValueError(f"Table {table_to.name!r} (to) should be DiskCache!")
 
-    logger_t = logger["db"][table_from.name]
-
-    for row_from in table_from.rows:
-        row_from.pop("rowid")  # drop rowid and rely on unique key
-        try:
-            logger_t.debug(f"Inserting {row_from['key']!r}")
-            table_to.insert(row_from)
-        except IntegrityError:
-            logger_t.debug(f"Row {row_from['key']!r} exists, updating")
-            row_to = next(table_to.rows_where("key = ?", [row_from["key"]], limit=1))
-            pks = [row_to[pk] for pk in table_to.pks]
-            updates = dict(
-                store_time=skip_none_max(
-                    row_from["store_time"],
-                    row_to["store_time"],
-                ),
-                expire_time=skip_none_max(
-                    row_from["expire_time"],
-                    row_to["expire_time"],
-                ),
-                access_time=skip_none_max(
-                    row_from["access_time"],
-                    row_to["access_time"],
-                ),
-                access_count=row_from["access_count"] + row_to["access_count"],
-            )
-            if row_from["store_time"] > row_to["store_time"]:
-                updates |= dict(
-                    tag=row_from["tag"],
-                    size=row_from["size"],
-                    mode=row_from["mode"],
-                    filename=row_from["filename"],
-                    value=row_from["value"],
-                )
-            logger_t.debug(f"Updating {pks!r} with {pformat(updates)}")
-            table_to.update(pks, updates)
+    # Rows are matched by the unique key, not by rowid. Times are the
+    # maximum of those which are set, access counts get summed up, and
+    # the value is taken from whichever row has been stored later.
+    # All expressions refer to the row as it was before the update.
+    updates = [
+        f"{column} = max(coalesce({column}, excluded.{column}), "
+        f"coalesce(excluded.{column}, {column}))"
+        for column in DISKCACHE_TIME_COLUMNS
+    ]
+    updates.append("access_count = access_count + excluded.access_count")
+    updates.extend(
+        f"{column} = CASE WHEN excluded.store_time > store_time "
+        f"THEN excluded.{column} ELSE {column} END"
+        for column in DISKCACHE_VALUE_COLUMNS
+    )
+    columns = [column for column in table_from.columns_dict.keys() if column != "rowid"]
+    sql = get_upsert_sql(
+        table_from.name,
+        columns,
+        ["key", "raw"],
+        f"DO UPDATE SET {', '.join(updates)}",
+    )
+    return db.execute(sql).rowcount
 
 
 def is_diskcache_settings(table: Table) -> bool:
@@ -315,7 +503,7 @@ def is_diskcache_settings(table: Table) -> bool:
     )
 
 
-def merge_diskcache_settings(table_from: Table, table_to: Table) -> None:
+def merge_diskcache_settings(db: Database, table_from: Table, table_to: Table) -> int:
     if not is_diskcache_settings(table_from):
         raise ValueError(
             f"Table {table_from.name!r} (from) should be DiskCache settings!"
@@ -323,26 +511,22 @@ def merge_diskcache_settings(table_from: Table, table_to: Table) -> None:
     if not is_diskcache_settings(table_to):
         raise ValueError(f"Table {table_to.name!r} (to) should be DiskCache settings!")
 
-    logger_t = logger["db"][table_from.name]
-
-    from_settings = {row["key"]: row["value"] for row in table_from.rows}
-    to_settings = {row["key"]: row["value"] for row in table_to.rows}
-
-    if from_settings == to_settings:
-        logger_t.debug("Tables are equal, nothing to do")
-        return
-
-    if not from_settings:
+    if not table_from.count:
         raise ValueError("DiskCache Settings table is empty!")
 
-    for key, from_value in from_settings.items():
-        to_value = to_settings.get(key)
-        if to_value is None:
-            logger_t.debug(f"Adding {key!r}")
-            table_to.insert({"key": key, "value": from_value})
-        elif to_value != from_value:
-            logger_t.debug(f"Deleting {key!r}, {from_value!r} ≠ {to_value!r}")
-            table_to.delete_where("key = ?", [key])
+    # Settings missing in the target are added, settings with different
+    # values are removed, so that DiskCache falls back to its defaults
+    changes = db.execute(
+        f"INSERT INTO main.Settings (key, value) "
+        f"SELECT key, value FROM {SOURCE_SCHEMA}.Settings AS s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM main.Settings AS m WHERE m.key = s.key)"
+    ).rowcount
+    changes += db.execute(
+        f"DELETE FROM main.Settings WHERE EXISTS ("
+        f"SELECT 1 FROM {SOURCE_SCHEMA}.Settings AS s "
+        f"WHERE s.key = main.Settings.key AND s.value IS NOT main.Settings.value)"
+    ).rowcount
+    return changes
 
 
 def make_schema_idempotent(schema) -> str:
@@ -358,10 +542,5 @@ def make_schema_line_idempotent(schema_line) -> str:
     raise ValueError(f"Unexpected schema line: {schema_line!r}")
 
 
-def skip_none_max(*values):
-    values = list(filter(None, values))
-    if len(values) == 1:
-        return values[0]
-    if values:
-        return max(values)
-    return None
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
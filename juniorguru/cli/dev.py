@@ -1,13 +1,21 @@
 import shutil
 import subprocess
 import sys
+from datetime import date
 from pathlib import Path
+from time import perf_counter
 
 import click
 import pytest
 from ghp_import import ghp_import
 
-from juniorguru.lib import loggers
+from juniorguru.lib import charts, loggers
+from juniorguru.models.base import db as models_db
+from juniorguru.models.subscription import (
+    SubscriptionActivity,
+    SubscriptionActivityType,
+    SubscriptionState,
+)
 
 
 logger = loggers.from_path(__file__)
@@ -151,3 +159,46 @@ def db(context: click.Context, path: Path):
     subprocess.run(
         ["datasette", str(path.absolute()), "--reload", "--open"], check=True
     )
+
+
+@main.command()
+@click.option("--from-date", default="2021-02-01", type=date.fromisoformat)
+@click.option("--repeat", default=3, type=int)
+def benchmark_subscriptions(from_date: date, repeat: int):
+    """Compares query shapes answering who is subscribed as of a date"""
+    months = charts.months(from_date, date.today())
+    shapes = {
+        "latest activities": lambda month: (
+            SubscriptionActivity.latest_listing(month)
+            .where(SubscriptionActivity.type != SubscriptionActivityType.DEACTIVATION)
+            .count()
+        ),
+        "states joined with activities": SubscriptionActivity.active_count,
+        "states": lambda month: (
+            SubscriptionState.listing(month)
+            .where(SubscriptionState.type != SubscriptionActivityType.DEACTIVATION)
+            .count()
+        ),
+    }
+    with models_db.connection_context():
+        time = perf_counter()
+        with models_db.atomic():
+            SubscriptionState.delete().execute()
+            SubscriptionState.build()
+        logger["benchmark"].info(
+            f"Building states: {perf_counter() - time:.3f}s "
+            f"({SubscriptionState.select().count()} rows)"
+        )
+        results = {}
+        for name, shape in shapes.items():
+            time = perf_counter()
+            for _ in range(repeat):
+                results[name] = charts.per_month(shape, months)
+            time = (perf_counter() - time) / repeat
+            logger["benchmark"].info(
+                f"{name}: {time:.3f}s per {len(months)} months, "
+                f"{time / len(months) * 1000:.2f}ms per month"
+            )
+    if len(set(map(tuple, results.values()))) != 1:
+        logger["benchmark"].error("Results differ!")
+        raise click.Abort()
@@ -1,22 +1,32 @@
+import asyncio
+import json
 import re
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from io import BytesIO
 from itertools import chain
 from multiprocessing import Pool
 from pathlib import Path
+from urllib.parse import urlparse
 
 import click
-import requests
-from lxml import html
+import httpx
 from PIL import Image
-from playwright.sync_api import (
+from playwright.async_api import (
+    Browser,
     Error as PlaywrightError,
+    Page,
     TimeoutError as PlaywrightTimeoutError,
-    sync_playwright,
+    async_playwright,
 )
 
 from juniorguru.cli.web import build
 from juniorguru.lib import loggers
+from juniorguru.lib.async_utils import call_async
+from juniorguru.lib.cli import async_command
+from juniorguru.lib.fingerprints import hash_bytes, hash_file
+from juniorguru.lib.site_index import SiteIndex
 
 
 logger = loggers.from_path(__file__)
@@ -30,6 +40,8 @@ SCREENSHOTS_DIR = IMAGES_DIR / "screenshots"
 
 SCREENSHOTS_OVERRIDES_DIR = IMAGES_DIR / "screenshots-overrides"
 
+SCREENSHOTS_INDEX_PATH = Path("juniorguru/data/screenshots.jsonl")
+
 WIDTH = 640
 
 HEIGHT = 360
@@ -42,12 +54,15 @@ FACEBOOK_URL_RE = re.compile(r"facebook\.com/")
 
 CACHE_PERIOD = timedelta(days=60)
 
-PLAYWRIGHT_BATCH_SIZE = 3
-
 PLAYWRIGHT_WORKERS = 3
 
 PLAYWRIGHT_RETRIES = 3
 
+YOUTUBE_CONNECTIONS = 4
+
+# https://www.python-httpx.org/advanced/timeouts/
+YOUTUBE_TIMEOUT = httpx.Timeout(15, connect=5)
+
 HIDDEN_ELEMENTS = [
     '[class*="cookie"]:not(html,body)',
     '[id*="cookie"]:not(html,body)',
@@ -124,8 +139,13 @@ BLOCKED_ROUTES = [
 
 
 @click.command()
+@click.option(
+    "--index-path",
+    default=SCREENSHOTS_INDEX_PATH,
+    type=click.Path(path_type=Path),
+)
 @click.pass_context
-def main(context):
+def main(context, index_path: Path):
     SCREENSHOTS_DIR.mkdir(parents=True, exist_ok=True)
     SCREENSHOTS_OVERRIDES_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -138,176 +158,420 @@ def main(context):
     )
     logger.info(f"Found {len(overriding_paths)} manual screenshot overrides")
     Pool().map(edit_screenshot_override, overriding_paths)
-    overriding_paths = set(SCREENSHOTS_OVERRIDES_DIR.glob("*.webp"))
-
-    paths = set(chain(SCREENSHOTS_DIR.glob("*.webp")))
-    logger.info(f"Found {len(paths)} screenshots")
-    expired_paths = set(filter(is_expired_path, paths))
-    logger.info(f"Expiring {len(expired_paths)} screenshot images")
-    for path in expired_paths:
-        logger.warning(f"Expiring {path}")
-        path.unlink()
 
     logger.info("Building HTML")
     context.invoke(build)
-    html_paths = set(Path(PUBLIC_DIR).glob("**/*.html"))
-    logger.info(f"Reading {len(html_paths)} HTML files")
-    screenshots = set(chain.from_iterable(map(parse_doc, html_paths)))
+    site_index = SiteIndex(PUBLIC_DIR).build()
+    logger.info(f"Reading {len(site_index)} HTML files")
+    screenshots = set(
+        chain.from_iterable(parse_doc(path, entry) for path, entry in site_index)
+    )
     logger.info(f"Found {len(screenshots)} links to screenshots")
 
-    existing_screenshots = set(filter(is_existing_screenshot, screenshots))
-    logger.info(f"Skipping {len(existing_screenshots)} existing screenshots")
-    screenshots = set(screenshots) - existing_screenshots
-
     overridden_screenshots = set(filter(is_overridden_screenshot, screenshots))
     logger.info(f"Skipping {len(overridden_screenshots)} overridden screenshots")
-    screenshots = set(screenshots) - overridden_screenshots
-
-    yt_screenshots = set(filter(is_yt_screenshot, screenshots))
-    logger.info(f"Downloading {len(yt_screenshots)} YouTube URLs")
-    screenshots = set(screenshots) - yt_screenshots
-    Pool().map(download_yt_cover_image, yt_screenshots)
-
-    fb_screenshots = set(filter(is_fb_screenshot, screenshots))
-    logger.info(f"Downloading {len(fb_screenshots)} Facebook URLs")
-    screenshots = set(screenshots) - fb_screenshots
-    Pool(PLAYWRIGHT_WORKERS).map(download_fb_cover_image, fb_screenshots)
-
-    logger.info(f"Downloading {len(screenshots)} regular website URLs")
-    screenshots_batches = generate_batches(screenshots, PLAYWRIGHT_BATCH_SIZE)
-    Pool(PLAYWRIGHT_WORKERS).map(create_screenshots, screenshots_batches)
-
-
-def parse_doc(path):
-    logger.debug(f"Parsing {path.relative_to(PUBLIC_DIR)}")
-    html_tree = html.fromstring(path.read_bytes())
-    for card in html_tree.cssselect(
-        "*[data-screenshot-source-url][data-screenshot-image-url]"
-    ):
-        screenshot_source_url = card.get("data-screenshot-source-url")
+    screenshots = screenshots - overridden_screenshots
+
+    index = ScreenshotsIndex(index_path).load()
+    pruned_count = index.prune(url for url, path in screenshots)
+    logger.info(f"Pruned {pruned_count} screenshots no longer linked from the index")
+
+    now = datetime.now()
+    expired_screenshots = {
+        screenshot for screenshot in screenshots if index.is_expired(screenshot, now)
+    }
+    logger.info(f"Expiring {len(expired_screenshots)} screenshots")
+    screenshots = screenshots - expired_screenshots
+
+    captured_screenshots = set(filter(index.is_captured, screenshots))
+    logger.info(f"Skipping {len(captured_screenshots)} captured screenshots")
+    screenshots = screenshots - captured_screenshots
+
+    untracked_screenshots = {
+        screenshot for screenshot in screenshots if Path(screenshot[1]).exists()
+    }
+    logger.info(f"Indexing {len(untracked_screenshots)} existing screenshots")
+    for url, path in untracked_screenshots:
+        index.record(url, path, Path(path).read_bytes())
+    screenshots = (screenshots - untracked_screenshots) | expired_screenshots
+
+    logger.info(f"Capturing {len(screenshots)} screenshots")
+    try:
+        stats = capture_screenshots(screenshots, index)
+    finally:
+        index.save()
+    for domain, timing in stats.slowest():
+        logger["timing"].info(f"{domain}: {timing}")
+    if stats.failed:
+        logger.error(f"Failed to capture {len(stats.failed)} screenshots")
+        raise click.Abort()
+
+
+def parse_doc(path, entry):
+    for screenshot_source_url, screenshot_image_url in entry["screenshots"]:
         if screenshot_source_url.startswith("."):
             screenshot_source_url = f"https://junior.guru/{path.parent.relative_to(PUBLIC_DIR) / screenshot_source_url}"
-        screenshot_path = (
-            SCREENSHOTS_DIR / Path(card.get("data-screenshot-image-url")).name
-        )
+        screenshot_path = SCREENSHOTS_DIR / Path(screenshot_image_url).name
         yield (screenshot_source_url, screenshot_path)
 
 
-def is_expired_path(path):
-    return (
-        datetime.now() - datetime.fromtimestamp(path.stat().st_ctime)
-    ) > CACHE_PERIOD
+class ScreenshotsIndex:
+    """
+    Remembers what has been captured for each source URL, and when
 
+    Expiring and skipping screenshots is decided according to the index,
+    not according to timestamps of the files, because those get reset
+    whenever the repository is cloned or the workspace is restored.
+    """
 
-def is_overridden_screenshot(screenshot):
-    url, path = screenshot
-    return (SCREENSHOTS_OVERRIDES_DIR / Path(path).name).exists()
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict] = {}
 
+    def __len__(self) -> int:
+        return len(self.entries)
 
-def is_existing_screenshot(screenshot):
-    url, path = screenshot
-    return Path(path).exists()
+    def load(self) -> "ScreenshotsIndex":
+        try:
+            with self.path.open() as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["url"]] = entry
+        except FileNotFoundError:
+            pass
+        return self
+
+    def save(self) -> None:
+        with self.path.open("w") as f:
+            for url in sorted(self.entries):
+                f.write(json.dumps(self.entries[url], sort_keys=True) + "\n")
+
+    def prune(self, urls) -> int:
+        stale_urls = self.entries.keys() - set(urls)
+        for url in stale_urls:
+            del self.entries[url]
+        return len(stale_urls)
+
+    def record(
+        self, url: str, path: Path, image_bytes: bytes, captured_at: datetime = None
+    ) -> None:
+        captured_at = captured_at or datetime.now()
+        self.entries[url] = dict(
+            url=url,
+            image=Path(path).name,
+            captured_at=captured_at.isoformat(timespec="seconds"),
+            hash=hash_bytes(image_bytes),
+            size=len(image_bytes),
+        )
 
+    def is_expired(self, screenshot: tuple[str, Path], now: datetime) -> bool:
+        url, path = screenshot
+        try:
+            captured_at = datetime.fromisoformat(self.entries[url]["captured_at"])
+        except KeyError:
+            return False
+        return now - captured_at > CACHE_PERIOD
 
-def is_yt_screenshot(screenshot):
-    url, path = screenshot
-    return bool(YOUTUBE_URL_RE.search(url))
+    def is_captured(self, screenshot: tuple[str, Path]) -> bool:
+        url, path = screenshot
+        try:
+            entry = self.entries[url]
+            size = Path(path).stat().st_size
+        except (KeyError, FileNotFoundError):
+            return False
+        if entry["image"] != Path(path).name or entry["size"] != size:
+            return False
+        return entry["hash"] == hash_file(path)
+
+
+class DomainTiming:
+    def __init__(self):
+        self.count = 0
+        self.time = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count} screenshots in {self.time:.1f}s, "
+            f"{self.time / self.count:.1f}s per screenshot"
+        )
 
 
-def is_fb_screenshot(screenshot):
-    url, path = screenshot
-    return bool(FACEBOOK_URL_RE.search(url))
+class CaptureStats:
+    def __init__(self):
+        self.domains = defaultdict(DomainTiming)
+        self.failed = []
 
+    def record(self, url: str, time_spent: float) -> None:
+        timing = self.domains[get_domain(url)]
+        timing.count += 1
+        timing.time += time_spent
 
-def parse_yt_id(url):
-    match = YOUTUBE_URL_RE.search(url)
-    try:
-        return match.group(2)
-    except AttributeError:
-        raise ValueError(f"URL {url} doesn't contain YouTube ID")
+    def slowest(self) -> list[tuple[str, DomainTiming]]:
+        return sorted(self.domains.items(), key=lambda item: item[1].time, reverse=True)
 
 
-def download_yt_cover_image(screenshot):
-    url, path = screenshot
-    logger.info(f"Shooting {url}")
-    resp = requests.get(
-        f"https://img.youtube.com/vi/{parse_yt_id(url)}/maxresdefault.jpg"
+@async_command
+async def capture_screenshots(
+    screenshots: set[tuple[str, Path]], index: ScreenshotsIndex
+) -> CaptureStats:
+    stats = CaptureStats()
+    yt_screenshots = set(filter(is_yt_screenshot, screenshots))
+    logger.info(f"Downloading {len(yt_screenshots)} YouTube cover images")
+    browser_screenshots = screenshots - yt_screenshots
+    logger.info(f"Shooting {len(browser_screenshots)} web pages")
+    await asyncio.gather(
+        download_yt_cover_images(yt_screenshots, index, stats),
+        shoot_pages(browser_screenshots, index, stats),
     )
-    resp.raise_for_status()
-    image_bytes = edit_image(resp.content)
-    logger.info(f"Writing {path}")
-    Path(path).write_bytes(image_bytes)
+    return stats
+
+
+async def download_yt_cover_images(
+    screenshots: set[tuple[str, Path]], index: ScreenshotsIndex, stats: CaptureStats
+) -> None:
+    if not screenshots:
+        return
+    async with httpx.AsyncClient(
+        timeout=YOUTUBE_TIMEOUT,
+        limits=httpx.Limits(max_connections=YOUTUBE_CONNECTIONS),
+    ) as client:
+        await asyncio.gather(
+            *[
+                download_yt_cover_image(client, screenshot, index, stats)
+                for screenshot in screenshots
+            ]
+        )
 
 
-def download_fb_cover_image(screenshot):
+async def download_yt_cover_image(
+    client: httpx.AsyncClient,
+    screenshot: tuple[str, Path],
+    index: ScreenshotsIndex,
+    stats: CaptureStats,
+) -> None:
     url, path = screenshot
     logger.info(f"Shooting {url}")
-    with sync_playwright() as playwright:
-        browser = playwright.firefox.launch()
-        page = browser.new_page()
-        page.goto(url, wait_until="networkidle")
-        image_url = page.evaluate(
-            """
-            () => document.querySelector('img[data-imgperflogname="profileCoverPhoto"]').src
-        """
+    time_start = time.perf_counter()
+    try:
+        response = await client.get(
+            f"https://img.youtube.com/vi/{parse_yt_id(url)}/maxresdefault.jpg"
         )
-        browser.close()
-    resp = requests.get(image_url)
-    resp.raise_for_status()
-    image_bytes = edit_image(resp.content)
-    logger.info(f"Writing {path}")
-    Path(path).write_bytes(image_bytes)
+        response.raise_for_status()
+        await save_screenshot(screenshot, response.content, index)
+    except Exception:
+        logger.exception(f"Unable to shoot {url}")
+        stats.failed.append(url)
+    stats.record(url, time.perf_counter() - time_start)
+
+
+async def shoot_pages(
+    screenshots: set[tuple[str, Path]],
+    index: ScreenshotsIndex,
+    stats: CaptureStats,
+    workers: int = PLAYWRIGHT_WORKERS,
+) -> None:
+    if not screenshots:
+        return
+    queue = asyncio.Queue()
+    for domain_screenshots in group_by_domain(screenshots):
+        queue.put_nowait(domain_screenshots)
+    async with async_playwright() as playwright:
+        browser = await playwright.firefox.launch()
+        try:
+            await asyncio.gather(
+                *[
+                    shoot_pages_worker(browser, queue, index, stats)
+                    for _ in range(min(workers, queue.qsize()))
+                ]
+            )
+        finally:
+            await browser.close()
+
+
+async def shoot_pages_worker(
+    browser: Browser,
+    queue: asyncio.Queue,
+    index: ScreenshotsIndex,
+    stats: CaptureStats,
+) -> None:
+    # Each worker keeps its browser context warm for all the pages it
+    # shoots, and takes all pages of a domain at once, so that a single
+    # domain isn't shot by several workers at the same time
+    warm_page = WarmPage(browser)
+    try:
+        while True:
+            try:
+                domain_screenshots = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            for screenshot in domain_screenshots:
+                url, path = screenshot
+                logger.info(f"Shooting {url}")
+                time_start = time.perf_counter()
+                try:
+                    if is_fb_screenshot(screenshot):
+                        image_bytes = await shoot_fb_cover_image(warm_page, url)
+                    else:
+                        image_bytes = await shoot_page(warm_page, url)
+                    await save_screenshot(screenshot, image_bytes, index)
+                except Exception as e:
+                    logger.exception(f"Unable to shoot {url}")
+                    stats.failed.append(url)
+                    if is_broken_page_error(e):
+                        await warm_page.renew()
+                stats.record(url, time.perf_counter() - time_start)
+    finally:
+        await warm_page.close()
+
+
+class WarmPage:
+    """
+    Browser page kept open for all the screenshots a worker shoots
+
+    If the page dies, e.g. because Firefox crashed or the target got
+    closed, it gets replaced by a new one, in a new context if needed.
+    """
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.context = None
+        self.page = None
+
+    async def get(self) -> Page:
+        if self.page is None:
+            if self.context is None:
+                self.context = await self.browser.new_context()
+            try:
+                self.page = await self.context.new_page()
+            except PlaywrightError:
+                logger.debug("Unable to open a page, recreating browser context")
+                await self.close_context()
+                self.context = await self.browser.new_context()
+                self.page = await self.context.new_page()
+            for blocked_route in BLOCKED_ROUTES:
+                await self.page.route(blocked_route, lambda route: route.abort())
+        return self.page
+
+    async def renew(self) -> None:
+        page, self.page = self.page, None
+        if page is not None:
+            try:
+                await page.close()
+            except PlaywrightError:
+                pass
 
+    async def close_context(self) -> None:
+        context, self.context = self.context, None
+        if context is not None:
+            try:
+                await context.close()
+            except PlaywrightError:
+                pass
 
-def generate_batches(iterable, batch_size):
-    iterable = list(iterable)
-    for i in range(0, len(iterable), batch_size):
-        yield iterable[i : i + batch_size]
+    async def close(self) -> None:
+        await self.renew()
+        await self.close_context()
 
 
-def create_screenshots(screenshots):
-    with sync_playwright() as playwright:
-        browser = playwright.firefox.launch()
-        page = browser.new_page()
-        for url, path in screenshots:
-            logger.info(f"Shooting {url}")
-            image_bytes = create_screenshot(page, url)
-            image_bytes = edit_image(image_bytes)
-            logger.info(f"Writing {path}")
-            Path(path).write_bytes(image_bytes)
-        browser.close()
+async def shoot_fb_cover_image(warm_page: WarmPage, url: str) -> bytes:
+    page = await warm_page.get()
+    await page.goto(url, wait_until="networkidle")
+    image_url = await page.evaluate(
+        """
+        () => document.querySelector('img[data-imgperflogname="profileCoverPhoto"]').src
+    """
+    )
+    response = await page.request.get(image_url)
+    if not response.ok:
+        raise PlaywrightError(f"Unable to download {image_url}: {response.status}")
+    return await response.body()
 
 
-def create_screenshot(page, url):
+async def shoot_page(warm_page: WarmPage, url: str) -> bytes:
     for attempt_no in range(1, PLAYWRIGHT_RETRIES + 1):
         try:
             logger.debug(f"Shooting {url} (attempt #{attempt_no})")
-            for blocked_route in BLOCKED_ROUTES:
-                page.route(blocked_route, lambda route: route.abort())
+            page = await warm_page.get()
             try:
-                page.goto(url, wait_until="networkidle")
+                await page.goto(url, wait_until="networkidle")
             except PlaywrightTimeoutError:
                 pass
-            page.evaluate(
+            await page.evaluate(
                 """
                 selectors => Array.from(document.querySelectorAll(selectors.join(', ')))
                     .forEach(element => element.remove());
             """,
                 list(HIDDEN_ELEMENTS),
             )
-            screenshot_bytes = page.screenshot()
+            screenshot_bytes = await page.screenshot()
             if len(screenshot_bytes) < MIN_BYTES_THRESHOLD:
-                raise PlaywrightError(
+                raise SmallScreenshotError(
                     f"Suspiciously small image: {len(screenshot_bytes)} bytes"
                 )
             return screenshot_bytes
         except PlaywrightError as e:
             if attempt_no < PLAYWRIGHT_RETRIES:
                 logger.debug(str(e))
+                if is_broken_page_error(e):
+                    await warm_page.renew()
             else:
                 raise
 
 
+class SmallScreenshotError(PlaywrightError):
+    pass
+
+
+def is_broken_page_error(error: Exception) -> bool:
+    return isinstance(error, PlaywrightError) and not isinstance(
+        error, (PlaywrightTimeoutError, SmallScreenshotError)
+    )
+
+
+async def save_screenshot(
+    screenshot: tuple[str, Path], image_bytes: bytes, index: ScreenshotsIndex
+) -> None:
+    url, path = screenshot
+    image_bytes = await call_async(edit_image, image_bytes)
+    logger.info(f"Writing {path}")
+    Path(path).write_bytes(image_bytes)
+    index.record(url, path, image_bytes)
+
+
+def group_by_domain(screenshots: set[tuple[str, Path]]) -> list[list[tuple[str, Path]]]:
+    groups = defaultdict(list)
+    for screenshot in sorted(screenshots):
+        groups[get_domain(screenshot[0])].append(screenshot)
+    return [groups[domain] for domain in sorted(groups)]
+
+
+def get_domain(url: str) -> str:
+    return (urlparse(url).hostname or "").removeprefix("www.")
+
+
+def is_overridden_screenshot(screenshot):
+    url, path = screenshot
+    return (SCREENSHOTS_OVERRIDES_DIR / Path(path).name).exists()
+
+
+def is_yt_screenshot(screenshot):
+    url, path = screenshot
+    return bool(YOUTUBE_URL_RE.search(url))
+
+
+def is_fb_screenshot(screenshot):
+    url, path = screenshot
+    return bool(FACEBOOK_URL_RE.search(url))
+
+
+def parse_yt_id(url):
+    match = YOUTUBE_URL_RE.search(url)
+    try:
+        return match.group(2)
+    except AttributeError:
+        raise ValueError(f"URL {url} doesn't contain YouTube ID")
+
+
 def edit_image(image_bytes):
     with Image.open(BytesIO(image_bytes)) as image:
         if image.format in ("PNG", "JPEG"):
@@ -1,5 +1,9 @@
 import os
+import statistics
+import subprocess
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
 from functools import cached_property, wraps
 from pathlib import Path
 from time import perf_counter_ns
@@ -8,7 +12,9 @@ import click
 
 from juniorguru import sync as sync_package
 from juniorguru.lib import images, loggers, mutations
+from juniorguru.lib.cache import CACHE_DIR, get_cache
 from juniorguru.lib.cli import command_name, import_commands
+from juniorguru.lib.fingerprints import dump_tables, fingerprint, restore_tables
 from juniorguru.models.base import db
 from juniorguru.models.sync import Sync
 
@@ -21,6 +27,16 @@ except (Exception, ImportError):
 
 NOTIFY_AFTER_MIN = 1
 
+RUN_WORKERS = os.cpu_count()
+
+DURATIONS_HISTORY_SIZE = 5
+
+DURATIONS_EXPIRE = timedelta(days=60)
+
+NS_IN_MIN = 60000000000
+
+FINGERPRINTS_EXPIRE = timedelta(days=30)
+
 
 logger = loggers.from_path(__file__)
 
@@ -72,6 +88,16 @@ class Group(click.Group):
                         logger[name].debug(f"Invoking dependency: {dependency_name}")
                         context.invoke(main.get_command(context, dependency_name))
 
+                command = context.command
+                inputs_fingerprint = None
+                if command.is_incremental and context.obj["incremental"]:
+                    inputs_fingerprint = self._get_sync_command_fingerprint(command, fn)
+                    if self._restore_sync_command_outputs(
+                        name, command, inputs_fingerprint, sync
+                    ):
+                        logger[name].info("Skipping (inputs unchanged)")
+                        return
+
                 logger[name].debug("Invoking self")
                 self._start_sync_command(name, sync)
                 try:
@@ -82,6 +108,11 @@ class Group(click.Group):
                     raise
                 else:
                     sync_command = self._end_sync_command(name, sync)
+                    record_duration(name, sync_command.time_diff)
+                    if inputs_fingerprint:
+                        self._store_sync_command_outputs(
+                            name, command, inputs_fingerprint
+                        )
                     logger[name].info(
                         f"Finished in {sync_command.time_diff_min:.1f}min"
                     )
@@ -106,6 +137,43 @@ class Group(click.Group):
     def _end_sync_command(self, name, sync):
         return sync.command_end(name, perf_counter_ns())
 
+    @db.connection_context()
+    def _get_sync_command_fingerprint(self, command, fn):
+        sources = [sys.modules[fn.__module__].__file__] + [
+            sys.modules[model.__module__].__file__ for model in command.output_tables
+        ]
+        return fingerprint(
+            files=sources + command.input_files,
+            tables=command.input_tables,
+            cache_tags=command.input_cache_tags,
+            cache_dir=CACHE_DIR,
+        )
+
+    @db.connection_context()
+    def _restore_sync_command_outputs(self, name, command, inputs_fingerprint, sync):
+        outputs = get_cache().get(f"sync-fingerprints:{name}")
+        if not outputs or outputs["fingerprint"] != inputs_fingerprint:
+            logger[name].debug("Inputs changed or unknown")
+            return False
+        logger[name].debug(f"Inputs unchanged ({inputs_fingerprint}), restoring")
+        time = perf_counter_ns()
+        sync.command_start(name, time)
+        restore_tables(command.output_tables, outputs["tables"])
+        sync.command_end(name, perf_counter_ns())
+        return True
+
+    @db.connection_context()
+    def _store_sync_command_outputs(self, name, command, inputs_fingerprint):
+        get_cache().set(
+            f"sync-fingerprints:{name}",
+            dict(
+                fingerprint=inputs_fingerprint,
+                tables=dump_tables(command.output_tables),
+            ),
+            expire=FINGERPRINTS_EXPIRE.total_seconds(),
+            tag="sync-fingerprints",
+        )
+
     def list_commands(self, context):
         return sorted(super().list_commands(context) + list(self.sync_commands))
 
@@ -114,11 +182,31 @@ class Group(click.Group):
 
 
 class Command(click.Command):
-    def __init__(self, *args, dependencies=None, **kwargs):
+    def __init__(
+        self,
+        *args,
+        dependencies=None,
+        input_files=None,
+        input_tables=None,
+        input_cache_tags=None,
+        output_tables=None,
+        **kwargs,
+    ):
         self.dependencies = list(dependencies or [])
+        self.input_files = list(input_files or [])
+        self.input_tables = list(input_tables or [])
+        self.input_cache_tags = list(input_cache_tags or [])
+        self.output_tables = list(output_tables or [])
         super().__init__(*args, **kwargs)
         self.name = command_name(self.callback.__module__)
 
+    @property
+    def is_incremental(self) -> bool:
+        return bool(
+            (self.input_files or self.input_tables or self.input_cache_tags)
+            and self.output_tables
+        )
+
 
 @click.group(chain=True, cls=Group)
 @click.option("--id", envvar="CIRCLE_WORKFLOW_WORKSPACE_ID", default=perf_counter_ns)
@@ -134,6 +222,11 @@ class Command(click.Command):
 @click.option(
     "--clear-image-templates-cache/--keep-image-templates-cache", default=True
 )
+@click.option(
+    "--incremental/--full",
+    default=True,
+    help="Skip commands with declared inputs if these didn't change since their last run.",
+)
 @click.pass_context
 def main(
     context,
@@ -142,6 +235,7 @@ def main(
     mutate,
     allow_mutations,
     clear_image_templates_cache,
+    incremental,
 ):
     if allow_mutations:
         mutations.allow_all()
@@ -152,10 +246,11 @@ def main(
         images.init_templates_cache()
     else:
         logger.info("Keeping image templates cache")
+    images.render_cache.collect_garbage()
 
     with db.connection_context():
         sync = Sync.start(id)
-    context.obj = dict(sync=sync, skip_dependencies=not deps)
+    context.obj = dict(sync=sync, skip_dependencies=not deps, incremental=incremental)
     logger.debug(
         f"Sync #{id} starts with {sync.count_commands()} commands already recorded"
     )
@@ -169,32 +264,29 @@ def main(
 @click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
 @click.pass_context
 def ci(context, job, node_index, nodes, print_only):
-    if job == "sync-1":
-        commands_with_deps = {
-            name for name, deps in main.dependencies_map.items() if deps
-        }
-        chains = get_parallel_chains(main.dependencies_map, exclude=commands_with_deps)
-    elif job == "sync-2":
-        commands_without_deps = {
-            name for name, deps in main.dependencies_map.items() if not deps
-        }
-        chains = get_parallel_chains(
-            main.dependencies_map, exclude=commands_without_deps
-        )
-    else:
-        raise ValueError(job)
-
-    if nodes and nodes != len(chains):
+    chains = get_job_chains(main.dependencies_map, job)
+    if nodes and nodes > len(chains):
         logger.error(
-            f"The job {job} has parallelism {nodes}, but there are {len(chains)} command chains!"
+            f"The job {job} has parallelism {nodes}, but there are only {len(chains)} command chains!"
         )
         raise click.Abort()
 
+    durations = load_durations(main.dependencies_map)
+    if nodes and nodes < len(chains):
+        logger.info(
+            f"Balancing {len(chains)} command chains of the job {job} to {nodes} nodes"
+        )
+        chains = get_balanced_chains(chains, durations, nodes)
+
     if print_only:
         for index, chain in enumerate(chains):
+            bold, color = (True, "green") if index == node_index else (None, None)
             for name in chain:
-                bold, color = (True, "green") if index == node_index else (None, None)
-                click.secho(f"{index} {name}", bold=bold, fg=color)
+                click.secho(
+                    f"{index} {name} {durations[name] / NS_IN_MIN:.1f}min",
+                    bold=bold,
+                    fg=color,
+                )
     else:
         for name in chains[node_index]:
             command = main.get_command(context, name)
@@ -207,23 +299,28 @@ def ci(context, job, node_index, nodes, print_only):
     default=".circleci/config.yml",
     type=click.Path(path_type=Path, exists=True),
 )
+@click.option(
+    "--max-nodes",
+    type=int,
+    help="Balance command chains to at most this number of nodes per job.",
+)
 @click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
-def parallelism(config_path, print_only):
-    commands_with_deps = {name for name, deps in main.dependencies_map.items() if deps}
-    sync1_chains = get_parallel_chains(
-        main.dependencies_map, exclude=commands_with_deps
-    )
-    sync1_parallelism = len(sync1_chains)
-    click.echo(f"sync-1 {sync1_parallelism}")
+def parallelism(config_path, max_nodes, print_only):
+    durations = load_durations(main.dependencies_map)
+    jobs_parallelism = {}
+    for job in ["sync-1", "sync-2"]:
+        chains = get_job_chains(main.dependencies_map, job)
+        if max_nodes and max_nodes < len(chains):
+            chains = get_balanced_chains(chains, durations, max_nodes)
+        jobs_parallelism[job] = len(chains)
+        click.echo(f"{job} {len(chains)}")
 
-    commands_without_deps = {
-        name for name, deps in main.dependencies_map.items() if not deps
-    }
-    sync2_chains = get_parallel_chains(
-        main.dependencies_map, exclude=commands_without_deps
-    )
-    sync2_parallelism = len(sync2_chains)
-    click.echo(f"sync-2 {sync2_parallelism}")
+        if print_only:
+            for index, chain in enumerate(chains):
+                chain_duration = get_chain_duration(chain, durations)
+                click.echo(
+                    f"  {index} {chain_duration / NS_IN_MIN:.1f}min {', '.join(chain)}"
+                )
 
     if print_only:
         return
@@ -232,10 +329,8 @@ def parallelism(config_path, print_only):
     parallelism = None
     with config_path.open() as config_file:
         for line in config_file:
-            if line.strip() == "sync-1:":
-                parallelism = sync1_parallelism
-            elif line.strip() == "sync-2:":
-                parallelism = sync2_parallelism
+            if line.strip().endswith(":") and line.strip()[:-1] in jobs_parallelism:
+                parallelism = jobs_parallelism[line.strip()[:-1]]
             elif line.lstrip().startswith("parallelism:"):
                 line, _ = line.split(":", 1)
                 line += f": {parallelism}\n"
@@ -255,6 +350,67 @@ def all(context, print_only):
             context.invoke(command)
 
 
+@main.command()
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    default=RUN_WORKERS,
+    show_default=True,
+    help="How many sync commands can run at the same time.",
+)
+@click.option("-p", "--print-only", is_flag=True, default=False, show_default=True)
+@click.pass_context
+def run(context, workers, print_only):
+    sync = context.obj["sync"]
+    with db.connection_context():
+        done = set(filter(sync.is_command_seen, main.dependencies_map))
+    if done:
+        logger["run"].info(f"Already executed: {', '.join(sorted(done))}")
+    pending = set(main.dependencies_map) - done
+
+    if print_only:
+        for name in get_topological_order(main.dependencies_map, done=done):
+            click.echo(name)
+        return
+
+    args = get_run_args(context.parent.params)
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while True:
+            ready = get_ready_commands(main.dependencies_map, pending, done)
+            for name in ready[: workers - len(running)]:
+                logger["run"].debug(f"Starting {name}")
+                pending.remove(name)
+                future = executor.submit(
+                    subprocess.run, ["jg", "sync", *args, name], check=True
+                )
+                running[future] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                except subprocess.CalledProcessError:
+                    logger["run"].error(f"Command {name} failed")
+                    failed.add(name)
+                else:
+                    done.add(name)
+            logger["run"].info(
+                f"Done {len(done)}, running {len(running)}, pending {len(pending)}"
+            )
+
+    if pending:
+        logger["run"].error(
+            f"Not executed due to failed dependencies: {', '.join(sorted(pending))}"
+        )
+    if failed or pending:
+        raise click.Abort()
+
+
 @click.pass_context
 def close(context):
     exception = sys.exception()
@@ -309,6 +465,106 @@ def get_parallel_chains(dependencies_map, exclude=None):
         chains = {}
 
 
+def get_job_chains(dependencies_map: dict[str, list[str]], job: str) -> list[list[str]]:
+    if job == "sync-1":
+        exclude = {name for name, deps in dependencies_map.items() if deps}
+    elif job == "sync-2":
+        exclude = {name for name, deps in dependencies_map.items() if not deps}
+    else:
+        raise ValueError(job)
+    return get_parallel_chains(dependencies_map, exclude=exclude)
+
+
+def get_balanced_chains(
+    chains: list[list[str]], durations: dict[str, int], nodes: int
+) -> list[list[str]]:
+    nodes_chains = [[] for _ in range(nodes)]
+    nodes_durations = [0] * nodes
+    chains = sorted(
+        chains, key=lambda chain: (-get_chain_duration(chain, durations), chain)
+    )
+    for chain in chains:
+        index = nodes_durations.index(min(nodes_durations))
+        nodes_chains[index].extend(chain)
+        nodes_durations[index] += get_chain_duration(chain, durations)
+    return [sorted(chain) for chain in nodes_chains if chain]
+
+
+def get_chain_duration(chain: list[str], durations: dict[str, int]) -> int:
+    return sum(durations[name] for name in chain)
+
+
+def load_durations(dependencies_map: dict[str, list[str]]) -> dict[str, int]:
+    cache = get_cache()
+    history = {
+        name: cache.get(f"sync-durations:{name}", []) for name in dependencies_map
+    }
+    return estimate_durations(history)
+
+
+def estimate_durations(history: dict[str, list[int]]) -> dict[str, int]:
+    durations = {
+        name: int(statistics.median(times)) for name, times in history.items() if times
+    }
+    default = int(statistics.median(durations.values())) if durations else NS_IN_MIN
+    return {name: durations.get(name, default) for name in history}
+
+
+def record_duration(name: str, time_diff: int) -> None:
+    cache = get_cache()
+    key = f"sync-durations:{name}"
+    history = cache.get(key, [])[-(DURATIONS_HISTORY_SIZE - 1) :] + [time_diff]
+    cache.set(
+        key,
+        history,
+        expire=DURATIONS_EXPIRE.total_seconds(),
+        tag="sync-durations",
+    )
+
+
+def get_ready_commands(
+    dependencies_map: dict[str, list[str]], pending: set[str], done: set[str]
+) -> list[str]:
+    ready = [name for name in pending if set(dependencies_map[name]) <= done]
+    dependants_counts = get_dependants_counts(dependencies_map)
+    return sorted(ready, key=lambda name: (-dependants_counts[name], name))
+
+
+def get_dependants_counts(dependencies_map: dict[str, list[str]]) -> dict[str, int]:
+    counts = {name: 0 for name in dependencies_map}
+    for deps in dependencies_map.values():
+        for dependency_name in deps:
+            counts[dependency_name] = counts.get(dependency_name, 0) + 1
+    return counts
+
+
+def get_topological_order(
+    dependencies_map: dict[str, list[str]], done: set[str] | None = None
+) -> list[str]:
+    done = set(done or [])
+    pending = set(dependencies_map) - done
+    order = []
+    while pending:
+        ready = get_ready_commands(dependencies_map, pending, done)
+        if not ready:
+            raise ValueError(f"Unresolvable dependencies: {', '.join(sorted(pending))}")
+        order.extend(ready)
+        pending -= set(ready)
+        done |= set(ready)
+    return order
+
+
+def get_run_args(params: dict) -> list[str]:
+    args = ["--id", str(params["id"]), "--keep-image-templates-cache"]
+    if not params["incremental"]:
+        args.append("--full")
+    if params["allow_mutations"]:
+        args.append("--allow-mutations")
+    for mutation in params["mutate"]:
+        args.extend(["--mutate", mutation])
+    return args
+
+
 def confirm(question, default=True):
     print("\a", end="", flush=True)
     return click.confirm(question, default=default, show_default=True, prompt_suffix="")
@@ -1,10 +1,14 @@
 import hashlib
+import logging
+import os
 import shutil
 import subprocess
 import warnings
+from datetime import timedelta
 from functools import cache, wraps
+from itertools import chain
+from multiprocessing import Pool
 from pathlib import Path
-from tempfile import TemporaryDirectory
 from time import perf_counter
 
 import click
@@ -13,9 +17,25 @@ from lxml import html
 from mkdocs.__main__ import build_command as _build_mkdocs
 
 from juniorguru.lib import loggers
+from juniorguru.lib.cache import CACHE_DIR, get_cache
+from juniorguru.lib.hyphenation import HYPHENATE_COMMAND, Hyphenator
+from juniorguru.lib.site_index import SiteIndex
+from juniorguru.web import context as context_hooks
+from juniorguru.web.incremental import incremental
 from juniorguru.web_legacy.__main__ import main as flask_freeze
 
 
+MKDOCS_BUILD_DIR = Path(CACHE_DIR) / "mkdocs"
+
+POST_PROCESS_CACHE_DIR = Path(CACHE_DIR) / "post-process"
+
+POST_PROCESS_EXPIRE = timedelta(days=30).total_seconds()
+
+POST_PROCESS_WORKERS = os.cpu_count()
+
+POST_PROCESS_CHUNK_SIZE = 10
+
+
 logger = loggers.from_path(__file__)
 
 
@@ -76,8 +96,31 @@ def build_flask(output_path: Path):
     type=click.Path(exists=True, path_type=Path),
 )
 @click.option("-w", "--warnings/--no-warnings", "warn", default=False)
+@click.option(
+    "--profile-context",
+    is_flag=True,
+    help="Report how many database queries each page triggered.",
+)
+@click.option(
+    "--incremental/--full",
+    "incremental_build",
+    default=True,
+    help="Render only pages whose inputs changed since the previous build.",
+)
 @building("MkDocs files")
-def build_mkdocs(context, config: Path, output_path: Path, warn: bool):
+def build_mkdocs(
+    context,
+    config: Path,
+    output_path: Path,
+    warn: bool,
+    profile_context: bool,
+    incremental_build: bool,
+):
+    context_hooks.profile.enabled = profile_context
+    incremental.enabled = True
+    incremental.manifest_path = MKDOCS_BUILD_DIR / "manifest.json"
+    if not incremental_build:
+        incremental.manifest_path.unlink(missing_ok=True)
     _simplefilter = warnings.simplefilter
     if not warn:
         # Unfortunately MkDocs sets their own warnings filter, so we have to
@@ -85,33 +128,64 @@ def build_mkdocs(context, config: Path, output_path: Path, warn: bool):
         warnings.simplefilter = lambda *args, **kwargs: None
 
     # Unfortunately MkDocs doesn't support mixing with existing files inside
-    # the output directory, so we have to build into a temporary directory and
-    # then move the files over manually.
-    with TemporaryDirectory() as temp_dir:
-        try:
-            context.invoke(
-                _build_mkdocs, config_file=str(config.absolute()), site_dir=temp_dir
-            )
-            shutil.copytree(
-                temp_dir,
-                output_path.absolute(),
-                dirs_exist_ok=True,
-                ignore=shutil.ignore_patterns("sitemap.xml*"),
-            )
-        finally:
-            warnings.simplefilter = _simplefilter
+    # the output directory, so we have to build into a separate directory and
+    # then move the files over manually. The directory is kept between builds,
+    # so that pages which don't need to be rendered again can be copied over.
+    # With --full, MkDocs cleans it and the manifest is gone, so all pages
+    # get rendered.
+    site_dir = MKDOCS_BUILD_DIR / "site"
+    mkdocs_logger = logging.getLogger("mkdocs.commands.build")
+    mkdocs_logger.addFilter(ignore_dirty_build_warning)
+    try:
+        context.invoke(
+            _build_mkdocs,
+            config_file=str(config.absolute()),
+            site_dir=str(site_dir.absolute()),
+            clean=not incremental_build,
+        )
+        shutil.copytree(
+            site_dir,
+            output_path.absolute(),
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns("sitemap.xml*"),
+        )
+    finally:
+        warnings.simplefilter = _simplefilter
+        mkdocs_logger.removeFilter(ignore_dirty_build_warning)
+
+
+def ignore_dirty_build_warning(record: logging.LogRecord) -> bool:
+    # The pages to render are chosen according to the recorded inputs,
+    # so the navigation isn't inaccurate as the MkDocs warning suggests
+    return "'dirty' build" not in record.getMessage()
 
 
 @main.command()
 @click.argument("output_path", default="public", type=click.Path(path_type=Path))
+@click.option(
+    "--profile-context",
+    is_flag=True,
+    help="Report how many database queries each page triggered.",
+)
+@click.option(
+    "--incremental/--full",
+    "incremental_build",
+    default=True,
+    help="Render only MkDocs pages whose inputs changed since the previous build.",
+)
 @click.pass_context
 @building("everything")
-def build(context, output_path: Path):
+def build(context, output_path: Path, profile_context: bool, incremental_build: bool):
     shutil.rmtree(output_path, ignore_errors=True)
     output_path.mkdir(parents=True, exist_ok=True)
     context.invoke(build_static, output_path=output_path)
     context.invoke(build_flask, output_path=output_path)
-    context.invoke(build_mkdocs, output_path=output_path)
+    context.invoke(
+        build_mkdocs,
+        output_path=output_path,
+        profile_context=profile_context,
+        incremental_build=incremental_build,
+    )
 
 
 @main.command()
@@ -156,51 +230,141 @@ def serve(context, output_path: Path, open: bool):
 @click.argument(
     "output_path", default="public", type=click.Path(exists=True, path_type=Path)
 )
-def post_process(output_path: Path):
-    for html_path in output_path.glob("**/*.html"):
-        logger["postprocess"].info(f"Post-processing {html_path}")
-        html_tree = html.fromstring(html_path.read_text())
-
-        # Cache busting CSS
-        # https://developer.mozilla.org/en-US/docs/Web/HTTP/Caching#cache_busting
-        for link in html_tree.cssselect('link[href$=".css"]'):
-            href = link.get("href")
-            try:
-                css_path = resolve_path(output_path, html_path, href)
-            except ValueError as e:
-                logger["postprocess"].debug(str(e))
-            else:
-                logger["postprocess"].debug(f"Cache busting {href} ({css_path})")
-                href = f"{href}?hash={hash_file(css_path)}"
-                link.set("href", href)
-
-        # Cache busting JS
-        # https://developer.mozilla.org/en-US/docs/Web/HTTP/Caching#cache_busting
-        for script in html_tree.cssselect('script[src$=".js"]'):
-            src = script.get("src")
-            try:
-                js_path = resolve_path(output_path, html_path, src)
-            except ValueError as e:
-                logger["postprocess"].debug(str(e))
-            else:
-                logger["postprocess"].debug(f"Cache busting {src} ({js_path})")
-                src = f"{src}?hash={hash_file(js_path)}"
-                script.set("src", src)
-
-        # Hyphenation
-        # https://github.com/ytiurin/hyphen
-        for document in html_tree.cssselect(".document"):
-            document_bytes = html.tostring(document, encoding="unicode").encode("utf-8")
-            result = subprocess.run(
-                ["node", "juniorguru/js/hyphenate.cjs"],
-                input=document_bytes,
-                stdout=subprocess.PIPE,
-                check=True,
+@click.option("--workers", default=POST_PROCESS_WORKERS, type=int)
+@click.option("--chunk-size", default=POST_PROCESS_CHUNK_SIZE, type=int)
+def post_process(output_path: Path, workers: int, chunk_size: int):
+    site_index = SiteIndex(output_path).build(workers=workers, chunk_size=chunk_size)
+    results = get_cache(str(POST_PROCESS_CACHE_DIR))
+    assets_hash = hash_assets(output_path)
+    keys = {}
+    entries = {}
+    unchanged_count = 0
+    for html_path, entry in site_index:
+        if not needs_post_processing(entry):
+            logger["postprocess"].debug(f"Nothing to post-process in {html_path}")
+            continue
+        entries[html_path] = entry
+        key = get_post_process_key(output_path, html_path, assets_hash)
+        if (html_text := results.get(key)) is None:
+            keys[html_path] = key
+        else:
+            logger["postprocess"].debug(f"Unchanged {html_path}")
+            html_path.write_text(html_text)
+            site_index.record(html_path, html_text, get_post_processed_entry(entry))
+            unchanged_count += 1
+    logger["postprocess"].info(
+        f"Post-processing {len(keys)} HTML files, "
+        f"{unchanged_count} unchanged since the previous run, "
+        f"{len(site_index) - len(entries)} with nothing to post-process"
+    )
+    if not keys:
+        return
+    args = [(output_path, html_path) for html_path in keys]
+    with Pool(workers, initializer=init_post_process_worker) as pool:
+        for html_path, html_text in pool.imap_unordered(
+            post_process_file, args, chunksize=chunk_size
+        ):
+            results.set(
+                keys[html_path],
+                html_text,
+                expire=POST_PROCESS_EXPIRE,
+                tag="web-post-process",
             )
-            hyphenated_document = html.fromstring(result.stdout.decode("utf-8"))
-            document.getparent().replace(document, hyphenated_document)
+            site_index.record(
+                html_path, html_text, get_post_processed_entry(entries[html_path])
+            )
+
+
+def needs_post_processing(entry: dict) -> bool:
+    return bool(entry["stylesheets"] or entry["scripts"] or entry["documents"])
+
+
+def get_post_processed_entry(entry: dict) -> dict:
+    # Post-processing only adds hashes to URLs of local assets and soft
+    # hyphens to texts, so the rest of what's been indexed stays the same
+    # and the commands which run next don't need to parse the file again
+    return dict(
+        entry,
+        stylesheets=[href for href in entry["stylesheets"] if href.startswith("http")],
+        scripts=[src for src in entry["scripts"] if src.startswith("http")],
+    )
+
+
+def get_post_process_key(output_path: Path, html_path: Path, assets_hash: str) -> str:
+    hash = hashlib.sha256()
+    hash.update(f"{html_path.relative_to(output_path)}\n{assets_hash}\n".encode())
+    hash.update(html_path.read_bytes())
+    return hash.hexdigest()
+
+
+def hash_assets(output_path: Path) -> str:
+    # Post-processed HTML refers to hashes of CSS and JS files, so if any
+    # of them changes, none of the previous results can be reused
+    hash = hashlib.sha256()
+    hash.update(Path(HYPHENATE_COMMAND[-1]).read_bytes())
+    paths = chain(output_path.glob("**/*.css"), output_path.glob("**/*.js"))
+    for path in sorted(paths):
+        hash.update(f"{path.relative_to(output_path)}:{hash_file(path)}\n".encode())
+    return hash.hexdigest()
+
+
+hyphenator: Hyphenator | None = None
+
+
+def init_post_process_worker():
+    global hyphenator
+    hyphenator = Hyphenator()
+
+
+def post_process_file(args: tuple[Path, Path]) -> tuple[Path, str]:
+    output_path, html_path = args
+    logger["postprocess"].info(f"Post-processing {html_path}")
+    html_text = post_process_html(output_path, html_path, hyphenator)
+    html_path.write_text(html_text)
+    return html_path, html_text
+
+
+def post_process_html(
+    output_path: Path, html_path: Path, hyphenator: Hyphenator
+) -> str:
+    html_tree = html.fromstring(html_path.read_text())
+
+    # Cache busting CSS
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Caching#cache_busting
+    for link in html_tree.cssselect('link[href$=".css"]'):
+        href = link.get("href")
+        try:
+            css_path = resolve_path(output_path, html_path, href)
+        except ValueError as e:
+            logger["postprocess"].debug(str(e))
+        else:
+            logger["postprocess"].debug(f"Cache busting {href} ({css_path})")
+            href = f"{href}?hash={hash_file(css_path)}"
+            link.set("href", href)
+
+    # Cache busting JS
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Caching#cache_busting
+    for script in html_tree.cssselect('script[src$=".js"]'):
+        src = script.get("src")
+        try:
+            js_path = resolve_path(output_path, html_path, src)
+        except ValueError as e:
+            logger["postprocess"].debug(str(e))
+        else:
+            logger["postprocess"].debug(f"Cache busting {src} ({js_path})")
+            src = f"{src}?hash={hash_file(js_path)}"
+            script.set("src", src)
+
+    # Hyphenation, all documents of the page in one batch
+    # https://github.com/ytiurin/hyphen
+    documents = html_tree.cssselect(".document")
+    hyphenated_documents = hyphenator.hyphenate(
+        [html.tostring(document, encoding="unicode") for document in documents]
+    )
+    for document, hyphenated_document in zip(documents, hyphenated_documents):
+        document.getparent().replace(document, html.fromstring(hyphenated_document))
 
-        html_path.write_text(html.tostring(html_tree, encoding="unicode"))
+    return html.tostring(html_tree, encoding="unicode")
 
 
 def resolve_path(output_path: Path, html_path: Path, url: str):
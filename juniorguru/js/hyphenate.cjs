@@ -1,18 +1,17 @@
 /*
   This file is used by 'jg web post-process' to hyphenate
-  the '.document' part of HTML files.
+  the '.document' part of HTML files. It runs as a long-lived
+  worker: every line of the input is a JSON array of HTML strings
+  and for every such line it prints a line with a JSON array
+  of the same HTML strings, hyphenated.
 */
 const readline = require('node:readline');
 const { stdin, stdout } = require('node:process');
 const { hyphenateHTMLSync } = require("hyphen/cs");
 
 
-const rl = readline.createInterface({ input: stdin, output: stdout });
-lines = []
+const rl = readline.createInterface({ input: stdin });
 rl.on('line', (line) => {
-  lines.push(line);
-});
-rl.on('close', () => {
-  const html = lines.join('\n');
-  console.log(hyphenateHTMLSync(html));
+  const documents = JSON.parse(line);
+  stdout.write(JSON.stringify(documents.map((html) => hyphenateHTMLSync(html))) + '\n');
 });
@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from typing import Generator
 
 from apify_client import ApifyClient
 from apify_shared.consts import ActorJobStatus
@@ -19,6 +20,13 @@ def fetch_data(
     actor_name: str,
     token: str | None = None,
 ) -> list[dict]:
+    return list(iterate_data(actor_name, token=token))
+
+
+def iterate_data(
+    actor_name: str,
+    token: str | None = None,
+) -> Generator[dict, None, None]:
     client = ApifyClient(token=token or APIFY_API_KEY)
 
     logger.debug(f"Getting last successful run of {actor_name}")
@@ -37,4 +45,4 @@ def fetch_data(
         f"took {run_info['stats']['runTimeSecs']}s"
     )
     dataset = last_run.dataset()
-    return list(dataset.iterate_items())
+    yield from dataset.iterate_items()
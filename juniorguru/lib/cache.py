@@ -1,7 +1,12 @@
 import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
 from datetime import timedelta
 from functools import lru_cache, wraps
-from typing import Any, Callable
+from typing import Any, Awaitable, Callable, Generator, Hashable
 
 from diskcache import Cache
 from diskcache.core import ENOVAL, args_to_key, full_name
@@ -14,12 +19,176 @@ from juniorguru.lib.async_utils import call_async
 
 CACHE_DIR = ".cache"
 
+MEMORY_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+MEMORY_CACHE_TTL = timedelta(minutes=30).total_seconds()
+
 
 logger = loggers.from_path(__file__)
 
 _cache_instances = {}
 
 
+class MemoryCache:
+    """
+    Bounded in-process LRU cache, meant to sit in front of the disk cache.
+    Values are kept pickled, so that every hit returns a fresh copy
+    the same way diskcache does, and so that the size is known.
+    """
+
+    def __init__(
+        self, max_bytes: int = MEMORY_CACHE_MAX_BYTES, ttl: float = MEMORY_CACHE_TTL
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self._data: OrderedDict[Hashable, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = ENOVAL) -> Any:
+        with self._lock:
+            try:
+                expire_at, value_bytes = self._data[key]
+            except KeyError:
+                return default
+            if expire_at <= time.time():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+        return pickle.loads(value_bytes)
+
+    def set(self, key: Hashable, value: Any, expire_at: float | None = None) -> None:
+        value_bytes = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(value_bytes) > self.max_bytes:
+            return
+        expire_at = min(
+            float("inf") if expire_at is None else expire_at, time.time() + self.ttl
+        )
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expire_at, value_bytes)
+            self.size += len(value_bytes)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, value_bytes = self._data.pop(key)
+        self.size -= len(value_bytes)
+
+
+class CacheStats:
+    def __init__(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.lookup_ns = 0
+        self.compute_ns = 0
+
+    @property
+    def calls(self) -> int:
+        return self.memory_hits + self.disk_hits + self.misses + self.shared
+
+    def __str__(self) -> str:
+        lookup_ms = self.lookup_ns / 1_000_000 / max(self.calls, 1)
+        compute_s = self.compute_ns / 1_000_000_000 / max(self.misses, 1)
+        return (
+            f"{self.calls} calls, "
+            f"{self.memory_hits} memory hits, "
+            f"{self.disk_hits} disk hits, "
+            f"{self.misses} misses, "
+            f"{self.shared} shared in-flight, "
+            f"lookup {lookup_ms:.2f}ms avg, "
+            f"compute {compute_s:.2f}s avg"
+        )
+
+
+class KeyLocks:
+    """
+    Per-key locks, kept only for as long as someone holds or waits for them,
+    so that the number of locks doesn't grow with the number of keys ever used
+    """
+
+    def __init__(self):
+        self._locks: dict[Hashable, list] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Generator[None, None, None]:
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+class InFlightCalls:
+    """
+    Lets concurrent identical async calls share one computation
+
+    The first call with a key computes the result, calls with the same key
+    arriving before it finishes wait for it and get a copy of its result,
+    or the same exception.
+    """
+
+    def __init__(self):
+        self._futures: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._futures
+
+    async def share(self, key: Hashable, compute: Callable[[], Awaitable]) -> Any:
+        if future := self._futures.get(key):
+            result = await asyncio.shield(future)
+            return pickle.loads(pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+        future = self._futures[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await compute()
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # prevents 'exception was never retrieved'
+            raise
+        finally:
+            del self._futures[key]
+
+
+_memory_cache = MemoryCache()
+
+_stats = defaultdict(CacheStats)
+
+
+def get_memory_cache() -> MemoryCache:
+    return _memory_cache
+
+
+def get_stats() -> dict[str | None, CacheStats]:
+    return dict(_stats)
+
+
 def get_cache(cache_dir=CACHE_DIR) -> Cache:
     try:
         cache = _cache_instances[cache_dir]
@@ -30,6 +199,9 @@ def get_cache(cache_dir=CACHE_DIR) -> Cache:
 
 
 def close_cache() -> None:
+    for tag, stats in sorted(get_stats().items(), key=lambda item: str(item[0])):
+        logger.debug(f"Cache stats for {tag or 'untagged'}: {stats}")
+    _memory_cache.clear()
     if caches := _cache_instances.values():
         logger.debug("Cache clean up")
         for cache in caches:
@@ -47,29 +219,93 @@ def cache(
 
     def decorator(fn: Callable) -> Callable:
         cache = get_cache()
+        memory_cache = get_memory_cache()
+        stats = _stats[tag]
+        base = (full_name(fn),)
+        should_store = expire is None or expire > 0
+
+        def lookup(key: tuple) -> Any:
+            result, expire_at = cache.get(
+                key, default=ENOVAL, expire_time=True, retry=True
+            )
+            if result is not ENOVAL:
+                memory_cache.set(key, result, expire_at)
+            return result
+
+        def store(key: tuple, result: Any) -> None:
+            if should_store:
+                cache.set(key, result, expire, tag=tag, retry=True)
+                memory_cache.set(key, result, time.time() + expire if expire else None)
+
+        def make_key(*args, **kwargs) -> tuple:
+            return args_to_key(base, args, kwargs, False, ignore)
 
-        # Rewriting subset of diskcache.memoize() to support async
         if asyncio.iscoroutinefunction(fn):
-            base = (full_name(fn),)
+            in_flight = InFlightCalls()
 
             @wraps(fn)
             async def wrapper(*args, **kwargs) -> Any:
-                key = args_to_key(base, args, kwargs, False, ignore)
-                result = await call_async(cache.get, key, default=ENOVAL, retry=True)
+                key = make_key(*args, **kwargs)
+                start_ns = time.perf_counter_ns()
 
-                if result is ENOVAL:
-                    result = await fn(*args, **kwargs)
-                    if expire is None or expire > 0:
-                        await call_async(
-                            cache.set, key, result, expire, tag=tag, retry=True
-                        )
+                # Memory hits are served without touching the executor
+                result = memory_cache.get(key)
+                if result is not ENOVAL:
+                    stats.memory_hits += 1
+                    stats.lookup_ns += time.perf_counter_ns() - start_ns
+                    return result
 
-                return result
+                async def compute() -> Any:
+                    nonlocal start_ns
+                    result = await call_async(lookup, key)
+                    stats.lookup_ns += time.perf_counter_ns() - start_ns
+                    if result is ENOVAL:
+                        stats.misses += 1
+                        start_ns = time.perf_counter_ns()
+                        result = await fn(*args, **kwargs)
+                        stats.compute_ns += time.perf_counter_ns() - start_ns
+                        await call_async(store, key, result)
+                    else:
+                        stats.disk_hits += 1
+                    return result
+
+                # Concurrent identical calls share one computation
+                if key in in_flight:
+                    stats.shared += 1
+                return await in_flight.share(key, compute)
 
+            wrapper.__cache_key__ = make_key
             return wrapper
 
-        # For sync functions, we can use diskcache.memoize() directly
-        return cache.memoize(expire=expire, tag=tag, ignore=ignore)(fn)
+        locks = KeyLocks()
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs) -> Any:
+            key = make_key(*args, **kwargs)
+            start_ns = time.perf_counter_ns()
+
+            result = memory_cache.get(key)
+            if result is not ENOVAL:
+                stats.memory_hits += 1
+                stats.lookup_ns += time.perf_counter_ns() - start_ns
+                return result
+
+            # Concurrent identical calls wait for the first one to finish
+            with locks.hold(key):
+                result = lookup(key)
+                stats.lookup_ns += time.perf_counter_ns() - start_ns
+                if result is ENOVAL:
+                    stats.misses += 1
+                    start_ns = time.perf_counter_ns()
+                    result = fn(*args, **kwargs)
+                    stats.compute_ns += time.perf_counter_ns() - start_ns
+                    store(key, result)
+                else:
+                    stats.disk_hits += 1
+            return result
+
+        wrapper.__cache_key__ = make_key
+        return wrapper
 
     return decorator
 
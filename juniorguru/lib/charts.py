@@ -1,5 +1,7 @@
 import calendar
 import itertools
+import math
+from bisect import bisect_left, bisect_right
 from datetime import date, timedelta
 from functools import cache
 from numbers import Number
@@ -70,6 +72,87 @@ def per_month_breakdown(
     }
 
 
+class DailySeries:
+    """
+    Values indexed by date, loaded once and summed over arbitrary date ranges
+
+    Keeps the dates sorted along with prefix sums of the values, so that
+    both sum and count over any closed range take two binary searches
+    instead of a database query.
+    """
+
+    def __init__(
+        self, items: Iterable[tuple[date, Number]] = (), include_end: bool = True
+    ):
+        self.include_end = include_end
+        items = sorted(items, key=lambda item: item[0])
+        self.dates = [item[0] for item in items]
+        self.sums = list(itertools.accumulate((item[1] for item in items), initial=0))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def _indexes(self, from_date: date, to_date: date) -> tuple[int, int]:
+        bisect_end = bisect_right if self.include_end else bisect_left
+        return (bisect_left(self.dates, from_date), bisect_end(self.dates, to_date))
+
+    def sum(self, from_date: date, to_date: date) -> Number:
+        start, end = self._indexes(from_date, to_date)
+        return self.sums[end] - self.sums[start] if end > start else 0
+
+    def count(self, from_date: date, to_date: date) -> int:
+        start, end = self._indexes(from_date, to_date)
+        return max(end - start, 0)
+
+
+class DailyBreakdown:
+    """Like DailySeries, but values are summed separately per category"""
+
+    def __init__(self, items: Iterable[tuple[date, str, Number]] = ()):
+        grouped = {}
+        for item_date, category, value in items:
+            grouped.setdefault(category, []).append((item_date, value))
+        self.total = DailySeries(itertools.chain.from_iterable(grouped.values()))
+        self.series = {
+            category: DailySeries(category_items)
+            for category, category_items in grouped.items()
+        }
+
+    def sum(self, from_date: date, to_date: date) -> dict[str, Number]:
+        return {
+            category: series.sum(from_date, to_date)
+            for category, series in self.series.items()
+            if series.count(from_date, to_date)
+        }
+
+
+def monthly_sum(
+    series: DailySeries | DailyBreakdown,
+) -> Callable[[date], Number | dict[str, Number]]:
+    return lambda date: series.sum(*month_range(date))
+
+
+def monthly_count(series: DailySeries) -> Callable[[date], int]:
+    return lambda date: series.count(*month_range(date))
+
+
+def ttm_sum_avg(series: DailySeries) -> Callable[[date], int]:
+    return lambda date: math.ceil(series.sum(*ttm_range(date)) / 12.0)
+
+
+def ttm_count_avg(series: DailySeries) -> Callable[[date], int]:
+    return lambda date: math.ceil(series.count(*ttm_range(date)) / 12.0)
+
+
+def ttm_count_ptc(part: DailySeries, total: DailySeries) -> Callable[[date], int]:
+    def ptc(date: date) -> int:
+        if count := total.count(*ttm_range(date)):
+            return math.ceil((part.count(*ttm_range(date)) / count) * 100)
+        return 0
+
+    return ptc
+
+
 @cache
 def ttm_range(date: date) -> tuple[date, date]:
     try:
@@ -24,12 +24,13 @@ def async_command(fn: Callable[..., Awaitable]) -> Callable:
     @wraps(fn)
     def wrapper(*args, **kwargs):
         exc = None
+        result = None
 
         def run():
+            nonlocal exc, result
             try:
-                asyncio.run(fn(*args, **kwargs))
+                result = asyncio.run(fn(*args, **kwargs))
             except Exception as e:
-                nonlocal exc
                 exc = e
 
         thread = threading.Thread(target=run)
@@ -38,5 +39,6 @@ def async_command(fn: Callable[..., Awaitable]) -> Callable:
 
         if exc:
             raise exc
+        return result
 
     return wrapper
@@ -0,0 +1,115 @@
+import hashlib
+import sqlite3
+from glob import glob
+from pathlib import Path
+from typing import Any, Iterable
+
+from diskcache.core import DBNAME
+from peewee import Database, Model, OperationalError
+
+
+def fingerprint(
+    files: Iterable[str | Path] = (),
+    tables: Iterable[type[Model]] = (),
+    cache_tags: Iterable[str] = (),
+    cache_dir: str | Path | None = None,
+) -> str:
+    """
+    Computes a hash of the given inputs: contents of files (glob patterns
+    are supported), contents of database tables, and keys and store times
+    of cache entries with given tags
+    """
+    hash = hashlib.sha256()
+    for path in expand_paths(files):
+        hash.update(f"file:{path}\n".encode())
+        hash.update(path.read_bytes())
+    for model in tables:
+        hash.update(f"table:{model._meta.table_name}\n".encode())
+        for row in read_table(model):
+            hash.update(repr(row).encode())
+    if cache_tags:
+        cache_tags = sorted(cache_tags)
+        with sqlite3.connect(Path(cache_dir) / DBNAME) as connection:
+            for tag in cache_tags:
+                hash.update(f"cache:{tag}\n".encode())
+                rows = connection.execute(
+                    "SELECT key, store_time FROM Cache WHERE tag = ? ORDER BY key",
+                    (tag,),
+                )
+                for row in rows:
+                    hash.update(repr(row).encode())
+    return hash.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hash_bytes(text.encode())
+
+
+def hash_file(path: str | Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def expand_paths(patterns: Iterable[str | Path]) -> list[Path]:
+    paths = set()
+    for pattern in map(str, patterns):
+        if any(char in pattern for char in "*?["):
+            paths.update(
+                Path(path)
+                for path in glob(pattern, recursive=True)
+                if Path(path).is_file()
+            )
+        else:
+            paths.add(Path(pattern))
+    return sorted(paths)
+
+
+def fingerprint_table(database: Database, table_name: str) -> str:
+    """Computes a hash of contents of a single database table given by name"""
+    hash = hashlib.sha256()
+    for row in read_rows(database, table_name):
+        hash.update(repr(row).encode())
+    return hash.hexdigest()
+
+
+def read_table(model: type[Model]) -> Iterable[tuple]:
+    return read_rows(model._meta.database, model._meta.table_name)
+
+
+def read_rows(database: Database, table_name: str) -> Iterable[tuple]:
+    try:
+        cursor = database.execute_sql(f'SELECT * FROM "{table_name}" ORDER BY rowid')
+    except OperationalError:
+        return [("missing",)]
+    return cursor.fetchall()
+
+
+def dump_tables(models: Iterable[type[Model]]) -> dict[str, dict[str, Any]]:
+    data = {}
+    for model in models:
+        cursor = model._meta.database.execute_sql(
+            f'SELECT * FROM "{model._meta.table_name}" ORDER BY rowid'
+        )
+        columns = [column[0] for column in cursor.description]
+        data[model._meta.table_name] = dict(columns=columns, rows=cursor.fetchall())
+    return data
+
+
+def restore_tables(models: Iterable[type[Model]], data: dict[str, dict[str, Any]]):
+    models = list(models)
+    database = models[0]._meta.database if models else None
+    for model in models:
+        table_data = data[model._meta.table_name]
+        columns = ", ".join(f'"{column}"' for column in table_data["columns"])
+        placeholders = ", ".join("?" for _ in table_data["columns"])
+        with database.atomic():
+            model.drop_table()
+            model.create_table()
+            database.cursor().executemany(
+                f'INSERT INTO "{model._meta.table_name}" ({columns}) VALUES ({placeholders})',
+                table_data["rows"],
+            )
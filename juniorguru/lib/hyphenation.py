@@ -0,0 +1,49 @@
+import json
+import subprocess
+from contextlib import suppress
+from typing import Sequence
+
+
+HYPHENATE_COMMAND = ["node", "juniorguru/js/hyphenate.cjs"]
+
+
+class Hyphenator:
+    """
+    Long-lived Node.js worker hyphenating HTML
+
+    Starting Node.js is slow compared to the hyphenation itself, so the
+    worker keeps running and receives documents in batches, one JSON
+    array per line. See juniorguru/js/hyphenate.cjs
+    """
+
+    def __init__(self, command: Sequence[str] = HYPHENATE_COMMAND):
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+
+    def __enter__(self) -> "Hyphenator":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def hyphenate(self, documents: Sequence[str]) -> list[str]:
+        if not documents:
+            return []
+        try:
+            self.process.stdin.write(json.dumps(list(documents)).encode() + b"\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except BrokenPipeError:
+            line = b""
+        if not line:
+            raise RuntimeError(
+                f"Hyphenation worker exited with code {self.process.wait()}"
+            )
+        return json.loads(line)
+
+    def close(self) -> None:
+        with suppress(BrokenPipeError):
+            self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
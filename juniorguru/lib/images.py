@@ -1,8 +1,12 @@
+import atexit
 import mimetypes
 import os
-import pickle
+import re
 import shutil
+import threading
 import time
+from datetime import timedelta
+from functools import cache
 from hashlib import sha256
 from io import BytesIO
 from pathlib import Path
@@ -11,14 +15,19 @@ from typing import Any, Callable
 
 from jinja2 import Environment, FileSystemLoader
 from PIL import Image
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import Error as PlaywrightError, sync_playwright
 
 from juniorguru.lib import loggers
 from juniorguru.lib.cache import get_jinja_cache
+from juniorguru.lib.fingerprints import hash_file
 
 
 CACHE_DIR = Path(".image_templates_cache")
 
+RENDER_CACHE_DIR = Path(".cache/image_renders")
+
+RENDER_CACHE_MAX_AGE = timedelta(days=30)
+
 IMAGES_DIR = Path("juniorguru/images")
 
 TEMPLATES_DIR = Path("juniorguru/image_templates")
@@ -68,18 +77,128 @@ def render_image_file(
     output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True, parents=True)
 
-    cache_key = (width, height, template_name, context)
-    hash = sha256(pickle.dumps(cache_key)).hexdigest()
+    renderer = get_renderer()
+    html = renderer.render_html(template_name, context, filters)
+    key = get_render_key(width, height, html)
 
-    image_name = "-".join(filter(None, [prefix, hash, suffix])) + ".png"
+    image_name = "-".join(filter(None, [prefix, key, suffix])) + ".png"
     image_path = output_dir / image_name
 
-    if not image_path.exists():
-        image_bytes = render_template(width, height, template_name, context, filters)
+    if image_path.exists():
+        if not render_cache.touch(key):
+            render_cache.set(key, image_path.read_bytes())
+    else:
+        if (image_bytes := render_cache.get(key)) is None:
+            image_bytes = renderer.render_png(width, height, template_name, html)
+            render_cache.set(key, image_bytes)
         image_path.write_bytes(image_bytes)
     return image_path
 
 
+def get_render_key(width: int, height: int, html: str) -> str:
+    """
+    Computes a hash of everything which affects how the image looks
+
+    Hashing the HTML covers the template source as well as the context.
+    Absolute paths to images differ between machines, so the HTML gets
+    hashed without them and contents of the referenced images get hashed
+    instead. Together with the hash of the CSS bundle this makes the key
+    change whenever the image would change.
+    """
+    hash = sha256(f"{width}x{height}\n{get_css_hash(CACHE_DIR)}\n".encode())
+    images_dir = str(IMAGES_DIR.absolute())
+    hash.update(html.replace(images_dir, "").encode())
+    for image_path in sorted(
+        set(re.findall(re.escape(images_dir) + r"/([^\"'\s)]+)", html))
+    ):
+        hash.update(
+            f"\n{image_path}:{get_image_hash(IMAGES_DIR / image_path)}".encode()
+        )
+    return hash.hexdigest()
+
+
+@cache
+def get_css_hash(cache_dir: Path) -> str:
+    paths = sorted(cache_dir.glob("*.css")) + sorted(cache_dir.glob("assets/*"))
+    if not paths:
+        raise FileNotFoundError(
+            f"Cache {cache_dir.absolute()} does not exist, run init_templates_cache() before rendering"
+        )
+    hash = sha256()
+    for path in paths:
+        hash.update(f"{path.relative_to(cache_dir)}\n".encode())
+        hash.update(path.read_bytes())
+    return hash.hexdigest()
+
+
+def get_image_hash(path: Path) -> str:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    return get_image_hash_version(path, stat.st_mtime_ns, stat.st_size)
+
+
+@cache
+def get_image_hash_version(path: Path, mtime_ns: int, size: int) -> str:
+    # The modification time and size are part of the memo key, so that
+    # a file changed while the process runs gets hashed again
+    try:
+        return hash_file(path)
+    except FileNotFoundError:
+        return "missing"
+
+
+class RenderCache:
+    """
+    Rendered images shared by all commands, addressed by their render keys
+
+    Every hit touches the file, so its modification time says when it was
+    last used and images nobody asked for in a while can be removed.
+    """
+
+    def __init__(self, cache_dir: str | Path = RENDER_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def get(self, key: str) -> bytes | None:
+        if self.touch(key):
+            return (self.cache_dir / f"{key}.png").read_bytes()
+        return None
+
+    def touch(self, key: str) -> bool:
+        try:
+            os.utime(self.cache_dir / f"{key}.png")
+        except FileNotFoundError:
+            return False
+        return True
+
+    def set(self, key: str, image_bytes: bytes) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Writing and renaming, so that concurrent processes never
+        # read a half-written image
+        temp_path = self.cache_dir / f"{key}.{os.getpid()}-{threading.get_ident()}.tmp"
+        temp_path.write_bytes(image_bytes)
+        temp_path.rename(self.cache_dir / f"{key}.png")
+
+    def collect_garbage(self, max_age: timedelta = RENDER_CACHE_MAX_AGE) -> None:
+        # Concurrent sync processes may collect the same images, so any of
+        # them can disappear between listing and removing them
+        min_mtime = time.time() - max_age.total_seconds()
+        paths = []
+        for path in self.cache_dir.glob("*.png"):
+            try:
+                if path.stat().st_mtime < min_mtime:
+                    paths.append(path)
+            except FileNotFoundError:
+                pass
+        logger.info(f"Removing {len(paths)} images unused for {max_age.days} days")
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+
+render_cache = RenderCache()
+
+
 def render_template(
     width: int,
     height: int,
@@ -87,59 +206,157 @@ def render_template(
     context: dict[str, Any],
     filters: dict[str, Callable] = None,
 ) -> bytes:
-    logger.info(f"Rendering {width}x{height} {template_name}")
-    if not len(list(CACHE_DIR.glob("*.css"))):
-        raise FileNotFoundError(
-            f"Cache {CACHE_DIR.absolute()} does not exist, run init_templates_cache() before rendering"
-        )
-    t = time.perf_counter()
+    return get_renderer().render(width, height, template_name, context, filters)
+
+
+def get_renderer() -> "Renderer":
+    # Playwright objects can't be shared across threads or processes,
+    # so every thread of every process gets its own renderer
+    try:
+        renderer = _renderers.instance
+    except AttributeError:
+        renderer = None
+    if renderer is None or renderer.pid != os.getpid():
+        renderer = _renderers.instance = Renderer()
+        atexit.register(renderer.close)
+    return renderer
+
+
+_renderers = threading.local()
+
+
+class Renderer:
+    """
+    Renders image templates to PNG in a long-lived headless browser
 
-    environment = Environment(
-        loader=FileSystemLoader(str(TEMPLATES_DIR)),
-        auto_reload=False,
-        bytecode_cache=get_jinja_cache(),
-    )
-    environment.filters.update(filters or {})
-    template = environment.get_template(template_name)
-
-    logger.info("Jinja rendering")
-    html = template.render(images_dir=IMAGES_DIR.absolute(), **context)
-    html_path = (
-        CACHE_DIR.absolute() / f"{os.getpid()}-{time.perf_counter_ns()}-{template_name}"
-    )
-    html_path.write_text(html)
-
-    logger.info(f"Taking screenshot {width}x{height} {html_path}")
-    with sync_playwright() as playwright:
-        browser = playwright.firefox.launch()
+    Launching Firefox takes seconds, which is more than rendering
+    an image, so the browser and its page get started with the first
+    image and then reused for all the following ones.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.environment = Environment(
+            loader=FileSystemLoader(str(TEMPLATES_DIR)),
+            auto_reload=False,
+            bytecode_cache=get_jinja_cache(),
+        )
+        self.playwright = None
+        self.browser = None
+        self.page = None
+        self.images_count = 0
+        self.time = 0
+
+    @property
+    def images_per_sec(self) -> float:
+        return self.images_count / self.time if self.time else 0
+
+    @property
+    def avg_latency(self) -> float:
+        return self.time / self.images_count if self.images_count else 0
+
+    def start(self) -> None:
+        logger.info("Launching browser")
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.firefox.launch()
+        self.page = self.browser.new_page()
+
+    def close(self) -> None:
+        if self.playwright is None:
+            return
+        logger.debug(
+            f"Closing browser after rendering {self.images_count} images, "
+            f"{self.images_per_sec:.1f} images/s"
+        )
         try:
-            page = browser.new_page()
-            page.set_viewport_size({"width": width, "height": height})
-            page.goto(f"file://{html_path}", wait_until="networkidle")
-            image_bytes = page.screenshot()
-            page.close()
-        finally:
-            browser.close()
-    # html_path.unlink()
+            self.browser.close()
+            self.playwright.stop()
+        except Exception as e:
+            logger.debug(f"Could not close browser: {e!r}")
+        self.playwright = None
+        self.browser = None
+        self.page = None
+
+    def render(
+        self,
+        width: int,
+        height: int,
+        template_name: str,
+        context: dict[str, Any],
+        filters: dict[str, Callable] = None,
+    ) -> bytes:
+        html = self.render_html(template_name, context, filters)
+        return self.render_png(width, height, template_name, html)
+
+    def render_html(
+        self,
+        template_name: str,
+        context: dict[str, Any],
+        filters: dict[str, Callable] = None,
+    ) -> str:
+        logger.debug(f"Jinja rendering {template_name}")
+        self.environment.filters.update(filters or {})
+        template = self.environment.get_template(template_name)
+        return template.render(images_dir=IMAGES_DIR.absolute(), **context)
+
+    def render_png(
+        self, width: int, height: int, template_name: str, html: str
+    ) -> bytes:
+        logger.info(f"Rendering {width}x{height} {template_name}")
+        if not len(list(CACHE_DIR.glob("*.css"))):
+            raise FileNotFoundError(
+                f"Cache {CACHE_DIR.absolute()} does not exist, run init_templates_cache() before rendering"
+            )
+        t = time.perf_counter()
 
-    logger.info("Editing screenshot")
-    with Image.open(BytesIO(image_bytes)) as image:
-        height_ar = (image.height * width) // image.width
-        image = image.resize((width, height_ar), Image.Resampling.BICUBIC)
-        image = image.crop((0, 0, width, height))
+        html_path = (
+            CACHE_DIR.absolute()
+            / f"{os.getpid()}-{time.perf_counter_ns()}-{template_name}"
+        )
+        html_path.write_text(html)
 
-        stream = BytesIO()
-        image.save(stream, "PNG", optimize=True)
-    image_bytes = stream.getvalue()
+        logger.info(f"Taking screenshot {width}x{height} {html_path}")
+        try:
+            image_bytes = self.screenshot(width, height, html_path)
+        except PlaywrightError as e:
+            logger.warning(f"Restarting browser after error: {e!r}")
+            self.close()
+            image_bytes = self.screenshot(width, height, html_path)
+        # html_path.unlink()
+
+        logger.info("Editing screenshot")
+        with Image.open(BytesIO(image_bytes)) as image:
+            height_ar = (image.height * width) // image.width
+            image = image.resize((width, height_ar), Image.Resampling.BICUBIC)
+            image = image.crop((0, 0, width, height))
+
+            stream = BytesIO()
+            image.save(stream, "PNG", optimize=True)
+        image_bytes = stream.getvalue()
+
+        t = time.perf_counter() - t
+        self.time += t
+        self.images_count += 1
+        logger.info(
+            f"Rendered {template_name} in {t:.2f}s, "
+            f"{self.images_count} images so far, "
+            f"{self.avg_latency:.2f}s avg, {self.images_per_sec:.1f} images/s"
+        )
+        return image_bytes
 
-    logger.info(f"Rendered {template_name} in {time.perf_counter() - t:.2f}s")
-    return image_bytes
+    def screenshot(self, width: int, height: int, html_path: Path) -> bytes:
+        if self.playwright is None:
+            self.start()
+        self.page.set_viewport_size({"width": width, "height": height})
+        self.page.goto(f"file://{html_path}", wait_until="networkidle")
+        return self.page.screenshot()
 
 
 def init_templates_cache(cache_dir=None):
     cache_dir = Path(cache_dir or CACHE_DIR).absolute()
     t = time.perf_counter()
 
+    get_css_hash.cache_clear()
     logger.debug(f"Removing cache: {cache_dir}")
     shutil.rmtree(cache_dir, ignore_errors=True)
 
@@ -159,11 +376,12 @@ class PostersCache:
         self.generated_paths = set()
 
     def init(self, clear: bool = False):
+        self.existing_paths.update(self.posters_dir.glob("*.png"))
         if clear:
             logger.warning("Removing all existing posters")
             for path in self.existing_paths:
                 path.unlink()
-        self.existing_paths.update(self.posters_dir.glob("*.png"))
+            self.existing_paths.clear()
 
     def record(self, path: Path):
         self.generated_paths.add(path)
@@ -2,10 +2,15 @@ import asyncio
 import json
 import logging
 import os
+import re
+import unicodedata
+from contextlib import asynccontextmanager
 from datetime import timedelta
-from functools import lru_cache
+from functools import lru_cache, partial
+from typing import AsyncGenerator, Callable
 
 from openai import AsyncOpenAI, InternalServerError, RateLimitError
+from openai.types.chat import ChatCompletion
 from tenacity import (
     before_sleep_log,
     retry,
@@ -16,16 +21,44 @@ from tenacity import (
 )
 
 from juniorguru.lib import loggers
-from juniorguru.lib.cache import cache
+from juniorguru.lib.async_utils import call_async
+from juniorguru.lib.cache import InFlightCalls, cache, get_cache
+from juniorguru.lib.fingerprints import hash_text
 from juniorguru.lib.mutations import mutates
 
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
+MODEL = "gpt-3.5-turbo-1106"
 
-logger = loggers.from_path(__file__)
+CHARS_PER_TOKEN = 4
+
+TOKENS_IN_FLIGHT = 40_000
+
+COMPLETION_TOKENS = 150
+
+BATCH_SIZE = 8
+
+BATCH_TOKENS = 8_000
+
+BATCH_DELAY = 1
+
+CLASSIFICATION_EXPIRE = timedelta(days=60)
 
-limit = asyncio.Semaphore(4)
+BATCH_PROMPT = """
+The user message contains several inputs, each starting with a line
+such as "### ID: 1". Reply to each of them separately, as described above.
+Reply with a single valid JSON object with the key "answers" containing
+a list of the replies. Each reply must have the key "id" with the ID
+of the input it belongs to.
+"""
+
+URL_RE = re.compile(r"https?://\S+")
+
+NON_WORD_RE = re.compile(r"\W+")
+
+
+logger = loggers.from_path(__file__)
 
 
 @lru_cache
@@ -41,44 +74,271 @@ retry_defaults = dict(
 )
 
 
+def retry_openai(fn: Callable) -> Callable:
+    for decorator in [
+        retry(
+            retry=retry_if_exception_type(InternalServerError),
+            wait=wait_random_exponential(min=60, max=5 * 60),
+            **retry_defaults,
+        ),
+        retry(
+            retry=(
+                retry_if_exception_type(RateLimitError)
+                & retry_if_exception(lambda exception: exception.type == "tokens")
+            ),
+            wait=wait_random_exponential(min=60, max=5 * 60),
+            **retry_defaults,
+        ),
+        retry(
+            retry=(
+                retry_if_exception_type(RateLimitError)
+                & retry_if_exception(
+                    lambda exception: exception.type == "requests"
+                    and "requests per day" not in exception.message
+                )
+            ),
+            wait=wait_random_exponential(min=1, max=60),
+            **retry_defaults,
+        ),
+    ]:
+        fn = decorator(fn)
+    return fn
+
+
+class TokenLimit:
+    """
+    Limits how many tokens can be sent to the API at the same time
+
+    Unlike a semaphore counting requests, this lets many small requests
+    run concurrently, while large ones wait until there's enough room
+    under the rate limit of the API.
+    """
+
+    def __init__(self, max_tokens: int = TOKENS_IN_FLIGHT):
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int) -> AsyncGenerator[None, None]:
+        tokens = min(tokens, self.max_tokens)
+        async with self.condition:
+            await self.condition.wait_for(
+                lambda: self.tokens + tokens <= self.max_tokens
+            )
+            self.tokens += tokens
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.tokens -= tokens
+                self.condition.notify_all()
+
+
+limit = TokenLimit()
+
+
+def count_tokens(text: str) -> int:
+    """Roughly estimates the number of tokens the text takes"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
 @mutates("openai", raises=True)
-@retry(
-    retry=(
-        retry_if_exception_type(RateLimitError)
-        & retry_if_exception(
-            lambda exception: exception.type == "requests"
-            and "requests per day" not in exception.message
-        )
-    ),
-    wait=wait_random_exponential(min=1, max=60),
-    **retry_defaults,
-)
-@retry(
-    retry=(
-        retry_if_exception_type(RateLimitError)
-        & retry_if_exception(lambda exception: exception.type == "tokens")
-    ),
-    wait=wait_random_exponential(min=60, max=5 * 60),
-    **retry_defaults,
-)
-@retry(
-    retry=retry_if_exception_type(InternalServerError),
-    wait=wait_random_exponential(min=60, max=5 * 60),
-    **retry_defaults,
-)
+@retry_openai
 @cache(expire=timedelta(days=60), tag="llm-opinion")
 async def ask_for_json(system_prompt: str, user_prompt: str) -> dict:
-    client = get_client()
-    async with limit:
-        completion = await client.chat.completions.create(
-            model="gpt-3.5-turbo-1106",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format=dict(type="json_object"),
-        )
+    tokens = count_tokens(system_prompt + user_prompt) + COMPLETION_TOKENS
+    async with limit.reserve(tokens):
+        completion = await create_completion(system_prompt, user_prompt)
     choice = completion.choices[0]
     data = json.loads(choice.message.content)
     data["finish_reason"] = choice.finish_reason
     return data
+
+
+@mutates("openai", raises=True)
+@retry_openai
+async def ask_for_json_batch(
+    system_prompt: str, user_prompts: list[str]
+) -> list[dict | None]:
+    """
+    Asks for a JSON reply to each of the user prompts, all in a single request
+
+    Returns replies in the same order as the prompts. If the reply to
+    a prompt is missing in the response, None is at its place.
+    """
+    user_prompt = "\n\n".join(
+        f"### ID: {i}\n\n{prompt}" for i, prompt in enumerate(user_prompts)
+    )
+    tokens = count_tokens(system_prompt + BATCH_PROMPT + user_prompt) + (
+        COMPLETION_TOKENS * len(user_prompts)
+    )
+    async with limit.reserve(tokens):
+        completion = await create_completion(system_prompt + BATCH_PROMPT, user_prompt)
+    choice = completion.choices[0]
+    try:
+        answers = json.loads(choice.message.content)["answers"]
+    except (ValueError, KeyError, TypeError):
+        logger["batch"].warning(
+            f"Unable to parse reply to {len(user_prompts)} prompts, "
+            f"finish reason: {choice.finish_reason}"
+        )
+        answers = []
+
+    replies = [None] * len(user_prompts)
+    for answer in answers:
+        try:
+            i = int(answer.pop("id"))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+        if 0 <= i < len(replies):
+            answer["finish_reason"] = choice.finish_reason
+            replies[i] = answer
+    return replies
+
+
+async def create_completion(system_prompt: str, user_prompt: str) -> ChatCompletion:
+    return await get_client().chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format=dict(type="json_object"),
+    )
+
+
+class BatchClassifier:
+    """
+    Asks for a JSON reply to many texts, packing several of them to one request
+
+    Texts are normalized and fingerprinted, so that the same text coming
+    from several sources, differing only in whitespace, letter case, or
+    punctuation, gets asked about only once. Pending texts are packed
+    to one prompt until there's enough of them, they take too many tokens,
+    or some time passes. Replies are cached per text. Replies cached back
+    when each text was asked about in a separate request are used as well.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        batch_size: int = BATCH_SIZE,
+        batch_tokens: int = BATCH_TOKENS,
+        batch_delay: float = BATCH_DELAY,
+        expire: timedelta = CLASSIFICATION_EXPIRE,
+    ):
+        self.system_prompt = system_prompt
+        self.prompt_hash = hash_text(system_prompt)
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.batch_delay = batch_delay
+        self.expire = expire.total_seconds()
+        self.pending: dict[str, tuple[str, asyncio.Future]] = {}
+        self.pending_tokens = 0
+        self.in_flight = InFlightCalls()
+        self.timer = None
+        self.tasks = set()
+        self.requests_count = 0
+        self.texts_count = 0
+        self.shared_count = 0
+        self.cached_count = 0
+
+    async def classify(self, text: str) -> dict:
+        self.texts_count += 1
+        key = get_fingerprint(text)
+        if key in self.in_flight:
+            self.shared_count += 1
+        return dict(await self.in_flight.share(key, partial(self.compute, key, text)))
+
+    async def compute(self, key: str, text: str) -> dict:
+        result = await call_async(self.get_cached, key)
+        if result is None:
+            result = await call_async(self.get_cached_single, text)
+        if result is None:
+            future = asyncio.get_running_loop().create_future()
+            self.add(key, text, future)
+            return await asyncio.shield(future)
+        self.cached_count += 1
+        return result
+
+    def add(self, key: str, text: str, future: asyncio.Future) -> None:
+        tokens = count_tokens(text)
+        if self.pending and self.pending_tokens + tokens > self.batch_tokens:
+            self.flush()
+        self.pending[key] = (text, future)
+        self.pending_tokens += tokens
+        if (
+            len(self.pending) >= self.batch_size
+            or self.pending_tokens >= self.batch_tokens
+        ):
+            self.flush()
+        elif not self.timer:
+            loop = asyncio.get_running_loop()
+            self.timer = loop.call_later(self.batch_delay, self.flush)
+
+    def flush(self) -> None:
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            task = asyncio.create_task(self.send(self.pending))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.pending = {}
+        self.pending_tokens = 0
+
+    async def send(self, batch: dict[str, tuple[str, asyncio.Future]]) -> None:
+        keys = list(batch.keys())
+        texts = [text for text, _ in batch.values()]
+        self.requests_count += 1
+        logger["batch"].debug(
+            f"Asking about {len(texts)} texts in one request, "
+            f"{self.texts_count} texts so far: {self.requests_count} requests, "
+            f"{self.cached_count} cached, {self.shared_count} duplicates"
+        )
+        try:
+            results = await ask_for_json_batch(self.system_prompt, texts)
+        except BaseException as exc:
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for key, text, result in zip(keys, texts, results):
+            future = batch[key][1]
+            try:
+                if result is None:
+                    logger["batch"].debug("Reply missing in the batch, asking again")
+                    self.requests_count += 1
+                    result = await ask_for_json(self.system_prompt, text)
+                await call_async(self.set_cached, key, result)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    def get_cached(self, key: str) -> dict | None:
+        return get_cache().get(("llm-classification", self.prompt_hash, key))
+
+    def get_cached_single(self, text: str) -> dict | None:
+        return get_cache().get(ask_for_json.__cache_key__(self.system_prompt, text))
+
+    def set_cached(self, key: str, result: dict) -> None:
+        get_cache().set(
+            ("llm-classification", self.prompt_hash, key),
+            result,
+            expire=self.expire,
+            tag="llm-opinion",
+        )
+
+
+def get_fingerprint(text: str) -> str:
+    return hash_text(normalize_text(text))
+
+
+def normalize_text(text: str) -> str:
+    text = URL_RE.sub(" ", unicodedata.normalize("NFC", text).lower())
+    return NON_WORD_RE.sub(" ", text).strip()
@@ -1,10 +1,18 @@
 import re
-from functools import lru_cache, wraps
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache, partial, wraps
+from typing import Callable, Iterable
 
 import requests
+from diskcache.core import ENOVAL
 from lxml import etree
+from requests.adapters import HTTPAdapter
 
 from juniorguru.lib import loggers
+from juniorguru.lib.cache import get_cache
 
 
 logger = loggers.from_path(__file__)
@@ -82,15 +90,46 @@ ADDRESS_TYPES_MAPPING = {
 
 RETRY_ON_503_MAX_SECONDS = 3
 
+GEOCODING_WORKERS = 8
+
+GEOCODING_REQUESTS_PER_SEC = 10
+
+GEOCODING_EXPIRE = timedelta(days=90)
+
+GEOCODING_EMPTY_EXPIRE = timedelta(days=7)
+
 
 class GeocodeError(Exception):
     pass
 
 
 def fetch_locations(locations_raw, **kwargs):
-    parse_results = [
+    return to_locations(
         fetch_location(location_raw, **kwargs) for location_raw in locations_raw
-    ]
+    )
+
+
+def fetch_locations_bulk(
+    locations_raw: Iterable[str],
+    geocode: Callable | None = None,
+    workers: int = GEOCODING_WORKERS,
+) -> dict[str, tuple[str, str] | None]:
+    """
+    Geocodes each of the unique locations only once, concurrently
+
+    Returns a mapping of raw locations to parse results, which can be
+    turned into locations using to_locations().
+    """
+    locations_raw = sorted(set(locations_raw))
+    logger.debug(f"Geocoding {len(locations_raw)} unique locations")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        parse_results = executor.map(
+            partial(fetch_location, geocode=geocode), locations_raw
+        )
+        return dict(zip(locations_raw, parse_results))
+
+
+def to_locations(parse_results: Iterable[tuple[str, str] | None]) -> list[dict]:
     parse_results = set(filter(None, parse_results))
     return [dict(name=name, region=region) for name, region in parse_results]
 
@@ -116,19 +155,84 @@ def optimize_geocoding(geocode):
         for location_re, value in OPTIMIZATIONS:
             if location_re.search(location_raw):
                 return value
-        return lru_cache(geocode)(location_raw)
+        return geocode(location_raw)
+
+    return wrapper
+
+
+def cache_geocoding(geocode):
+    """
+    Persistently caches results of geocoding, keyed by normalized location
+
+    Locations which can't be found are cached too, but for a shorter time.
+    Errors aren't cached at all.
+    """
+
+    @wraps(geocode)
+    def wrapper(location_raw):
+        cache = get_cache()
+        key = ("geocoding", normalize_location(location_raw))
+        address = cache.get(key, default=ENOVAL, retry=True)
+        if address is ENOVAL:
+            address = geocode(location_raw)
+            expire = GEOCODING_EXPIRE if address else GEOCODING_EMPTY_EXPIRE
+            cache.set(
+                key,
+                address,
+                expire=expire.total_seconds(),
+                tag="geocoding",
+                retry=True,
+            )
+        else:
+            logger.debug(f"Geocoding '{location_raw}' cached: {address!r}")
+        return address
 
     return wrapper
 
 
+def normalize_location(location_raw: str) -> str:
+    return " ".join(location_raw.lower().split())
+
+
+class RateLimit:
+    """Thread-safe limit of how many requests can start per second"""
+
+    def __init__(self, requests_per_sec: float):
+        self.interval = 1 / requests_per_sec
+        self.next_at = 0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self.lock:
+            now = time.monotonic()
+            wait_for = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+mapycz_limit = RateLimit(GEOCODING_REQUESTS_PER_SEC)
+
+
+@lru_cache
+def get_mapycz_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update(MAPYCZ_REQUEST_HEADERS)
+    adapter = HTTPAdapter(pool_maxsize=GEOCODING_WORKERS)
+    session.mount("https://", adapter)
+    return session
+
+
 @optimize_geocoding
+@cache_geocoding
 def geocode_mapycz(location_raw):
+    session = get_mapycz_session()
     try:
         logger.debug(f"Geocoding '{location_raw}' using api.mapy.cz/v0/geocode")
-        response = requests.get(
+        mapycz_limit.wait()
+        response = session.get(
             "https://api.mapy.cz/v0/geocode",
             params={"query": location_raw},
-            headers=MAPYCZ_REQUEST_HEADERS,
             timeout=MAPYCZ_REQUEST_TIMEOUT,
         )
         response.raise_for_status()
@@ -148,10 +252,10 @@ def geocode_mapycz(location_raw):
         logger.debug(
             f"Reverse geocoding '{location_raw}' lat: {lat} lng: {lng} using api.mapy.cz/v0/rgeocode"
         )
-        response = requests.get(
+        mapycz_limit.wait()
+        response = session.get(
             "https://api.mapy.cz/v0/rgeocode",
             params={"lat": lat, "lon": lng},
-            headers=MAPYCZ_REQUEST_HEADERS,
             timeout=MAPYCZ_REQUEST_TIMEOUT,
         )
         response.raise_for_status()
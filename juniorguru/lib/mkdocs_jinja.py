@@ -1,7 +1,17 @@
+import hashlib
 from pathlib import Path
 from typing import Callable
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import (
+    BaseLoader,
+    ChoiceLoader,
+    Environment,
+    FileSystemLoader,
+    Template,
+    TemplateNotFound,
+    pass_context,
+)
+from jinja2.runtime import Context
 from mkdocs.config import Config
 from mkdocs.structure.files import File, Files
 from mkdocs.structure.pages import Page
@@ -9,7 +19,7 @@ from mkdocs.structure.toc import get_toc
 from mkdocs.utils.filters import url_filter
 
 from juniorguru.lib import loggers, template_filters
-from juniorguru.lib.cache import get_jinja_cache
+from juniorguru.lib.cache import BytecodeCache, get_jinja_cache
 
 
 TEMPLATE_FILTERS = [
@@ -76,45 +86,80 @@ def get_filters() -> dict[str, Callable]:
     return {name: getattr(template_filters, name) for name in TEMPLATE_FILTERS}
 
 
-def get_env(page: Page, config: Config, files: Files) -> Environment:
-    env = Environment(
-        loader=FileSystemLoader(get_macros_dir(config)),
-        auto_reload=False,
-        bytecode_cache=get_jinja_cache(),
-    )
-    env.filters.update(get_filters())
-    env.filters["url"] = url_filter
-    env.filters["md"] = create_md_filter(page, config, files)
-    return env
-
-
-def create_md_filter(page: Page, config: Config, files: Files) -> Callable:
-    def md(markdown: str) -> str:
-        # Sorcery ahead! So this is a Jinja filter, which takes a Markdown string, e.g. from
-        # database, and turns it into HTML markup. One could just 'from markdown import markdown',
-        # then call 'markdown(...)' and be done with it, but that wouldn't parse the input in the
-        # context of MkDocs Markdown settings. Extensions wouldn't be set the same way. Relative
-        # links wouldn't work. For that reason, we want to use the MkDocs' own Markdown rendering.
-        #
-        # Unfortunately, the Page.render() method isn't really meant to be used anywhere else:
-        # https://github.com/mkdocs/mkdocs/blob/79f17b4b71c73460c304e3281f6ff209788a76bf/mkdocs/structure/pages.py#L253
-        #
-        # The following sorcery works around that bit. It creates an artificial _Page object similar
-        # to the real MkDocs' own Page object, but only with the properties used by the Page.render()
-        # method. It sets all the configuration, passes the input as the 'markdown' property, and
-        # steals the Page.render() method to behave like if it always belonged to the _Page object.
-        # Then it calls this new _Page.render() method and returns the 'content' property, to which
-        # the method sets the result of the rendering.
-        #
-        # This works, but is very prone to get broken if MkDocs changes something in their code.
-        # In such case one needs to read the new MkDocs code and fix the solution accordingly.
-        class _Page:
-            def __init__(self):
-                self.file = page.file
-                self.markdown = markdown
-
-        _page = _Page()
-        Page._original_render(_page, config, files)
-        return _page.content
-
-    return md
+class DocsEnvironment(Environment):
+    """
+    Jinja environment shared by all pages of a single build
+
+    Page sources are loaded through a loader under names derived from
+    their hashes, so that their compiled bytecode gets cached the same
+    way as bytecode of any other template, and unchanged pages don't
+    need to be compiled again on the next build.
+    """
+
+    def __init__(self, config: Config, bytecode_cache: BytecodeCache | None = None):
+        self.pages_loader = PagesLoader()
+        super().__init__(
+            loader=ChoiceLoader(
+                [self.pages_loader, FileSystemLoader(get_macros_dir(config))]
+            ),
+            auto_reload=False,
+            bytecode_cache=bytecode_cache or get_jinja_cache(),
+        )
+        self.filters.update(get_filters())
+        self.filters["url"] = url_filter
+        self.filters["md"] = md
+
+    def from_page(self, page: Page, markdown: str) -> Template:
+        return self.get_template(self.pages_loader.add(markdown, page.file.src_uri))
+
+
+class PagesLoader(BaseLoader):
+    def __init__(self):
+        self.sources = {}
+
+    def add(self, source: str, filename: str) -> str:
+        name = f"page:{hashlib.sha256(source.encode()).hexdigest()}"
+        self.sources[name] = (source, filename)
+        return name
+
+    def get_source(self, environment: Environment, name: str):
+        try:
+            source, filename = self.sources[name]
+        except KeyError:
+            raise TemplateNotFound(name)
+        return source, filename, lambda: True
+
+
+@pass_context
+def md(context: Context, markdown: str) -> str:
+    # Sorcery ahead! So this is a Jinja filter, which takes a Markdown string, e.g. from
+    # database, and turns it into HTML markup. One could just 'from markdown import markdown',
+    # then call 'markdown(...)' and be done with it, but that wouldn't parse the input in the
+    # context of MkDocs Markdown settings. Extensions wouldn't be set the same way. Relative
+    # links wouldn't work. For that reason, we want to use the MkDocs' own Markdown rendering.
+    #
+    # Unfortunately, the Page.render() method isn't really meant to be used anywhere else:
+    # https://github.com/mkdocs/mkdocs/blob/79f17b4b71c73460c304e3281f6ff209788a76bf/mkdocs/structure/pages.py#L253
+    #
+    # The following sorcery works around that bit. It creates an artificial _Page object similar
+    # to the real MkDocs' own Page object, but only with the properties used by the Page.render()
+    # method. It sets all the configuration, passes the input as the 'markdown' property, and
+    # steals the Page.render() method to behave like if it always belonged to the _Page object.
+    # Then it calls this new _Page.render() method and returns the 'content' property, to which
+    # the method sets the result of the rendering.
+    #
+    # This works, but is very prone to get broken if MkDocs changes something in their code.
+    # In such case one needs to read the new MkDocs code and fix the solution accordingly.
+    #
+    # The page, config, and files come from the template context, so that one environment
+    # can be shared by all pages. Macros using this filter must be imported 'with context'.
+    page, config, files = context["page"], context["config"], context["pages"]
+
+    class _Page:
+        def __init__(self):
+            self.file = page.file
+            self.markdown = markdown
+
+    _page = _Page()
+    Page._original_render(_page, config, files)
+    return _page.content
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import get_context
+from pprint import pformat
+from typing import Any, Callable, Iterable
+
+from juniorguru.lib import loggers
+from juniorguru.lib.async_utils import call_async
+
+
+IN_FLIGHT = 100
+
+WORKERS = os.cpu_count()
+
+
+logger = loggers.from_path(__file__)
+
+
+class DropItem(Exception):
+    pass
+
+
+class StepStats:
+    def __init__(self):
+        self.count = 0
+        self.drops = 0
+        self.time = 0
+
+    @property
+    def avg_time(self) -> float:
+        return self.time / self.count if self.count else 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.count} items, {self.drops} drops, "
+            f"{self.avg_time * 1000:.1f}ms per item"
+        )
+
+
+class Stage:
+    def __init__(self, steps: list[tuple[str, Callable]], concurrency: int = None):
+        self.steps = steps
+        self.is_cpu_bound = not asyncio.iscoroutinefunction(steps[0][1])
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+
+class Pipeline:
+    """
+    Streams items through a sequence of steps, saving those which don't get dropped
+
+    A step is a function taking an item and returning it, or raising DropItem.
+    Coroutine functions run on the event loop. Plain functions are considered
+    CPU-bound and run in a pool of processes. Consecutive plain functions are
+    grouped to a single stage, so that an item travels to another process only
+    once. Only a limited number of items is processed at the same time, so
+    the memory stays flat regardless of how many items there are.
+    """
+
+    def __init__(
+        self,
+        steps: list[tuple[str, Callable]],
+        in_flight: int = IN_FLIGHT,
+        workers: int = WORKERS,
+    ):
+        self.in_flight = in_flight
+        self.workers = workers
+        self.stages = []
+        for name, step in steps:
+            is_cpu_bound = not asyncio.iscoroutinefunction(step)
+            if is_cpu_bound and self.stages and self.stages[-1].is_cpu_bound:
+                self.stages[-1].steps.append((name, step))
+            else:
+                self.stages.append(
+                    Stage([(name, step)], concurrency=workers if is_cpu_bound else None)
+                )
+        self.stats = {name: StepStats() for name, _ in steps}
+        self.count = 0
+        self.drops = 0
+        self.time = 0
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.count / self.time if self.time else 0
+
+    async def run(self, items: Iterable[dict], save: Callable[[dict], Any]) -> None:
+        in_flight = asyncio.Semaphore(self.in_flight)
+        tasks = set()
+        errors = []
+        time_start = time.perf_counter()
+
+        def on_done(task: asyncio.Task) -> None:
+            tasks.discard(task)
+            in_flight.release()
+            if not task.cancelled() and task.exception():
+                errors.append(task.exception())
+
+        with ProcessPoolExecutor(self.workers, mp_context=get_context("spawn")) as pool:
+            for item in items:
+                await in_flight.acquire()
+                if errors:
+                    break
+                task = asyncio.create_task(self.process_item(item, pool, save))
+                tasks.add(task)
+                task.add_done_callback(on_done)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if errors:
+            raise errors[0]
+
+        self.time = time.perf_counter() - time_start
+        logger.info(
+            f"Processed {self.count} items in {self.time:.0f}s, "
+            f"{self.items_per_sec:.1f} items/s, {self.drops} drops"
+        )
+        for name, stats in self.stats.items():
+            logger[name].info(str(stats))
+
+    async def process_item(
+        self, item: dict, pool: Executor, save: Callable[[dict], Any]
+    ) -> None:
+        self.count += 1
+        for stage in self.stages:
+            if stage.semaphore:
+                async with stage.semaphore:
+                    item, drop = await self.process_stage(stage, item, pool)
+            else:
+                item, drop = await self.process_stage(stage, item, pool)
+            if drop:
+                self.drops += 1
+                return
+        await call_async(save, item)
+
+    async def process_stage(
+        self, stage: Stage, item: dict, pool: Executor
+    ) -> tuple[dict, bool]:
+        if stage.is_cpu_bound:
+            loop = asyncio.get_running_loop()
+            item, times, reason = await loop.run_in_executor(
+                pool, run_steps, stage.steps, item
+            )
+        else:
+            (name, step), time_start = stage.steps[0], time.perf_counter()
+            try:
+                item, reason = await step(item), None
+            except DropItem as e:
+                reason = str(e)
+            except Exception:
+                logger[name].error(f"Failed processing item:\n{pformat(item)}")
+                raise
+            times = [time.perf_counter() - time_start]
+
+        for (name, _), step_time in zip(stage.steps, times):
+            self.stats[name].count += 1
+            self.stats[name].time += step_time
+        if reason is not None:
+            name = stage.steps[len(times) - 1][0]
+            self.stats[name].drops += 1
+            logger[name].debug(f"Dropping: {reason}\n{pformat(item)}")
+            return item, True
+        return item, False
+
+
+def run_steps(
+    steps: list[tuple[str, Callable]], item: dict
+) -> tuple[dict, list[float], str | None]:
+    """Runs CPU-bound steps inside a worker process"""
+    times = []
+    for name, step in steps:
+        time_start = time.perf_counter()
+        try:
+            item = step(item)
+        except DropItem as e:
+            times.append(time.perf_counter() - time_start)
+            return item, times, str(e)
+        except Exception:
+            logger[name].error(f"Failed processing item:\n{pformat(item)}")
+            raise
+        times.append(time.perf_counter() - time_start)
+    return item, times, None
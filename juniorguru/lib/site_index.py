@@ -0,0 +1,116 @@
+import os
+from datetime import timedelta
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterable
+
+from diskcache import Cache
+from lxml import html
+
+from juniorguru.lib import loggers
+from juniorguru.lib.cache import CACHE_DIR, get_cache
+from juniorguru.lib.fingerprints import hash_file, hash_text
+
+
+SITE_INDEX_CACHE_DIR = Path(CACHE_DIR) / "site-index"
+
+SITE_INDEX_EXPIRE = timedelta(days=30).total_seconds()
+
+SITE_INDEX_WORKERS = os.cpu_count()
+
+SITE_INDEX_CHUNK_SIZE = 10
+
+
+logger = loggers.from_path(__file__)
+
+
+class SiteIndex:
+    """
+    Knows what's inside each HTML file of the built website
+
+    Every file gets parsed only once, in a pool of processes, and the raw
+    values commands are interested in get recorded into an on-disk index
+    keyed by hash of the file contents. The values don't depend on where
+    the file is, so commands interpret relative URLs on their own.
+    Commands running later, even in a different process, read the entries
+    of files which didn't change since from the index.
+    """
+
+    def __init__(self, output_path: Path, cache: Cache | None = None):
+        self.output_path = output_path
+        self.cache = get_cache(str(SITE_INDEX_CACHE_DIR)) if cache is None else cache
+        self.entries: dict[Path, dict] = {}
+        self.parsed_count = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterable[tuple[Path, dict]]:
+        return iter(sorted(self.entries.items()))
+
+    def build(
+        self,
+        workers: int = SITE_INDEX_WORKERS,
+        chunk_size: int = SITE_INDEX_CHUNK_SIZE,
+    ) -> "SiteIndex":
+        hashes = {}
+        for html_path in self.output_path.glob("**/*.html"):
+            key = hash_file(html_path)
+            if (entry := self.cache.get(key)) is None:
+                hashes[html_path] = key
+            else:
+                self.entries[html_path] = entry
+        logger.info(
+            f"Indexing {len(hashes)} HTML files, "
+            f"{len(self.entries)} unchanged since indexed"
+        )
+        if hashes:
+            with Pool(workers) as pool:
+                for html_path, entry in pool.imap_unordered(
+                    parse_html_file, hashes, chunksize=chunk_size
+                ):
+                    self.set(hashes[html_path], html_path, entry)
+            self.parsed_count = len(hashes)
+        return self
+
+    def set(self, key: str, html_path: Path, entry: dict) -> None:
+        self.entries[html_path] = entry
+        self.cache.set(key, entry, expire=SITE_INDEX_EXPIRE, tag="site-index")
+
+    def record(self, html_path: Path, html_text: str, entry: dict) -> None:
+        """Records an entry for a file which has been rewritten"""
+        self.set(hash_text(html_text), html_path, entry)
+
+
+def parse_html_file(html_path: Path) -> tuple[Path, dict]:
+    logger.debug(f"Parsing {html_path}")
+    return html_path, parse_html(html_path.read_bytes())
+
+
+def parse_html(html_bytes: bytes) -> dict:
+    html_tree = html.fromstring(html_bytes)
+    return dict(
+        names=[element.get("name") for element in html_tree.cssselect("a[name]")],
+        ids=[element.get("id") for element in html_tree.cssselect("*[id]")],
+        links=[element.get("href") for element in html_tree.cssselect("a[href]")],
+        images=[
+            element.get("data-src", element.get("src"))
+            for element in html_tree.cssselect("img[src]")
+        ],
+        screenshots=[
+            (
+                element.get("data-screenshot-source-url"),
+                element.get("data-screenshot-image-url"),
+            )
+            for element in html_tree.cssselect(
+                "*[data-screenshot-source-url][data-screenshot-image-url]"
+            )
+        ],
+        stylesheets=[
+            element.get("href") for element in html_tree.cssselect('link[href$=".css"]')
+        ],
+        scripts=[
+            element.get("src") for element in html_tree.cssselect('script[src$=".js"]')
+        ],
+        documents=len(html_tree.cssselect(".document")),
+    )
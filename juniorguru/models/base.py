@@ -19,6 +19,10 @@ from juniorguru.lib import loggers
 
 DB_FILE = Path("juniorguru/data/data.db")
 
+# Sync commands run as parallel processes writing to the same database,
+# so they need to be patient when waiting for each other's locks
+DB_TIMEOUT = 60
+
 
 logger = loggers.from_path(__file__)
 
@@ -42,11 +46,49 @@ class ConnectionContext(BaseConnectionContext):
 
 
 class SqliteDatabase(BaseSqliteDatabase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queries_count = 0
+        self.tables_read = None
+
     def connection_context(self):
         return ConnectionContext(self)
 
-
-db = SqliteDatabase(DB_FILE, pragmas={"journal_mode": "wal"})
+    def _add_conn_hooks(self, conn):
+        super()._add_conn_hooks(conn)
+        if self.tables_read is not None:
+            conn.set_authorizer(self._record_table_read)
+
+    def start_recording_reads(self) -> None:
+        """Starts recording names of tables read by subsequent queries"""
+        self.tables_read = set()
+        if not self.is_closed():
+            # Setting the authorizer expires the statements SQLite has already
+            # prepared, so even repeated queries get recorded
+            self.connection().set_authorizer(self._record_table_read)
+
+    def stop_recording_reads(self) -> set[str]:
+        """Stops recording and returns names of tables read since the start"""
+        tables_read, self.tables_read = self.tables_read or set(), None
+        if not self.is_closed():
+            self.connection().set_authorizer(None)
+        return tables_read
+
+    def _record_table_read(self, action, table_name, *args) -> int:
+        if (
+            self.tables_read is not None
+            and action == sqlite3.SQLITE_READ
+            and not table_name.startswith("sqlite_")
+        ):
+            self.tables_read.add(table_name)
+        return sqlite3.SQLITE_OK
+
+    def execute_sql(self, *args, **kwargs):
+        self.queries_count += 1
+        return super().execute_sql(*args, **kwargs)
+
+
+db = SqliteDatabase(DB_FILE, timeout=DB_TIMEOUT, pragmas={"journal_mode": "wal"})
 
 
 db.func("czech_sort")(czech_sort_key)
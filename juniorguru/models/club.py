@@ -292,6 +292,17 @@ class ClubMessage(BaseModel):
         )
         return sum(message.content_size for message in messages)
 
+    @classmethod
+    def content_size_by_months(cls) -> dict[str, int]:
+        return dict(
+            cls.select(cls.created_month, fn.sum(cls.content_size))
+            .where(cls.author_is_bot == False)
+            .where(cls.is_private == False)
+            .where(cls.channel_id.not_in(STATS_EXCLUDE_CHANNELS))
+            .group_by(cls.created_month)
+            .tuples()
+        )
+
     @classmethod
     def listing(cls):
         return cls.select().where(cls.is_private == False).order_by(cls.created_at)
@@ -11,7 +11,7 @@ from peewee import (
     fn,
 )
 
-from juniorguru.lib.charts import month_range, ttm_range
+from juniorguru.lib.charts import DailySeries, month_range, ttm_range
 from juniorguru.lib.md import strip_links
 from juniorguru.models.base import BaseModel, JSONField
 from juniorguru.models.club import ClubUser
@@ -135,6 +135,15 @@ class Event(BaseModel):
             / 12.0
         )
 
+    @classmethod
+    def start_series(cls) -> DailySeries:
+        # The queries above compare 'YYYY-MM-DD 00:00:00' to 'YYYY-MM-DD',
+        # which leaves out the last day of the range, hence include_end=False
+        return DailySeries(
+            ((start_at.date(), 1) for (start_at,) in cls.select(cls.start_at).tuples()),
+            include_end=False,
+        )
+
 
 class EventSpeaking(BaseModel):
     speaker = ForeignKeyField(ClubUser, backref="list_speaking")
@@ -174,3 +183,28 @@ class EventSpeaking(BaseModel):
         if count:
             return math.ceil((cls.women_count_ttm(date) / count) * 100)
         return 0
+
+    @classmethod
+    def series(cls) -> DailySeries:
+        return DailySeries(
+            (
+                (start_at.date(), 1)
+                for (start_at,) in cls.select(Event.start_at).join(Event).tuples()
+            ),
+            include_end=False,
+        )
+
+    @classmethod
+    def women_series(cls) -> DailySeries:
+        return DailySeries(
+            (
+                (start_at.date(), 1)
+                for (start_at,) in cls.select(Event.start_at)
+                .join(Event)
+                .switch(cls)
+                .join(ClubUser)
+                .where(ClubUser.has_feminine_name == True)
+                .tuples()
+            ),
+            include_end=False,
+        )
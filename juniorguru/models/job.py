@@ -1,5 +1,6 @@
 from datetime import date, datetime, time, timedelta
 from functools import lru_cache
+from typing import Iterable, Self
 
 from peewee import (
     BooleanField,
@@ -325,23 +326,25 @@ class ListedJob(BaseModel):
         return cls.listing().where(cls.remote == True)
 
     @classmethod
-    def tags_listing(cls, tags):
+    def tags_listing(cls, tags, jobs: Iterable[Self] | None = None):
         tags = set(tags)
-        return [job for job in cls.listing() if tags & set(job.tags())]
+        jobs = cls.listing() if jobs is None else jobs
+        return [job for job in jobs if tags & set(job.tags())]
 
     @classmethod
-    def internship_listing(cls):
+    def internship_listing(cls, jobs: Iterable[Self] | None = None):
         return cls.tags_listing(
             [
                 "INTERNSHIP",
                 "UNPAID_INTERNSHIP",
                 "ALSO_INTERNSHIP",
-            ]
+            ],
+            jobs=jobs,
         )
 
     @classmethod
-    def volunteering_listing(cls):
-        return cls.tags_listing(["VOLUNTEERING"])
+    def volunteering_listing(cls, jobs: Iterable[Self] | None = None):
+        return cls.tags_listing(["VOLUNTEERING"], jobs=jobs)
 
     @classmethod
     def api_listing(cls):
@@ -4,7 +4,7 @@ from zoneinfo import ZoneInfo
 
 from peewee import BooleanField, CharField, DateField, ForeignKeyField, IntegerField
 
-from juniorguru.lib.charts import ttm_range
+from juniorguru.lib.charts import DailySeries, ttm_range
 from juniorguru.models.base import BaseModel
 from juniorguru.models.partner import Partner
 
@@ -127,3 +127,21 @@ class PodcastEpisode(BaseModel):
         if count:
             return math.ceil((cls.women_count_ttm(date) / count) * 100)
         return 0
+
+    @classmethod
+    def guests_series(cls) -> DailySeries:
+        return DailySeries(
+            (publish_on, 1)
+            for (publish_on,) in cls.select(cls.publish_on)
+            .where(cls.guest_name.is_null(False))
+            .tuples()
+        )
+
+    @classmethod
+    def women_series(cls) -> DailySeries:
+        return DailySeries(
+            (publish_on, 1)
+            for (publish_on,) in cls.select(cls.publish_on)
+            .where(cls.guest_name.is_null(False), cls.guest_has_feminine_name == True)
+            .tuples()
+        )
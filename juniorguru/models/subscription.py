@@ -8,6 +8,7 @@ from numbers import Number
 from typing import Callable, Generator, Iterable, Self
 
 from peewee import (
+    SQL,
     BooleanField,
     Case,
     CharField,
@@ -277,6 +278,16 @@ class SubscriptionActivity(BaseModel):
 
     @classmethod
     def listing(cls, date: date) -> Iterable[Self]:
+        return (
+            cls.select()
+            .join(SubscriptionState, on=(SubscriptionState.activity_id == cls.id))
+            .where(SubscriptionState.valid_on(date))
+        )
+
+    @classmethod
+    def latest_listing(cls, date: date) -> Iterable[Self]:
+        # The same as listing(), but computed from activities, without
+        # the SubscriptionState table
         latest_at = fn.max(cls.happened_at).alias("latest_at")
         latest = (
             cls.select(cls.account_id, latest_at)
@@ -493,34 +504,31 @@ class SubscriptionActivity(BaseModel):
 
     @classmethod
     def active_duration_avg(cls, date: date) -> int:
-        account_ids = [activity.account_id for activity in cls.active_listing(date)]
-        if durations := list(cls._calc_durations(account_ids, date)):
+        if durations := list(cls._calc_durations(cls.active_listing(date), date)):
             return sum(durations) / len(durations)
         return 0
 
     @classmethod
     @uses_data_from_subscriptions()
     def active_individuals_duration_avg(cls, date: date) -> int:
-        account_ids = [
-            activity.account_id for activity in cls.active_individuals_listing(date)
-        ]
-        if durations := list(cls._calc_durations(account_ids, date)):
+        listing = cls.active_individuals_listing(date)
+        if durations := list(cls._calc_durations(listing, date)):
             return sum(durations) / len(durations)
         return 0
 
     @classmethod
     def _calc_durations(
-        cls, account_ids: list[str], date: date
+        cls, listing: Iterable[Self], date: date
     ) -> Generator[int, None, None]:
-        earliest_on = fn.min(cls.happened_on).alias("earliest_on")
         items = (
-            cls.select(earliest_on)
-            .where(cls.account_id.in_(account_ids))
-            .group_by(cls.account_id)
+            listing.select(
+                SubscriptionState.account_id, SubscriptionState.subscribed_on
+            )
+            .distinct()
             .dicts()
         )
         for item in items:
-            duration_sec = (date - item["earliest_on"]).total_seconds()
+            duration_sec = (date - item["subscribed_on"]).total_seconds()
             duration_mo = duration_sec / 60 / 60 / 24 / 30
             yield duration_mo
 
@@ -555,6 +563,96 @@ class SubscriptionActivity(BaseModel):
         return days
 
 
+class SubscriptionState(BaseModel):
+    """
+    Which activity is the latest one for an account, and since when until when
+
+    Precomputed from SubscriptionActivity, so that asking about the state
+    of subscriptions as of any date is a single range query instead of
+    a group by over the whole history.
+    """
+
+    class Meta:
+        indexes = ((("valid_from", "valid_to"), False),)
+
+    activity_id = IntegerField(unique=True)
+    account_id = IntegerField(index=True)
+    account_has_feminine_name = BooleanField()
+    subscribed_on = DateField()
+    valid_from = DateField()
+    valid_to = DateField(null=True)  # exclusive, None means up until now
+    type = CharField(constraints=[check_enum("type", SubscriptionActivityType)])
+    subscription_interval = CharField(
+        null=True,
+        constraints=[check_enum("subscription_interval", SubscriptionInterval)],
+    )
+    subscription_type = CharField(
+        null=True, constraints=[check_enum("subscription_type", SubscriptionType)]
+    )
+
+    @classmethod
+    def build(cls) -> None:
+        activity = SubscriptionActivity.alias("activity")
+        next_activity = SubscriptionActivity.alias("next_activity")
+
+        # Activities with the same 'happened_at' are all the latest ones
+        # at the same time, so each of them gets its own row
+        valid_to = (
+            next_activity.select(fn.min(next_activity.happened_on))
+            .where(
+                next_activity.account_id == activity.account_id,
+                next_activity.happened_at > activity.happened_at,
+            )
+            .alias("valid_to")
+        )
+        subscribed_on = (
+            fn.min(activity.happened_on)
+            .over(partition_by=[activity.account_id])
+            .alias("subscribed_on")
+        )
+        states = activity.select(
+            activity.id,
+            activity.account_id,
+            activity.account_has_feminine_name,
+            subscribed_on,
+            activity.happened_on.alias("valid_from"),
+            valid_to,
+            activity.type,
+            activity.subscription_interval,
+            activity.subscription_type,
+        ).alias("states")
+
+        # If more activities happen on the same day, only the last ones
+        # are valid as of that day and the rest never gets a row
+        query = states.select_from(SQL("*")).where(
+            states.c.valid_to.is_null() | (states.c.valid_to > states.c.valid_from)
+        )
+        cls.insert_from(
+            query,
+            [
+                cls.activity_id,
+                cls.account_id,
+                cls.account_has_feminine_name,
+                cls.subscribed_on,
+                cls.valid_from,
+                cls.valid_to,
+                cls.type,
+                cls.subscription_interval,
+                cls.subscription_type,
+            ],
+        ).execute()
+
+    @classmethod
+    def valid_on(cls, date: date):
+        return (cls.valid_from <= date) & (
+            cls.valid_to.is_null() | (cls.valid_to > date)
+        )
+
+    @classmethod
+    def listing(cls, date: date) -> Iterable[Self]:
+        return cls.select().where(cls.valid_on(date))
+
+
 class SubscriptionCancellation(BaseModel):
     account_id = IntegerField(unique=True)
     account_name = CharField()
@@ -1,14 +1,19 @@
-import functools
 import json
 import math
-from datetime import date
+from datetime import date, timedelta
 from enum import StrEnum, unique
 from typing import Iterable, Self
 
-from peewee import CharField, DateField, IntegerField
+from peewee import BooleanField, CharField, DateField, IntegerField, fn
 from playhouse.shortcuts import model_to_dict
 
-from juniorguru.lib.charts import month_range, ttm_range
+from juniorguru.lib.charts import (
+    DailyBreakdown,
+    month_range,
+    next_month,
+    previous_month,
+    ttm_range,
+)
 from juniorguru.models.base import BaseModel, check_enum
 
 
@@ -42,7 +47,10 @@ class Transaction(BaseModel):
         data = json.loads(line)
         data["id"] = data.pop("_id")
         data["happened_on"] = date.fromisoformat(data["happened_on"])
-        return cls.create(**data)
+        with cls._meta.database.atomic():
+            transaction = cls.create(**data)
+            TransactionMonth.record(transaction)
+        return transaction
 
     def serialize(self) -> str:
         data = model_to_dict(self)
@@ -52,7 +60,15 @@ class Transaction(BaseModel):
 
     @classmethod
     def add(cls, **data) -> None:
-        cls.replace(**data).execute()
+        with cls._meta.database.atomic():
+            if previous_transaction := cls.get_or_none(cls.id == data["id"]):
+                TransactionMonth.record(previous_transaction, -1)
+            cls.replace(**data).execute()
+            TransactionMonth.record(cls(**data))
+
+    @property
+    def is_income(self) -> bool:
+        return self.amount >= 0 and self.category != TransactionsCategory.TAX
 
     @classmethod
     def history_end_on(cls) -> date:
@@ -83,27 +99,24 @@ class Transaction(BaseModel):
 
     @classmethod
     def revenue(cls, date):
-        return sum(
-            transaction.amount for transaction in cls.incomes(*month_range(date))
-        )
+        return sum(TransactionMonth.sum_by_category(*month_range(date)).values())
 
     @classmethod
     def revenue_ttm(cls, date):
         return math.ceil(
-            sum(transaction.amount for transaction in cls.incomes(*ttm_range(date)))
-            / 12.0
+            sum(TransactionMonth.sum_by_category(*ttm_range(date)).values()) / 12.0
         )
 
     @classmethod
     def revenue_breakdown(cls, date):
-        return sum_by_category(cls.incomes(*month_range(date)))
+        return TransactionMonth.sum_by_category(*month_range(date))
 
     @classmethod
     def revenue_ttm_breakdown(cls, date):
         return {
             category: math.ceil(value / 12)
-            for category, value in sum_by_category(
-                cls.incomes(*ttm_range(date))
+            for category, value in TransactionMonth.sum_by_category(
+                *ttm_range(date)
             ).items()
         }
 
@@ -116,7 +129,9 @@ class Transaction(BaseModel):
     @classmethod
     def cost(cls, date):
         return -1 * sum(
-            transaction.amount for transaction in cls.expenses(*month_range(date))
+            TransactionMonth.sum_by_category(
+                *month_range(date), is_income=False
+            ).values()
         )
 
     @classmethod
@@ -125,7 +140,9 @@ class Transaction(BaseModel):
             (
                 -1
                 * sum(
-                    transaction.amount for transaction in cls.expenses(*ttm_range(date))
+                    TransactionMonth.sum_by_category(
+                        *ttm_range(date), is_income=False
+                    ).values()
                 )
             )
             / 12.0
@@ -135,11 +152,30 @@ class Transaction(BaseModel):
     def cost_breakdown(cls, date):
         return {
             category: -1 * value
-            for category, value in sum_by_category(
-                cls.expenses(*month_range(date))
+            for category, value in TransactionMonth.sum_by_category(
+                *month_range(date), is_income=False
             ).items()
         }
 
+    @classmethod
+    def incomes_breakdown_series(cls) -> DailyBreakdown:
+        return DailyBreakdown(
+            cls.select(cls.happened_on, cls.category, cls.amount)
+            .where(cls.amount >= 0, cls.category != "tax")
+            .tuples()
+        )
+
+    @classmethod
+    def costs_breakdown_series(cls) -> DailyBreakdown:
+        return DailyBreakdown(
+            (happened_on, category, -1 * amount)
+            for happened_on, category, amount in cls.select(
+                cls.happened_on, cls.category, cls.amount
+            )
+            .where((cls.amount < 0) | (cls.category == "tax"))
+            .tuples()
+        )
+
     @classmethod
     def profit(cls, date):
         return cls.revenue(date) - cls.cost(date)
@@ -149,10 +185,88 @@ class Transaction(BaseModel):
         return cls.revenue_ttm(date) - cls.cost_ttm(date)
 
 
-def sum_by_category(transactions):
-    def reduce_step(mapping, transaction):
-        mapping.setdefault(transaction.category, 0)
-        mapping[transaction.category] += transaction.amount
-        return mapping
+class TransactionMonth(BaseModel):
+    """
+    Monthly sums of transactions per category, split to incomes and expenses
+
+    Maintained by Transaction.add() and Transaction.deserialize(), so that
+    money metrics don't need to go through all transactions in a range.
+    """
+
+    class Meta:
+        indexes = ((("month", "category", "is_income"), True),)
+
+    month = DateField(index=True)  # first day of the month
+    category = CharField(constraints=[check_enum("category", TransactionsCategory)])
+    is_income = BooleanField()
+    amount = IntegerField(default=0)
+    count = IntegerField(default=0)
+
+    @classmethod
+    def record(cls, transaction: Transaction, sign: int = 1) -> None:
+        cls.insert(
+            month=transaction.happened_on.replace(day=1),
+            category=transaction.category,
+            is_income=transaction.is_income,
+            amount=sign * transaction.amount,
+            count=sign,
+        ).on_conflict(
+            conflict_target=[cls.month, cls.category, cls.is_income],
+            update={
+                cls.amount: cls.amount + sign * transaction.amount,
+                cls.count: cls.count + sign,
+            },
+        ).execute()
+
+    @classmethod
+    def sum_by_category(
+        cls, from_date: date, to_date: date, is_income: bool = True
+    ) -> dict[str, int]:
+        # Whole months come from the rollup, the days at the edges
+        # of the range, which don't make a whole month, from transactions
+        months_from = from_date if from_date.day == 1 else next_month(from_date)
+        months_to = (
+            to_date.replace(day=1)
+            if to_date == month_range(to_date)[1]
+            else previous_month(to_date).replace(day=1)
+        )
+        if months_from > months_to:
+            return sum_by_category_sql(from_date, to_date, is_income)
+
+        sums = sum_by_category_sql(
+            from_date, months_from - timedelta(days=1), is_income
+        )
+        rows = (
+            cls.select(cls.category, fn.sum(cls.amount), fn.sum(cls.count))
+            .where(
+                cls.month >= months_from,
+                cls.month <= months_to,
+                cls.is_income == is_income,
+            )
+            .group_by(cls.category)
+            .tuples()
+        )
+        for category, amount, count in rows:
+            if count:
+                sums[category] = sums.get(category, 0) + amount
+        edge_sums = sum_by_category_sql(next_month(months_to), to_date, is_income)
+        for category, amount in edge_sums.items():
+            sums[category] = sums.get(category, 0) + amount
+        return sums
+
 
-    return functools.reduce(reduce_step, transactions, {})
+def sum_by_category_sql(
+    from_date: date, to_date: date, is_income: bool = True
+) -> dict[str, int]:
+    if from_date > to_date:
+        return {}
+    if is_income:
+        transactions = Transaction.incomes(from_date, to_date)
+    else:
+        transactions = Transaction.expenses(from_date, to_date)
+    return dict(
+        transactions.select(Transaction.category, fn.sum(Transaction.amount))
+        .order_by()
+        .group_by(Transaction.category)
+        .tuples()
+    )
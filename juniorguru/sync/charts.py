@@ -1,4 +1,5 @@
 from datetime import date
+from functools import cache
 from typing import Callable
 
 from juniorguru.cli.sync import main as cli
@@ -46,6 +47,8 @@ MILESTONES = [
 
 CHARTS = {}
 
+SOURCES = []
+
 
 logger = loggers.from_path(__file__)
 
@@ -69,6 +72,8 @@ logger = loggers.from_path(__file__)
 def main():
     Chart.drop_table()
     Chart.create_table()
+    for source_fn in SOURCES:
+        source_fn.cache_clear()
 
     today = date.today()
     for chart_slug, chart_fn in CHARTS.items():
@@ -89,87 +94,153 @@ def chart(chart_fn: Callable) -> Callable:
     CHARTS[chart_fn.__name__] = chart_fn
 
 
+def source(source_fn: Callable) -> Callable:
+    """
+    Loads a whole table into memory once per run, so that charts can compute
+    all their monthly and TTM values from it without querying the database
+    """
+    source_fn = cache(source_fn)
+    SOURCES.append(source_fn)
+    return source_fn
+
+
+@source
+def incomes() -> charts.DailyBreakdown:
+    return Transaction.incomes_breakdown_series()
+
+
+@source
+def costs() -> charts.DailyBreakdown:
+    return Transaction.costs_breakdown_series()
+
+
+@source
+def events_starts() -> charts.DailySeries:
+    return Event.start_series()
+
+
+@source
+def speakings() -> charts.DailySeries:
+    return EventSpeaking.series()
+
+
+@source
+def speakings_women() -> charts.DailySeries:
+    return EventSpeaking.women_series()
+
+
+@source
+def podcast_guests() -> charts.DailySeries:
+    return PodcastEpisode.guests_series()
+
+
+@source
+def podcast_guests_women() -> charts.DailySeries:
+    return PodcastEpisode.women_series()
+
+
+@source
+def club_content_sizes() -> dict[str, int]:
+    return ClubMessage.content_size_by_months()
+
+
 @chart
 def profit(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.profit, months)
+    data = charts.per_month(
+        lambda month: (
+            charts.monthly_sum(incomes().total)(month)
+            - charts.monthly_sum(costs().total)(month)
+        ),
+        months,
+    )
     return dict(data=data, months=months)
 
 
 @chart
 def profit_ttm(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.profit_ttm, months)
+    data = charts.per_month(
+        lambda month: (
+            charts.ttm_sum_avg(incomes().total)(month)
+            - charts.ttm_sum_avg(costs().total)(month)
+        ),
+        months,
+    )
     return dict(data=data, months=months)
 
 
 @chart
 def revenue(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.revenue, months)
+    data = charts.per_month(charts.monthly_sum(incomes().total), months)
     return dict(data=data, months=months)
 
 
 @chart
 def revenue_ttm(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.revenue_ttm, months)
+    data = charts.per_month(charts.ttm_sum_avg(incomes().total), months)
     return dict(data=data, months=months)
 
 
 @chart
 def revenue_breakdown(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month_breakdown(Transaction.revenue_breakdown, months)
+    data = charts.per_month_breakdown(charts.monthly_sum(incomes()), months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.cost, months)
+    data = charts.per_month(charts.monthly_sum(costs().total), months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost_ttm(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month(Transaction.cost_ttm, months)
+    data = charts.per_month(charts.ttm_sum_avg(costs().total), months)
     return dict(data=data, months=months)
 
 
 @chart
 def cost_breakdown(today: date):
     months = charts.months(BUSINESS_BEGIN_ON, today)
-    data = charts.per_month_breakdown(Transaction.cost_breakdown, months)
+    data = charts.per_month_breakdown(charts.monthly_sum(costs()), months)
     return dict(data=data, months=months)
 
 
 @chart
 def events(today: date):
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(Event.count_by_month, months)
+    data = charts.per_month(charts.monthly_count(events_starts()), months)
     return dict(data=data, months=months)
 
 
 @chart
 def events_ttm(today: date):
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(Event.count_by_month_ttm, months)
+    data = charts.per_month(charts.ttm_count_avg(events_starts()), months)
     return dict(data=data, months=months)
 
 
 @chart
 def events_women(today: date):
     months = charts.months(CLUB_BEGIN_ON, today)
-    data = charts.per_month(EventSpeaking.women_ptc_ttm, months)
+    data = charts.per_month(
+        charts.ttm_count_ptc(speakings_women(), speakings()), months
+    )
     return dict(data=data, months=months)
 
 
 @chart
 def podcast_women(today: date):
     months = charts.months(PODCAST_BEGIN_ON, today)
-    data = charts.per_month(PodcastEpisode.women_ptc_ttm, months)
+    data = charts.per_month(
+        charts.ttm_count_ptc(podcast_guests_women(), podcast_guests()), months
+    )
     return dict(data=data, months=months)
 
 
@@ -351,7 +422,9 @@ def club_content(today: date):
         charts.next_month(today - DEFAULT_CHANNELS_HISTORY_SINCE),
         charts.previous_month(today),
     )
-    data = charts.per_month(ClubMessage.content_size_by_month, months)
+    data = charts.per_month(
+        lambda month: club_content_sizes().get(f"{month:%Y-%m}", 0), months
+    )
     return dict(data=data, months=months)
 
 
@@ -404,7 +477,7 @@ def countries(today: date):
     oss_limit_eur = 10000
     oss_limit_czk = ExchangeRate.from_currency(oss_limit_eur, "EUR")
 
-    revenue_breakdown = Transaction.revenue_breakdown(charts.previous_month(today))
+    revenue_breakdown = charts.monthly_sum(incomes())(charts.previous_month(today))
     revenue_memberships = revenue_breakdown["memberships"]
 
     return dict(
@@ -1,16 +1,23 @@
 import asyncio
-import random
+import itertools
+import logging
+import pickle
+import statistics
+from collections import deque
+from contextlib import contextmanager
 from copy import deepcopy
 from datetime import datetime, timedelta, timezone
-from functools import partial
+from functools import partial, wraps
 from operator import itemgetter
-from typing import AsyncGenerator
+from time import perf_counter
+from typing import AsyncGenerator, Callable, Iterator
 
-from discord import DMChannel, Member, Message, Reaction, User
+from discord import DMChannel, Member, Message, Object, Reaction, User
 from discord.abc import GuildChannel
 from discord.state import ConnectionState
 from discord.types.message import Message as MessagePayload
-from discord.utils import time_snowflake
+from discord.utils import snowflake_time, time_snowflake
+from diskcache import Cache
 
 from juniorguru.lib import loggers
 from juniorguru.lib.async_utils import call_async
@@ -28,18 +35,28 @@ from juniorguru.lib.discord_club import (
     is_member,
     is_thread_after,
 )
-from juniorguru.sync.club_content.store import (
-    store_dm_channel,
-    store_member,
-    store_message,
-    store_pin,
-)
+from juniorguru.lib.fingerprints import hash_bytes
+from juniorguru.sync.club_content.store import Store
 
 
 logger = loggers.from_path(__file__)
 
 
-WORKERS_COUNT = 6
+WORKERS_MIN = 2
+
+WORKERS_MAX = 12
+
+DM_WORKERS_COUNT = 4
+
+LATENCY_THRESHOLD = 2  # seconds
+
+LATENCY_WINDOW_SIZE = 50
+
+TIMINGS_REPORT_SIZE = 10
+
+EDITS_WINDOW = timedelta(days=20)
+
+PAYLOADS_EXPIRE_DAYS = 60
 
 CHANNELS_HISTORY_SINCE = {
     ClubChannelID.FUN: timedelta(days=30),
@@ -61,114 +78,306 @@ CHANNELS_SKIP = [
 
 
 async def crawl(client: ClubClient) -> None:
-    logger.info("Crawling members")
-    members = []
-    tasks = []
-    async for member in client.club_guild.fetch_members(limit=None):
-        members.append(member)
-        tasks.append(asyncio.create_task(store_member(member)))
-    await asyncio.gather(*tasks)
-
-    logger.info("Crawling club channels")
-    queue = asyncio.Queue()
-    for channel in client.club_guild.channels:
-        if (
-            channel.type != "category"
-            and channel.permissions_for(client.club_guild.me).read_messages
-        ):
-            if channel.id not in CHANNELS_SKIP:
-                queue.put_nowait(channel)
-            else:
-                logger.debug(
-                    f"Skipping channel #{channel.id} {get_channel_name(channel)!r}"
-                )
-
-    workers = [
-        asyncio.create_task(channel_worker(worker_no, queue))
-        for worker_no in range(WORKERS_COUNT)
-    ]
+    store = Store()
+    store_task = asyncio.create_task(store.run())
+    limiter = AdaptiveLimiter(WORKERS_MIN, WORKERS_MAX)
+    cache = get_cache()
 
-    logger.info("Adding DM channels")
-    dm_tasks = [
-        asyncio.create_task(crawl_dm_channel(queue, member)) for member in members
-    ]
+    with measure_requests(client, limiter):
+        logger.info("Crawling members")
+        members = []
+        async for member in client.club_guild.fetch_members(limit=None):
+            members.append(member)
+            await store.store_member(member)
+
+        logger.info("Crawling club channels")
+        queue = ChannelsQueue(cache)
+        for channel in client.club_guild.channels:
+            if (
+                channel.type != "category"
+                and channel.permissions_for(client.club_guild.me).read_messages
+            ):
+                if channel.id not in CHANNELS_SKIP:
+                    await queue.put_channel(channel)
+                else:
+                    logger.debug(
+                        f"Skipping channel #{channel.id} {get_channel_name(channel)!r}"
+                    )
+
+        timings = []
+        workers = [
+            asyncio.create_task(
+                channel_worker(worker_no, queue, store, limiter, timings)
+            )
+            for worker_no in range(WORKERS_MAX)
+        ]
 
-    # trick to prevent hangs if workers raise, see https://stackoverflow.com/a/60710981/325365
-    queue_completed = asyncio.create_task(queue.join())
-    await asyncio.wait([queue_completed, *workers], return_when=asyncio.FIRST_COMPLETED)
+        logger.info("Adding DM channels")
+        members_iter = iter(members)
+        dm_workers = [
+            asyncio.create_task(dm_channel_worker(members_iter, queue, store))
+            for _ in range(DM_WORKERS_COUNT)
+        ]
 
-    # if there's a worker which raised
-    if not queue_completed.done():
-        workers_done = [worker for worker in workers if worker.done()]
-        logger.warning(
-            f"Some workers ({len(workers_done)} of {WORKERS_COUNT}) finished before the queue is done!"
+        # trick to prevent hangs if workers raise, see https://stackoverflow.com/a/60710981/325365
+        queue_completed = asyncio.create_task(wait_for_queue(queue, dm_workers))
+        await asyncio.wait(
+            [queue_completed, store_task, *workers], return_when=asyncio.FIRST_COMPLETED
         )
-        workers_done[0].result()  # raises
-
-    # cancel workers which are still runnning
-    for worker in workers:
-        worker.cancel()
 
-    # return_exceptions=True silently collects CancelledError() exceptions
-    await asyncio.gather(*dm_tasks, *workers, return_exceptions=True)
-
-
-async def crawl_dm_channel(queue: asyncio.Queue, member: Member) -> None:
-    channel = await get_or_create_dm_channel(member)
-    if channel:
-        logger["channels"].debug(
-            f"Adding DM channel #{channel.id} for member {channel.recipient.display_name!r}"
-        )
-        queue.put_nowait(channel)
-        await store_dm_channel(channel)
+        # if there's a worker which raised
+        if not queue_completed.done():
+            if store_task.done():
+                logger.warning("Database store finished before the queue is done!")
+                store_task.result()  # raises
+            workers_done = [worker for worker in workers if worker.done()]
+            logger.warning(
+                f"Some workers ({len(workers_done)} of {WORKERS_MAX}) finished before the queue is done!"
+            )
+            workers_done[0].result()  # raises
+        queue_completed.result()  # raises if DM workers raised
+
+        # cancel workers which are still runnning
+        for worker in workers:
+            worker.cancel()
+
+        # return_exceptions=True silently collects CancelledError() exceptions
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    logger.info("Waiting for the database store to finish")
+    await store.close()
+    await store_task
+    logger.info(
+        f"Stored {store.rows_count} rows in {store.batches_count} batches, "
+        f"{store.rows_per_sec:.0f} rows/s"
+    )
+    logger.info(
+        f"Made {limiter.requests_count} requests, "
+        f"{limiter.latency_avg:.2f}s average latency, "
+        f"rate limited {limiter.rate_limits_count}×, "
+        f"concurrency ended at {limiter.limit} (max reached {limiter.max_reached})"
+    )
+    logger.info("Slowest channels:")
+    for name, duration, messages_count in sorted(
+        timings, key=itemgetter(1), reverse=True
+    )[:TIMINGS_REPORT_SIZE]:
+        logger.info(f"{duration:8.1f}s {messages_count:6} messages  {name}")
+    for name, duration, messages_count in sorted(timings):
+        logger["timings"].debug(f"{name}: {duration:.1f}s, {messages_count} messages")
+
+
+async def wait_for_queue(queue: asyncio.Queue, dm_workers: list[asyncio.Task]) -> None:
+    await asyncio.gather(*dm_workers)
+    await queue.join()
+
+
+async def dm_channel_worker(
+    members_iter: Iterator[Member], queue: "ChannelsQueue", store: Store
+) -> None:
+    for member in members_iter:
+        channel = await get_or_create_dm_channel(member)
+        if channel:
+            logger["channels"].debug(
+                f"Adding DM channel #{channel.id} for member {channel.recipient.display_name!r}"
+            )
+            await queue.put_channel(channel)
+            await store.store_dm_channel(channel)
 
 
-async def channel_worker(worker_no, queue) -> None:
+async def channel_worker(
+    worker_no: int,
+    queue: "ChannelsQueue",
+    store: Store,
+    limiter: "AdaptiveLimiter",
+    timings: list[tuple[str, float, int]],
+) -> None:
     logger_cw = logger[worker_no]["channels"]
     while True:
-        channel = await queue.get()
-        logger_c = get_channel_logger(logger_cw, channel)
-        logger_c.info(f"Crawling {get_channel_name(channel)!r}")
-
-        cache_cutoff_at = datetime.now(timezone.utc) - timedelta(days=20)
-        history_since = CHANNELS_HISTORY_SINCE.get(
-            get_parent_channel(channel).id, DEFAULT_CHANNELS_HISTORY_SINCE
-        )
-        if history_since is None:
-            history_after = None
-            logger_c.debug("Crawling all channel history")
-        else:
-            history_after = get_history_after(history_since)
-            logger_c.debug(
-                f"Crawling history after {history_after:%Y-%m-%d} ({history_since.days} days ago)"
+        _, _, channel = await queue.get()
+        async with limiter:
+            time = perf_counter()
+            logger_c = get_channel_logger(logger_cw, channel)
+            logger_c.info(f"Crawling {get_channel_name(channel)!r}")
+
+            edits_window_at = datetime.now(timezone.utc) - EDITS_WINDOW
+            history_since = CHANNELS_HISTORY_SINCE.get(
+                get_parent_channel(channel).id, DEFAULT_CHANNELS_HISTORY_SINCE
             )
+            if history_since is None:
+                history_after = None
+                logger_c.debug("Crawling all channel history")
+            else:
+                history_after = get_history_after(history_since)
+                logger_c.debug(
+                    f"Crawling history after {history_after:%Y-%m-%d} ({history_since.days} days ago)"
+                )
 
-        threads = [
-            thread
-            async for thread in fetch_threads(channel)
-            if is_thread_after(thread, after=history_after) and not thread.is_private()
-        ]
-        if threads:
-            logger_c.info(f"Adding {len(threads)} threads")
-        for thread in threads:
+            threads = [
+                thread
+                async for thread in fetch_threads(channel)
+                if is_thread_after(thread, after=history_after)
+                and not thread.is_private()
+            ]
+            if threads:
+                logger_c.info(f"Adding {len(threads)} threads")
+            for thread in threads:
+                logger_c.debug(
+                    f"Adding thread '{thread.name}' #{thread.id} {thread.jump_url}"
+                )
+                await queue.put_channel(thread)
+
+            messages_count = 0
+            async for message in fetch_messages(
+                channel, history_after, edits_window_at
+            ):
+                await store.store_message(message)
+                messages_count += 1
+                async for reacting_member in fetch_members_reacting_by_pin(
+                    message.reactions
+                ):
+                    await store.store_pin(message, reacting_member)
+
+            duration = perf_counter() - time
+            timings.append((get_channel_name(channel), duration, messages_count))
             logger_c.debug(
-                f"Adding thread '{thread.name}' #{thread.id} {thread.jump_url}"
+                f"Done crawling {get_channel_name(channel)!r} in {duration:.1f}s"
             )
-            queue.put_nowait(thread)
+        queue.task_done()
 
-        tasks = []
-        async for message in fetch_messages(channel, history_after, cache_cutoff_at):
-            db_message = await store_message(message)
-            async for reacting_member in fetch_members_reacting_by_pin(
-                message.reactions
-            ):
-                tasks.append(
-                    asyncio.create_task(store_pin(db_message, reacting_member))
-                )
-        await asyncio.gather(*tasks)
 
-        logger_c.debug(f"Done crawling {get_channel_name(channel)!r}")
-        queue.task_done()
+class ChannelsQueue(asyncio.PriorityQueue):
+    """
+    Queue of channels to crawl, where channels with the most expected work go first
+
+    The expected work is estimated from the channel's last message ID
+    and the high-water mark of messages already cached for the channel.
+    """
+
+    def __init__(self, cache: Cache):
+        super().__init__()
+        self.cache = cache
+        self.counter = itertools.count()
+
+    async def put_channel(self, channel: GuildChannel | DMChannel) -> None:
+        index = await call_async(self.cache.get, f"message-payloads:{channel.id}")
+        high_water_mark = index.get("high_water_mark") if index else None
+        last_message_id = getattr(channel, "last_message_id", None)
+        expected_work = get_expected_work(last_message_id, high_water_mark)
+        self.put_nowait((-expected_work, next(self.counter), channel))
+
+
+def get_expected_work(last_message_id: int | None, high_water_mark: int | None) -> int:
+    if not last_message_id:
+        return 0
+    if not high_water_mark:
+        return last_message_id  # all history since the Discord epoch
+    return max(0, last_message_id - high_water_mark)
+
+
+class AdaptiveLimiter:
+    """
+    Limits how many channels are crawled concurrently
+
+    Additive increase, multiplicative decrease: Every channel crawled without
+    hitting Discord rate limits and with reasonable latency allows one more
+    concurrent channel. Hitting rate limits halves the concurrency.
+    """
+
+    def __init__(
+        self,
+        min_limit: int,
+        max_limit: int,
+        latency_threshold: float = LATENCY_THRESHOLD,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.limit = min_limit
+        self.max_reached = min_limit
+        self.active = 0
+        self.requests_count = 0
+        self.rate_limits_count = 0
+        self.latency_total = 0
+        self._recent_latencies = deque(maxlen=LATENCY_WINDOW_SIZE)
+        self._rate_limited = False
+        self._condition = asyncio.Condition()
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.requests_count if self.requests_count else 0
+
+    @property
+    def recent_latency(self) -> float:
+        if not self._recent_latencies:
+            return 0
+        return statistics.median(self._recent_latencies)
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.active -= 1
+            self.adjust()
+            self._condition.notify_all()
+
+    def adjust(self) -> None:
+        if self._rate_limited:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._rate_limited = False
+            logger["limiter"].debug(f"Rate limited, decreasing to {self.limit}")
+        elif self.recent_latency < self.latency_threshold:
+            self.limit = min(self.max_limit, self.limit + 1)
+            self.max_reached = max(self.max_reached, self.limit)
+
+    def record_latency(self, latency: float) -> None:
+        self.requests_count += 1
+        self.latency_total += latency
+        self._recent_latencies.append(latency)
+
+    def record_rate_limit(self) -> None:
+        self.rate_limits_count += 1
+        self._rate_limited = True
+
+    def measure(self, request: Callable) -> Callable:
+        @wraps(request)
+        async def wrapper(*args, **kwargs):
+            time = perf_counter()
+            try:
+                return await request(*args, **kwargs)
+            finally:
+                self.record_latency(perf_counter() - time)
+
+        return wrapper
+
+
+class RateLimitHandler(logging.Handler):
+    """Lets the limiter know whenever discord.py reports hitting a rate limit"""
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        super().__init__(level=logging.WARNING)
+        self.limiter = limiter
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "rate limit" in record.getMessage().lower():
+            self.limiter.record_rate_limit()
+
+
+@contextmanager
+def measure_requests(client: ClubClient, limiter: AdaptiveLimiter) -> Iterator[None]:
+    """Lets the limiter know about latency and rate limits of all API requests"""
+    request = client.http.request
+    client.http.request = limiter.measure(request)
+    http_logger = logging.getLogger("discord.http")
+    rate_limit_handler = RateLimitHandler(limiter)
+    http_logger.addHandler(rate_limit_handler)
+    try:
+        yield
+    finally:
+        http_logger.removeHandler(rate_limit_handler)
+        client.http.request = request
 
 
 def get_channel_logger(
@@ -184,84 +393,183 @@ def get_channel_logger(
 async def fetch_messages(
     channel: GuildChannel | DMChannel,
     after: datetime | None,
-    cache_cutoff_at: datetime,
-    payloads_expire_days=5,
-    payloads_expire_randomness=10,
+    edits_window_at: datetime,
+    payloads_expire_days=PAYLOADS_EXPIRE_DAYS,
 ) -> AsyncGenerator[Message, None]:
     logger_m = logger["messages"][channel.id]
 
-    # Get channel history iterator
+    # Check whether the channel supports history
     try:
         channel_history = channel.history
     except AttributeError:
         logger_m.debug(f"Channel doesn't support history: {channel.type}")
         return
-    iterator = channel_history(limit=None, after=after, oldest_first=False)
 
-    # Load cached messages
+    # Load the high-water mark, i.e. the newest message we have in cache.
+    # Everything after it, and everything within the recent edits window,
+    # gets downloaded. Everything else is read from the cache.
     cache = get_cache()
-    cache_key = f"message-payloads:{channel.id}"
-
-    payloads_mapping: dict[int, MessagePayload] = await call_async(
-        cache.get, cache_key, {}
-    )
-    payloads = filter_payloads(payloads_mapping.values(), after, cache_cutoff_at)
-    cached_ids = frozenset(int(payload["id"]) for payload in payloads)
+    index_key = f"message-payloads:{channel.id}"
+    index = await call_async(cache.get, index_key, None)
+    boundary = get_fetch_boundary(index, edits_window_at)
+    if boundary:
+        cached_payloads = await call_async(
+            load_cached_payloads, cache, channel.id, index["chunks"]
+        )
+        if cached_payloads is None:
+            logger_m.warning("Some cached chunks are missing, downloading everything")
+            cached_payloads, boundary = [], None
+    else:
+        cached_payloads = []
+    cached_payloads = [
+        payload for payload in cached_payloads if int(payload["id"]) <= boundary
+    ]
 
     # Detect if we can read the whole channel from cache
-    if getattr(channel, "last_message_id", None) in cached_ids:
+    last_message_id = getattr(channel, "last_message_id", None)
+    if boundary and last_message_id and last_message_id <= boundary:
         logger_m.debug("Reading whole channel from cache")
-        for payload in payloads:
-            yield await call_async(create_message, iterator.state, channel, payload)
+        state = channel._state
+        for payload in filter_payloads(cached_payloads, after, None):
+            yield await call_async(create_message, state, channel, payload)
+        await call_async(
+            touch_cached_payloads, cache, channel.id, index, payloads_expire_days
+        )
         return
 
+    if boundary:
+        history_after = Object(id=boundary)
+        if after and time_snowflake(after, high=True) > boundary:
+            history_after = after
+        logger_m.debug(f"Downloading messages after #{boundary}")
+    else:
+        history_after = after
+    iterator = channel_history(limit=None, after=history_after, oldest_first=False)
+
     # Patch the iterator to collect payloads
     _retrieve_messages = iterator._retrieve_messages
+    fetched_payloads = []
 
     async def _retrieve_messages_patched(*args, **kwargs) -> list[MessagePayload]:
         payloads_batch = list(await _retrieve_messages(*args, **kwargs))
-        payloads_mapping.update(
-            {int(payload["id"]): deepcopy(payload) for payload in payloads_batch}
-        )
+        fetched_payloads.extend(deepcopy(payload) for payload in payloads_batch)
         return payloads_batch
 
     iterator._retrieve_messages = _retrieve_messages_patched
 
-    # Iterate over messages
+    # Iterate over messages, first the downloaded ones, then the cached ones
     count_downloaded = 0
     count_cached = 0
     async for message in iterator:
-        if message.id in cached_ids:
-            for payload in payloads:
-                yield await call_async(create_message, iterator.state, channel, payload)
-                count_cached += 1
-            break
-        else:
-            yield message
-            count_downloaded += 1
+        yield message
+        count_downloaded += 1
+    for payload in filter_payloads(cached_payloads, after, None):
+        yield await call_async(create_message, iterator.state, channel, payload)
+        count_cached += 1
     logger_m.debug(
         f"Downloaded {count_downloaded} messages, "
         f"loaded {count_cached} messages from cache, "
         f"total {count_downloaded + count_cached} messages"
     )
 
-    if payloads_mapping:
-        # Store payloads, but only for a limited time - this is again, to allow
-        # for updates like edits and deletes to propagate to the cache.
-        # The randomness is to prevent all messages from expiring at the same time,
-        # instead to gradually expire channels and renew their cache over the course
-        # of a few days.
-        days = payloads_expire_days + random.randint(0, payloads_expire_randomness)
-        logger_m.debug(f"Caching {len(payloads_mapping)} messages for {days} days")
+    payloads = merge_payloads(cached_payloads, fetched_payloads, after)
+    if payloads:
+        logger_m.debug(f"Caching {len(payloads)} messages")
         await call_async(
-            cache.set,
-            cache_key,
-            payloads_mapping,
-            timedelta(days=days).total_seconds(),
-            tag="messages",
+            store_cached_payloads,
+            cache,
+            channel.id,
+            index,
+            payloads,
+            payloads_expire_days,
         )
 
 
+def get_fetch_boundary(index: dict | None, edits_window_at: datetime) -> int | None:
+    if not index or not index.get("high_water_mark"):
+        return None
+    return min(
+        index["high_water_mark"], time_snowflake(edits_window_at, high=False) - 1
+    )
+
+
+def get_chunk_id(message_id: int) -> str:
+    return f"{snowflake_time(message_id):%Y-%m}"
+
+
+def chunk_payloads(payloads: list[MessagePayload]) -> dict[str, list[MessagePayload]]:
+    chunks = {}
+    for payload in payloads:
+        chunks.setdefault(get_chunk_id(int(payload["id"])), []).append(payload)
+    return chunks
+
+
+def merge_payloads(
+    cached_payloads: list[MessagePayload],
+    fetched_payloads: list[MessagePayload],
+    after: datetime | None,
+) -> list[MessagePayload]:
+    payloads_mapping = {int(payload["id"]): payload for payload in cached_payloads}
+    payloads_mapping.update(
+        {int(payload["id"]): payload for payload in fetched_payloads}
+    )
+    return filter_payloads(payloads_mapping.values(), after, None)
+
+
+def load_cached_payloads(
+    cache: Cache, channel_id: int, chunk_ids: list[str]
+) -> list[MessagePayload] | None:
+    payloads = []
+    for chunk_id in chunk_ids:
+        chunk = cache.get(f"message-payloads:{channel_id}:{chunk_id}")
+        if chunk is None:
+            return None
+        payloads.extend(chunk)
+    return payloads
+
+
+def store_cached_payloads(
+    cache: Cache,
+    channel_id: int,
+    index: dict | None,
+    payloads: list[MessagePayload],
+    expire_days: int,
+) -> None:
+    expire = timedelta(days=expire_days).total_seconds()
+    chunks = chunk_payloads(payloads)
+    chunks_checksums = {
+        chunk_id: get_chunk_checksum(chunk) for chunk_id, chunk in chunks.items()
+    }
+    previous_checksums = (index or {}).get("checksums", {})
+    for chunk_id, chunk in chunks.items():
+        key = f"message-payloads:{channel_id}:{chunk_id}"
+        if previous_checksums.get(chunk_id) == chunks_checksums[chunk_id]:
+            if cache.touch(key, expire):
+                continue
+        cache.set(key, chunk, expire, tag="messages")
+    for chunk_id in set(previous_checksums) - set(chunks):
+        cache.delete(f"message-payloads:{channel_id}:{chunk_id}")
+    index = dict(
+        high_water_mark=max(int(payload["id"]) for payload in payloads),
+        chunks=sorted(chunks),
+        checksums=chunks_checksums,
+    )
+    cache.set(f"message-payloads:{channel_id}", index, expire, tag="messages")
+
+
+def touch_cached_payloads(
+    cache: Cache, channel_id: int, index: dict, expire_days: int
+) -> None:
+    expire = timedelta(days=expire_days).total_seconds()
+    for chunk_id in index["chunks"]:
+        cache.touch(f"message-payloads:{channel_id}:{chunk_id}", expire)
+    cache.touch(f"message-payloads:{channel_id}", expire)
+
+
+def get_chunk_checksum(chunk: list[MessagePayload]) -> str:
+    return hash_bytes(pickle.dumps(chunk))
+
+
 def filter_payloads(
     payloads: list[MessagePayload],
     after: datetime | None,
@@ -271,7 +579,7 @@ def filter_payloads(
         payloads = filter(partial(is_payload_after, after=after), payloads)
     if before:
         payloads = filter(partial(is_payload_before, before=before), payloads)
-    return sorted(payloads, key=itemgetter("id"), reverse=True)
+    return sorted(payloads, key=lambda payload: int(payload["id"]), reverse=True)
 
 
 def is_payload_after(payload: MessagePayload, after: datetime) -> bool:
@@ -1,9 +1,12 @@
+import asyncio
+from time import perf_counter
+
 import arrow
-import peewee
 from discord import DMChannel, Member, Message, User
+from peewee import chunked
 
 from juniorguru.lib import loggers
-from juniorguru.lib.async_utils import make_async
+from juniorguru.lib.async_utils import call_async
 from juniorguru.lib.discord_club import (
     ClubMemberID,
     emoji_name,
@@ -19,15 +22,149 @@ from juniorguru.models.base import db
 from juniorguru.models.club import ClubMessage, ClubPin, ClubUser
 
 
+BATCH_SIZE = 500
+
+INSERT_CHUNK_SIZE = 100
+
+QUEUE_SIZE = 5000
+
+
 logger = loggers.from_path(__file__)
 
 
-@make_async
-@db.connection_context()
-def store_member(member: Member) -> ClubUser:
-    """Stores in database given Discord Member object"""
-    logger["users"][member.id].debug(f"Saving {member.display_name!r}")
-    return ClubUser.create(
+class Store:
+    """
+    Single writer to the database, fed through a queue
+
+    Rows are coalesced into batches and each batch gets written inside
+    a single transaction, so that the crawler doesn't need to open
+    thousands of tiny transactions contending on the same database file.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE, queue_size: int = QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.user_ids = set()
+        self.member_ids = set()
+        self.rows_count = 0
+        self.batches_count = 0
+        self.time = 0
+
+    async def run(self) -> None:
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            closing = items[-1] is None
+            batch = Batch(item for item in items if item is not None)
+            if batch:
+                await call_async(self.write, batch)
+            for _ in items:
+                self.queue.task_done()
+            if closing:
+                break
+
+    async def close(self) -> None:
+        await self.queue.put(None)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_count / self.time if self.time else 0
+
+    def write(self, batch: "Batch") -> None:
+        time = perf_counter()
+        with db.connection_context(), db.atomic():
+            for rows in chunked(batch.users, INSERT_CHUNK_SIZE):
+                ClubUser.insert_many(rows).on_conflict_ignore().execute()
+            for rows in chunked(batch.messages, INSERT_CHUNK_SIZE):
+                ClubMessage.insert_many(rows).on_conflict_ignore().execute()
+            for rows in chunked(batch.pins, INSERT_CHUNK_SIZE):
+                ClubPin.insert_many(rows).execute()
+            for channel_id, member_id in batch.dm_channels:
+                rows_count = (
+                    ClubUser.update({ClubUser.dm_channel_id: channel_id})
+                    .where(ClubUser.id == member_id, ClubUser.is_member == True)
+                    .execute()
+                )
+                if rows_count != 1:
+                    raise RuntimeError(
+                        f"Unexpected number of rows updated ({rows_count}) when recording DM channel #{channel_id} to member #{member_id}"
+                    )
+        self.time += perf_counter() - time
+        self.rows_count += len(batch)
+        self.batches_count += 1
+        logger.debug(
+            f"Written batch #{self.batches_count} of {len(batch)} rows, "
+            f"{self.rows_per_sec:.0f} rows/s"
+        )
+
+    async def store_member(self, member: Member) -> None:
+        """Stores given Discord Member object"""
+        logger["users"][member.id].debug(f"Saving {member.display_name!r}")
+        self.user_ids.add(member.id)
+        if not member.bot:
+            self.member_ids.add(member.id)
+        await self.queue.put(("users", get_member_row(member)))
+
+    async def store_message(self, message: Message) -> None:
+        """
+        Stores given Discord Message object
+
+        If the author isn't stored yet, it stores it along the way.
+        """
+        if message.author.id not in self.user_ids:
+            logger["users"][message.author.id].debug(
+                f"Saving {message.author.display_name!r}"
+            )
+            self.user_ids.add(message.author.id)
+            await self.queue.put(("users", get_user_row(message.author)))
+        await self.queue.put(("messages", get_message_row(message)))
+
+    async def store_pin(self, message: Message, member: Member) -> None:
+        """Stores the information about given Discord Member pinning given Discord Message"""
+        if member.id not in self.member_ids:
+            logger["pins"].debug(
+                f"Message {message.jump_url} is pinned by '{member.display_name}' #{member.id}, who isn't a member, skipping"
+            )
+            return
+        logger["pins"].debug(
+            f"Message {message.jump_url} is pinned by member '{member.display_name}' #{member.id}"
+        )
+        await self.queue.put(
+            ("pins", dict(pinned_message=message.id, member=member.id))
+        )
+
+    async def store_dm_channel(self, channel: DMChannel) -> None:
+        """Stores the information about given Discord DM channel"""
+        # Assuming the recipient is a member, but also ensuring it REALLY IS a member
+        # in the where() clause when writing.
+        member = channel.recipient
+        logger["dm"].debug(
+            f"Channel {channel.id} belongs to member '{member.display_name}' #{member.id}"
+        )
+        await self.queue.put(("dm_channels", (channel.id, member.id)))
+
+
+class Batch:
+    def __init__(self, items):
+        self.users = []
+        self.messages = []
+        self.pins = []
+        self.dm_channels = []
+        for table, row in items:
+            getattr(self, table).append(row)
+
+    def __len__(self) -> int:
+        return (
+            len(self.users)
+            + len(self.messages)
+            + len(self.pins)
+            + len(self.dm_channels)
+        )
+
+
+def get_member_row(member: Member) -> dict:
+    return dict(
         id=member.id,
         is_bot=member.bot,
         is_member=True,
@@ -39,118 +176,49 @@ def store_member(member: Member) -> ClubUser:
     )
 
 
-@db.connection_context()
-def _store_user(user: User) -> ClubUser:
-    """
-    Stores in database given Discord User object
-
-    If given user is already stored, it silently returns the existing database object.
-    """
-    logger["users"][user.id].debug(f"Saving {user.display_name!r}")
-    try:
-        # The message.author can be an instance of Member, but it can also be an instance of User,
-        # if the author isn't a member of the Discord guild/server anymore. User instances don't
-        # have certain properties, hence the getattr() calls below.
-        obj = ClubUser.create(
-            id=user.id,
-            is_bot=user.bot,
-            is_member=bool(getattr(user, "joined_at", False)),
-            has_avatar=bool(user.avatar),
-            display_name=user.display_name,
-            mention=user.mention,
-            joined_at=(
-                arrow.get(user.joined_at).naive if hasattr(user, "joined_at") else None
-            ),
-            initial_roles=get_user_roles(user),
-        )
-        logger["users"][user.id].debug(f"Saved {user.display_name!r} as {obj!r}")
-        return obj
-    except peewee.IntegrityError:
-        obj = ClubUser.get_by_id(user.id)
-        logger["users"][user.id].debug(f"Found {user.display_name!r} as {obj!r}")
-        return obj
-
+def get_user_row(user: User) -> dict:
+    # The message.author can be an instance of Member, but it can also be an instance of User,
+    # if the author isn't a member of the Discord guild/server anymore. User instances don't
+    # have certain properties, hence the getattr() calls below.
+    return dict(
+        id=user.id,
+        is_bot=user.bot,
+        is_member=bool(getattr(user, "joined_at", False)),
+        has_avatar=bool(user.avatar),
+        display_name=user.display_name,
+        mention=user.mention,
+        joined_at=(
+            arrow.get(user.joined_at).naive if hasattr(user, "joined_at") else None
+        ),
+        initial_roles=get_user_roles(user),
+    )
 
-@make_async
-@db.connection_context()
-def store_message(message: Message) -> ClubMessage:
-    """
-    Stores in database given Discord Message object
 
-    If the author isn't stored yet, it stores it along the way.
-    """
+def get_message_row(message: Message) -> dict:
     # The channel can be a GuildChannel, but it can also be a DMChannel.
     # Those have different properties, hence the get_...() and getattr() calls below.
     channel = message.channel
-    try:
-        return ClubMessage.create(
-            id=message.id,
-            url=message.jump_url,
-            content=message.content,
-            content_size=len(message.content or ""),
-            content_starting_emoji=get_starting_emoji(message.content),
-            reactions={
-                emoji_name(reaction.emoji): reaction.count
-                for reaction in message.reactions
-            },
-            upvotes_count=count_upvotes(message.reactions),
-            downvotes_count=count_downvotes(message.reactions),
-            created_at=arrow.get(message.created_at).naive,
-            created_month=f"{message.created_at:%Y-%m}",
-            edited_at=(
-                arrow.get(message.edited_at).naive if message.edited_at else None
-            ),
-            author=_store_user(message.author),
-            author_is_bot=message.author.id == ClubMemberID.BOT,
-            channel_id=channel.id,
-            channel_name=get_channel_name(channel),
-            parent_channel_id=get_parent_channel(channel).id,
-            parent_channel_name=get_channel_name(get_parent_channel(channel)),
-            category_id=getattr(channel, "category_id", None),
-            type=message.type.name,
-            is_private=is_channel_private(channel),
-            pinned_message_url=get_pinned_message_url(message),
-        )
-    except peewee.IntegrityError:
-        message_obj = ClubMessage.get_by_id(message.id)
-        logger["messages"].debug(
-            f"Message {message.jump_url} apparently already stored as {message_obj!r}"
-        )
-        return message_obj
-
-
-@make_async
-@db.connection_context()
-def store_pin(message: ClubMessage, member: Member) -> ClubPin:
-    """
-    Stores in database the information about given Discord Member pinning given Discord Message
-
-    If the reacting member isn't stored yet, it stores it along the way.
-    """
-    logger["pins"].debug(
-        f"Message {message.url} is pinned by member '{member.display_name}' #{member.id}"
+    return dict(
+        id=message.id,
+        url=message.jump_url,
+        content=message.content,
+        content_size=len(message.content or ""),
+        content_starting_emoji=get_starting_emoji(message.content),
+        reactions={
+            emoji_name(reaction.emoji): reaction.count for reaction in message.reactions
+        },
+        upvotes_count=count_upvotes(message.reactions),
+        downvotes_count=count_downvotes(message.reactions),
+        created_at=arrow.get(message.created_at).naive,
+        created_month=f"{message.created_at:%Y-%m}",
+        author=message.author.id,
+        author_is_bot=message.author.id == ClubMemberID.BOT,
+        channel_id=channel.id,
+        channel_name=get_channel_name(channel),
+        parent_channel_id=get_parent_channel(channel).id,
+        parent_channel_name=get_channel_name(get_parent_channel(channel)),
+        category_id=getattr(channel, "category_id", None),
+        type=message.type.name,
+        is_private=is_channel_private(channel),
+        pinned_message_url=get_pinned_message_url(message),
     )
-    return ClubPin.create(
-        pinned_message=message.id, member=ClubUser.get_member_by_id(member.id)
-    )
-
-
-@make_async
-@db.connection_context()
-def store_dm_channel(channel: DMChannel) -> None:
-    """Stores in database the information about given Discord DM channel"""
-    # Assuming the recipient is a member, but also ensuring it REALLY IS a member
-    # in the where() clause below.
-    member = channel.recipient
-    logger["dm"].debug(
-        f"Channel {channel.id} belongs to member '{member.display_name}' #{member.id}"
-    )
-    rows_count = (
-        ClubUser.update({ClubUser.dm_channel_id: channel.id})
-        .where(ClubUser.id == member.id, ClubUser.is_member == True)
-        .execute()
-    )
-    if rows_count != 1:
-        raise RuntimeError(
-            f"Unexpected number of rows updated ({rows_count}) when recording DM channel #{channel.id} to member #{member.id}"
-        )
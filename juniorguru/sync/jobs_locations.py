@@ -1,6 +1,6 @@
 from juniorguru.cli.sync import main as cli
 from juniorguru.lib import loggers
-from juniorguru.lib.locations import fetch_locations
+from juniorguru.lib.locations import fetch_locations_bulk, to_locations
 from juniorguru.models.base import db
 from juniorguru.models.job import ListedJob
 
@@ -11,16 +11,25 @@ logger = loggers.from_path(__file__)
 @cli.sync_command(dependencies=["jobs-listing"])
 @db.connection_context()
 def main():
+    jobs = []
     for job in ListedJob.listing():
         if job.locations_raw:
-            logger.debug(f"Normalizing locations for {job!r}: {job.locations_raw!r}")
-            job.locations = fetch_locations(
-                job.locations_raw,
-                debug_info=dict(title=job.title, company_name=job.company_name),
-            )
-            logger.info(
-                f"Locations for {job!r} normalized: {job.locations_raw} → {job.locations}"
-            )
-            job.save()
+            jobs.append(job)
         else:
             logger.debug(f"Job {job!r} has no locations set")
+
+    logger.info(f"Normalizing locations for {len(jobs)} jobs")
+    parse_results = fetch_locations_bulk(
+        location_raw for job in jobs for location_raw in job.locations_raw
+    )
+    for job in jobs:
+        job.locations = to_locations(
+            parse_results[location_raw] for location_raw in job.locations_raw
+        )
+        logger.debug(
+            f"Locations for {job!r} normalized: {job.locations_raw} → {job.locations}"
+        )
+
+    logger.info("Saving locations")
+    with db.atomic():
+        ListedJob.bulk_update(jobs, fields=[ListedJob.locations], batch_size=100)
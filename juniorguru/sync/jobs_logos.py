@@ -1,15 +1,22 @@
+import asyncio
 import hashlib
+import time
+from collections import defaultdict
+from datetime import timedelta
 from io import BytesIO
-from multiprocessing import Pool
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 
-import favicon
-import requests
+import httpx
+from diskcache import Cache
+from favicon.favicon import tags as favicon_tags
 from PIL import Image, ImageChops, ImageOps
 
 from juniorguru.cli.sync import main as cli
 from juniorguru.lib import loggers
+from juniorguru.lib.async_utils import call_async
+from juniorguru.lib.cache import cache, get_cache
+from juniorguru.lib.cli import async_command
 from juniorguru.models.base import db
 from juniorguru.models.job import ListedJob
 
@@ -22,10 +29,18 @@ IMAGES_DIR = Path("juniorguru/images")
 
 LOGOS_DIR = IMAGES_DIR / "logos-jobs"
 
-WORKERS = 4
+MAX_CONNECTIONS = 20
 
-# https://docs.python-requests.org/en/master/user/advanced/#timeouts
-REQUEST_TIMEOUT = (3.05, 15)
+MAX_CONNECTIONS_PER_HOST = 4
+
+# https://www.python-httpx.org/advanced/timeouts/
+REQUEST_TIMEOUT = httpx.Timeout(15, connect=3.05)
+
+REVALIDATE_AFTER = timedelta(days=3)
+
+INDEX_EXPIRE = timedelta(days=90)
+
+ICONS_EXPIRE = timedelta(days=7)
 
 # Just copy-paste of raw headers Firefox sends to a web page. None of it is
 # intentionally set to a specific value with a specific meaning.
@@ -52,46 +67,204 @@ logger = loggers.from_path(__file__)
 
 
 @cli.sync_command(dependencies=["jobs-listing"])
-@db.connection_context()
-def main():
+@async_command
+async def main():
     Path(LOGOS_DIR).mkdir(exist_ok=True, parents=True)
-
-    with Pool(WORKERS) as pool:
-        jobs = ListedJob.listing()
-        urls = {}
-
-        logger.info("Registering company logo URLs")
-        for job in jobs:
-            for logo_url in job.company_logo_urls:
-                urls.setdefault(logo_url, dict(type="logo", jobs=[]))
-                urls[logo_url]["jobs"].append(job.id)
+    with db.connection_context():
+        jobs = list(ListedJob.listing())
+    urls = {}
+
+    logger.info("Registering company logo URLs")
+    for job in jobs:
+        for logo_url in job.company_logo_urls:
+            urls.setdefault(logo_url, dict(type="logo", jobs=[]))
+            urls[logo_url]["jobs"].append(job.id)
+
+    async with httpx.AsyncClient(
+        headers=DEFAULT_REQUEST_HEADERS,
+        timeout=REQUEST_TIMEOUT,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS),
+        follow_redirects=True,
+    ) as client:
+        fetcher = Fetcher(client)
 
         logger.info("Fetching and registering company icon URLs")
-        inputs = ((job.id, job.company_url) for job in jobs if job.company_url)
-        results = pool.imap_unordered(fetch_icon_urls, inputs)
-        for job_id, icon_urls in results:
-            for icon_url in icon_urls:
+        company_urls = {job.company_url for job in jobs if job.company_url}
+        icon_urls = dict(
+            zip(
+                company_urls,
+                await asyncio.gather(
+                    *[fetcher.fetch_icon_urls(url) for url in company_urls]
+                ),
+            )
+        )
+        for job in jobs:
+            for icon_url in icon_urls.get(job.company_url, []):
                 urls.setdefault(icon_url, dict(type="icon", jobs=[]))
-                urls[icon_url]["jobs"].append(job_id)
+                urls[icon_url]["jobs"].append(job.id)
 
         logger.info("Downloading images from both logo and icon URLs")
-        results = pool.imap_unordered(download_image, urls.keys())
+        results = await asyncio.gather(
+            *[fetcher.download_image(url) for url in urls.keys()]
+        )
         for image_url, image_path, orig_width, orig_height in results:
             urls[image_url]["image_path"] = image_path
             urls[image_url]["orig_width"] = orig_width
             urls[image_url]["orig_height"] = orig_height
+    logger.info(str(fetcher.stats))
+
+    logger.info("Deciding which images to use")
+    logo_paths = {}
+    for logo in sorted(urls.values(), key=sort_key):
+        for job_id in logo["jobs"]:
+            logo_paths.setdefault(job_id, logo["image_path"])
+    for job in jobs:
+        logo_path = logo_paths.get(job.id)
+        if logo_path:
+            job.company_logo_path = Path(logo_path).relative_to(IMAGES_DIR)
+            logger.debug(f"Logo for {job!r}: {job.company_logo_path}")
+    with db.connection_context(), db.atomic():
+        ListedJob.bulk_update(
+            jobs, fields=[ListedJob.company_logo_path], batch_size=100
+        )
 
-        logger.info("Deciding which images to use")
-        logo_paths = {}
-        for logo in sorted(urls.values(), key=sort_key):
-            for job_id in logo["jobs"]:
-                logo_paths.setdefault(job_id, logo["image_path"])
-        for job in jobs:
-            logo_path = logo_paths.get(job.id)
-            if logo_path:
-                job.company_logo_path = Path(logo_path).relative_to(IMAGES_DIR)
-                logger.debug(f"Logo for {job!r}: {job.company_logo_path}")
-            job.save()
+
+class FetcherStats:
+    def __init__(self):
+        self.fresh = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.converted = 0
+        self.failed = 0
+
+    def __str__(self) -> str:
+        return (
+            f"Images: {self.fresh} fresh, {self.not_modified} not modified, "
+            f"{self.unchanged} unchanged, {self.converted} converted, "
+            f"{self.failed} failed"
+        )
+
+
+class Fetcher:
+    """
+    Downloads company icons and logos, remembering what it downloaded
+
+    For each image URL it keeps an index entry with the validators
+    from the response headers, hash of the image, its original
+    dimensions, and the converted image. Images checked recently
+    aren't requested at all, older ones are revalidated with
+    a conditional request, and images with the same content as before
+    aren't converted again.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, cache: Cache | None = None):
+        self.client = client
+        self.cache = get_cache() if cache is None else cache
+        self.host_limits = defaultdict(
+            lambda: asyncio.Semaphore(MAX_CONNECTIONS_PER_HOST)
+        )
+        self.stats = FetcherStats()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        async with self.host_limits[urlparse(url).hostname]:
+            return await self.client.get(url, **kwargs)
+
+    @cache(expire=ICONS_EXPIRE, tag="jobs-logos-icons", ignore=(0,))
+    async def fetch_icon_urls_cached(self, company_url: str) -> list[str]:
+        response = await self.get(company_url)
+        response.raise_for_status()
+        urls = [icon.url for icon in favicon_tags(str(response.url), response.text)]
+        urls.append(urljoin(str(response.url), "/favicon.ico"))
+        return unique(urls)
+
+    async def fetch_icon_urls(self, company_url: str) -> list[str]:
+        logger_f = logger["fetch_icon_urls"]
+        logger_f.debug(f"Fetching icon URLs for {company_url}")
+        try:
+            urls = await self.fetch_icon_urls_cached(company_url)
+            logger_f.debug(f"Icon URLs found for {company_url}: {urls!r}")
+            return urls
+        except Exception:
+            logger_f.exception(f"Fetching icon URLs for {company_url} failed")
+            return []
+
+    async def download_image(
+        self, image_url: str
+    ) -> tuple[str, Path | None, int | None, int | None]:
+        logger_d = logger["download_image"]
+        try:
+            image_path = (
+                LOGOS_DIR / f"{hashlib.sha1(image_url.encode()).hexdigest()}.png"
+            )
+            key = ("jobs-logos", image_url)
+            entry = await call_async(self.cache.get, key)
+            headers = {"User-Agent": choose_user_agent(image_url)}
+
+            if entry:
+                if time.time() - entry["checked_at"] < REVALIDATE_AFTER.total_seconds():
+                    logger_d.debug(f"Fresh {image_url}")
+                    self.stats.fresh += 1
+                    return self.use_entry(image_url, image_path, entry)
+                if entry["etag"]:
+                    headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    headers["If-Modified-Since"] = entry["last_modified"]
+
+            logger_d.debug(f"Downloading {image_url}")
+            response = await self.get(image_url, headers=headers)
+            if entry and response.status_code == 304:
+                logger_d.debug(f"Not modified {image_url}")
+                self.stats.not_modified += 1
+            else:
+                response.raise_for_status()
+                image_hash = hashlib.sha1(response.content).hexdigest()
+                if entry and entry["image_hash"] == image_hash:
+                    logger_d.debug(f"Unchanged {image_url}")
+                    self.stats.unchanged += 1
+                else:
+                    entry = await call_async(process_image, response.content)
+                    entry["image_hash"] = image_hash
+                    logger_d.info(f"Downloaded {image_url} as {image_path}")
+                    self.stats.converted += 1
+                entry["etag"] = response.headers.get("ETag")
+                entry["last_modified"] = response.headers.get("Last-Modified")
+
+            entry["checked_at"] = time.time()
+            await call_async(
+                self.cache.set,
+                key,
+                entry,
+                expire=INDEX_EXPIRE.total_seconds(),
+                tag="jobs-logos",
+            )
+            return self.use_entry(image_url, image_path, entry)
+        except httpx.HTTPStatusError as e:
+            logger_d.debug(f"Unable to download {image_url}: {e}")
+            self.stats.failed += 1
+            return image_url, None, None, None
+        except Exception:
+            logger_d.exception(f"Unable to download {image_url}")
+            self.stats.failed += 1
+            return image_url, None, None, None
+
+    def use_entry(
+        self, image_url: str, image_path: Path, entry: dict
+    ) -> tuple[str, Path, int, int]:
+        if not image_path.exists() or image_path.read_bytes() != entry["image"]:
+            image_path.write_bytes(entry["image"])
+        return image_url, image_path, entry["orig_width"], entry["orig_height"]
+
+
+def process_image(content: bytes) -> dict:
+    orig_image = Image.open(BytesIO(content))
+    orig_width, orig_height = orig_image.size
+    if orig_width > MAX_SIZE_PX or orig_height > MAX_SIZE_PX:
+        raise ValueError(
+            f"Image too large ({orig_width}x{orig_height} < {MAX_SIZE_PX}x{MAX_SIZE_PX})"
+        )
+    image = BytesIO()
+    convert_image(orig_image).save(image, "PNG")
+    return dict(image=image.getvalue(), orig_width=orig_width, orig_height=orig_height)
 
 
 def sort_key(logo):
@@ -115,53 +288,6 @@ def sort_key(logo):
     return (is_icon, similarity_to_square, area)
 
 
-def fetch_icon_urls(args):
-    logger_f = logger["fetch_icon_urls"]
-    job_id, company_url = args
-    logger_f.debug(f"Fetching icon URLs for <ListedJob: {job_id}>, {company_url}")
-    try:
-        icons = favicon.get(
-            company_url, timeout=REQUEST_TIMEOUT, headers=DEFAULT_REQUEST_HEADERS
-        )
-        urls = unique(icon.url for icon in icons)
-        logger_f.info(
-            f"Icon URLs found for <ListedJob: {job_id}>, {company_url}: {urls!r}"
-        )
-        return job_id, urls
-    except Exception:
-        logger_f.exception(
-            f"Fetching icon URLs for <ListedJob: {job_id}>, {company_url} failed"
-        )
-        return job_id, []
-
-
-def download_image(image_url):
-    logger_d = logger["download_image"]
-    logger_d.debug(f"Downloading {image_url}")
-    try:
-        headers = dict(DEFAULT_REQUEST_HEADERS)
-        headers["User-Agent"] = choose_user_agent(image_url)
-        response = requests.get(image_url, timeout=REQUEST_TIMEOUT, headers=headers)
-        response.raise_for_status()
-
-        orig_image = Image.open(BytesIO(response.content))
-        orig_width, orig_height = orig_image.size
-        if orig_width > MAX_SIZE_PX or orig_height > MAX_SIZE_PX:
-            raise ValueError(
-                f"Image too large ({orig_width}x{orig_height} < {MAX_SIZE_PX}x{MAX_SIZE_PX})"
-            )
-
-        hash = hashlib.sha1(image_url.encode()).hexdigest()
-        image_path = LOGOS_DIR / f"{hash}.png"
-        convert_image(orig_image).save(image_path)
-        logger_d.info(f"Downloaded {image_url} as {image_path}")
-
-        return image_url, image_path, orig_width, orig_height
-    except Exception:
-        logger_d.exception(f"Unable to download {image_url}")
-        return image_url, None, None, None
-
-
 def convert_image(image):
     # transparent to white
     image = image.convert("RGBA")
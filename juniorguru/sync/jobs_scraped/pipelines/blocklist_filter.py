@@ -1,6 +1,6 @@
 import re
 
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 BLOCKLIST = [
@@ -26,7 +26,7 @@ BLOCKLIST = [
 ]
 
 
-async def process(item: dict) -> dict:
+def process(item: dict) -> dict:
     for field, value_re in BLOCKLIST:
         value = item.get(field) or ""
         if value_re.search(value):
@@ -1,6 +1,6 @@
 import re
 
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 RE_IDENTIFY_MAPPING = [
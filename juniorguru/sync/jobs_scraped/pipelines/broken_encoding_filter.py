@@ -1,11 +1,11 @@
 from juniorguru.lib import loggers
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 logger = loggers.from_path(__file__)
 
 
-async def process(item: dict, max_qm_count: int = 20) -> dict:
+def process(item: dict, max_qm_count: int = 20) -> dict:
     qm_count = item["description_html"].count("?")
     if qm_count <= max_qm_count:
         return item
@@ -7,7 +7,7 @@ from juniorguru.lib.text import extract_text
 logger = loggers.from_path(__file__)
 
 
-async def process(item: dict) -> dict:
+def process(item: dict) -> dict:
     try:
         item["description_text"] = extract_text(item["description_html"])
     except Exception:
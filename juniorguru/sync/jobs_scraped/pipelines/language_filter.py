@@ -1,5 +1,5 @@
 from juniorguru.lib import loggers
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 logger = loggers.from_path(__file__)
@@ -8,7 +8,7 @@ logger = loggers.from_path(__file__)
 RELEVANT_LANGS = ["cs", "en", "sk"]
 
 
-async def process(item: dict) -> dict:
+def process(item: dict) -> dict:
     if item["lang"] not in RELEVANT_LANGS:
         raise DropItem(
             f"Language detected as '{item['lang']}' (relevant: {', '.join(RELEVANT_LANGS)})"
@@ -3,14 +3,13 @@ from functools import lru_cache
 from lingua import LanguageDetector, LanguageDetectorBuilder
 
 from juniorguru.lib import loggers
-from juniorguru.lib.async_utils import call_async
 
 
 logger = loggers.from_path(__file__)
 
 
-async def process(item: dict) -> dict:
-    item["lang"] = await call_async(parse_language, item["description_text"])
+def process(item: dict) -> dict:
+    item["lang"] = parse_language(item["description_text"])
     return item
 
 
@@ -1,7 +1,7 @@
 from juniorguru.lib import loggers
-from juniorguru.lib.llm import ask_for_json
+from juniorguru.lib.llm import BatchClassifier
 from juniorguru.lib.mutations import MutationsNotAllowedError
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 SYSTEM_PROMPT = """
@@ -23,12 +23,13 @@ with a valid JSON object containing the following keys:
 
 logger = loggers.from_path(__file__)
 
+classifier = BatchClassifier(SYSTEM_PROMPT)
+
 
 async def process(item: dict) -> dict:
     try:
-        item["llm_opinion"] = await ask_for_json(
-            SYSTEM_PROMPT,
-            f"{item['title']}\n\n{item['description_text']}",
+        item["llm_opinion"] = await classifier.classify(
+            f"{item['title']}\n\n{item['description_text']}"
         )
     except MutationsNotAllowedError:
         raise DropItem("Asking LLM is not allowed")
@@ -1,4 +1,4 @@
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 
 
 async def process(item: dict) -> dict:
@@ -35,7 +35,9 @@ YAML_SCHEMA = Seq(
 )
 
 
-@cli.sync_command()
+@cli.sync_command(
+    input_files=[YAML_PATH], output_tables=[PartnershipPlan, PartnershipBenefit]
+)
 @db.connection_context()
 def main():
     logger.info("Reading YAML with partners")
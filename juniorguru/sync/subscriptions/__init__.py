@@ -17,6 +17,7 @@ from juniorguru.models.partner import Partner
 from juniorguru.models.subscription import (
     SubscriptionActivity,
     SubscriptionActivityType,
+    SubscriptionState,
     SubscriptionType,
 )
 
@@ -64,8 +65,8 @@ def main(from_date, multiple_products_date, history_path, clear_history):
     logger.info("Preparing")
     memberful = MemberfulAPI()
 
-    SubscriptionActivity.drop_table()
-    SubscriptionActivity.create_table()
+    db.drop_tables([SubscriptionActivity, SubscriptionState])
+    db.create_tables([SubscriptionActivity, SubscriptionState])
 
     subscripton_types_mapping = {
         **{
@@ -167,6 +168,10 @@ def main(from_date, multiple_products_date, history_path, clear_history):
     logger.info("Cleansing data")
     SubscriptionActivity.cleanse_data()
 
+    logger.info("Building subscription states")
+    SubscriptionState.build()
+    logger.info(f"Finished with {SubscriptionState.select().count()} states")
+
 
 def activities_from_subscription(subscription: dict) -> Generator[dict, None, None]:
     account_id = int(subscription["member"]["id"])
@@ -5,7 +5,7 @@ import click
 
 from juniorguru.cli.sync import main as cli
 from juniorguru.lib import loggers
-from juniorguru.lib.images import render_image_file
+from juniorguru.lib.images import PostersCache, render_image_file
 from juniorguru.models.base import db
 from juniorguru.models.job import ListedJob
 from juniorguru.models.page import LegacyThumbnail, Page
@@ -14,6 +14,8 @@ from juniorguru.web_legacy import app, generate_job_pages, get_freezer
 
 WORKERS = 4
 
+CHUNK_SIZE = 10
+
 
 logger = loggers.from_path(__file__)
 
@@ -33,12 +35,8 @@ logger = loggers.from_path(__file__)
 def main(images_path, output_dir, width, height, clear):
     output_path = images_path / output_dir
     output_path.mkdir(exist_ok=True)
-
-    if clear:
-        existing_paths = list(output_path.glob("*.png"))
-        logger.info(f"Removing {len(existing_paths)} existing thumbnails")
-        for existing_path in existing_paths:
-            existing_path.unlink()
+    thumbnails = PostersCache(output_path)
+    thumbnails.init(clear=clear)
 
     with Pool(WORKERS) as pool:
         pages = list(Page.listing())
@@ -51,10 +49,13 @@ def main(images_path, output_dir, width, height, clear):
                 image_path=page.meta.get("thumbnail_image_path"),
             )
             args.append((i, width, height, "thumbnail.jinja", context, output_path))
-        for i, image_path in pool.imap_unordered(process_thumbnail, args):
+        for i, image_path in pool.imap_unordered(
+            process_thumbnail, args, chunksize=CHUNK_SIZE
+        ):
             page = pages[i]
             page.thumbnail_path = image_path.relative_to(images_path)
             page.save()
+            thumbnails.record(image_path)
             logger.info(f"Page {page.src_uri}: {image_path}")
 
         logger.info(
@@ -83,6 +84,7 @@ def main(images_path, output_dir, width, height, clear):
         default_image_path = render_image_file(
             width, height, "thumbnail_legacy.jinja", {}, output_path
         )
+        thumbnails.record(default_image_path)
         for url in [
             "/404.html",
             "/donate/",
@@ -139,10 +141,13 @@ def main(images_path, output_dir, width, height, clear):
                 ("/jobs/region/slovakia/", "Práce v IT pro začátečníky — Slovensko"),
             ]
         ]
-        for url, image_path in pool.imap_unordered(process_thumbnail, args):
+        for url, image_path in pool.imap_unordered(
+            process_thumbnail, args, chunksize=CHUNK_SIZE
+        ):
             LegacyThumbnail.create(
                 url=url, image_path=image_path.relative_to(images_path)
             )
+            thumbnails.record(image_path)
 
         args = []
         for _, params in generate_job_pages():
@@ -162,10 +167,15 @@ def main(images_path, output_dir, width, height, clear):
                     output_path,
                 )
             )
-        for url, image_path in pool.imap_unordered(process_thumbnail, args):
+        for url, image_path in pool.imap_unordered(
+            process_thumbnail, args, chunksize=CHUNK_SIZE
+        ):
             LegacyThumbnail.create(
                 url=url, image_path=image_path.relative_to(images_path)
             )
+            thumbnails.record(image_path)
+
+        thumbnails.cleanup()
 
         expected_urls = frozenset(get_freezer(app).all_urls())
         urls = frozenset(thumbnail.url for thumbnail in LegacyThumbnail.select())
@@ -11,7 +11,12 @@ from fiobank import FioBank
 
 from juniorguru.cli.sync import confirm, default_from_env, main as cli
 from juniorguru.lib import loggers, mutations
-from juniorguru.models.transaction import Transaction, TransactionsCategory
+from juniorguru.models.base import db
+from juniorguru.models.transaction import (
+    Transaction,
+    TransactionMonth,
+    TransactionsCategory,
+)
 from juniorguru.sync.transactions.categories_spec import CATEGORIES_SPEC
 
 
@@ -85,8 +90,8 @@ def main(
     secrets = dict(video_outsourcing_token=video_outsourcing_token)
 
     logger.info("Preparing database")
-    Transaction.drop_table()
-    Transaction.create_table()
+    db.drop_tables([Transaction, TransactionMonth])
+    db.create_tables([Transaction, TransactionMonth])
 
     logger.info("Getting Fakturoid todos for unpaired transactions")
     todos = []
@@ -26,7 +26,7 @@ YAML_SCHEMA = Seq(
 logger = loggers.from_path(__file__)
 
 
-@cli.sync_command()
+@cli.sync_command(input_files=[YAML_PATH], output_tables=[Wisdom])
 @db.connection_context()
 def main():
     Wisdom.drop_table()
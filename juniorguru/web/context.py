@@ -1,9 +1,11 @@
 import os
+from collections import Counter
 from datetime import date, timedelta
 from operator import attrgetter
 from urllib.parse import urljoin
 
 import arrow
+from peewee import BaseQuery
 
 from juniorguru.lib import loggers
 from juniorguru.lib.benefits_evaluators import BENEFITS_EVALUATORS
@@ -28,10 +30,62 @@ from juniorguru.models.wisdom import Wisdom
 
 CLOUDINARY_HOST = os.getenv("CLOUDINARY_HOST", "res.cloudinary.com")
 
+PROFILE_REPORT_SIZE = 20
+
 
 logger = loggers.from_path(__file__)
 
 
+####################################################################
+# SNAPSHOTS AND PROFILING                                          #
+####################################################################
+
+
+def snapshot(context: dict) -> None:
+    """
+    Evaluates all lazy queries in the context, in place
+
+    The context is built once per build, but a query object would run
+    its SQL again in every page which iterates over it.
+    """
+    for key, value in context.items():
+        if isinstance(value, BaseQuery):
+            context[key] = tuple(value)
+
+
+class ContextProfile:
+    """Counts database queries triggered by building each page, if enabled"""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self) -> None:
+        self.queries = Counter()
+        self.queries_started = {}
+
+    def start(self, name: str) -> None:
+        if self.enabled:
+            self.queries_started[name] = db.queries_count
+
+    def stop(self, name: str) -> None:
+        if self.enabled:
+            self.queries[name] += db.queries_count - self.queries_started.pop(name)
+
+    def report(self, limit: int = PROFILE_REPORT_SIZE) -> None:
+        if not self.enabled:
+            return
+        logger["profile"].info(
+            f"{len(self.queries)} pages triggered "
+            f"{sum(self.queries.values())} queries in total"
+        )
+        for name, count in self.queries.most_common(limit):
+            logger["profile"].info(f"{count} queries: {name}")
+
+
+profile = ContextProfile()
+
+
 ####################################################################
 # SHARED DOCS AND THEME CONTEXT                                    #
 ####################################################################
@@ -64,6 +118,8 @@ def on_shared_context(context):
     # club.md, open.md, main_stories.html
     context["members_total_count"] = ClubUser.members_count()
 
+    snapshot(context)
+
 
 def on_shared_page_context(context, page, config, files):
     pass
@@ -96,10 +152,11 @@ def on_docs_context(context):
     context["stories_by_tags"] = Story.tags_mapping()
 
     # handbook/candidate.md
-    context["jobs"] = ListedJob.listing()
+    jobs = tuple(ListedJob.listing())
+    context["jobs"] = jobs
     context["jobs_remote"] = ListedJob.remote_listing()
-    context["jobs_internship"] = ListedJob.internship_listing()
-    context["jobs_volunteering"] = ListedJob.volunteering_listing()
+    context["jobs_internship"] = ListedJob.internship_listing(jobs)
+    context["jobs_volunteering"] = ListedJob.volunteering_listing(jobs)
 
     # open.md
     context["blog"] = BlogArticle.listing()
@@ -136,6 +193,8 @@ def on_docs_context(context):
         date.today() - timedelta(days=7), limit=5
     )
 
+    snapshot(context)
+
 
 @db.connection_context()
 def on_docs_page_context(context, page, config, files):
@@ -161,6 +220,8 @@ def on_theme_context(context):
     context["partnerships_handbook"] = Partnership.handbook_listing()
     context["course_providers"] = CourseProvider.listing()
 
+    snapshot(context)
+
 
 @db.connection_context()
 def on_theme_page_context(context, page, config, files):
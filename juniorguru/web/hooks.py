@@ -3,13 +3,23 @@ from pathlib import Path
 from mkdocs.utils import get_relative_url
 
 from juniorguru.lib import mkdocs_jinja
-from juniorguru.web import api, context as context_hooks
+from juniorguru.web import (
+    api,
+    context as context_hooks,
+    incremental as incremental_hooks,
+)
+from juniorguru.web.incremental import CONTEXT_KEY, incremental
 
 
 mkdocs_jinja.monkey_patch()
+incremental_hooks.monkey_patch()
 
 
 def on_pre_build(config):
+    context_hooks.profile.reset()
+    context_hooks.profile.start(CONTEXT_KEY)
+    incremental.load()
+    incremental.start(CONTEXT_KEY)
     config["theme"].dirs.append(mkdocs_jinja.get_macros_dir(config))
     config["shared_context"] = {}
     context_hooks.on_shared_context(config["shared_context"])
@@ -17,6 +27,14 @@ def on_pre_build(config):
     context_hooks.on_docs_context(config["docs_context"])
     config["theme_context"] = {}
     context_hooks.on_theme_context(config["theme_context"])
+    config["docs_env"] = mkdocs_jinja.DocsEnvironment(config)
+    context_hooks.profile.stop(CONTEXT_KEY)
+    incremental.stop(CONTEXT_KEY)
+
+
+def on_nav(nav, config, files):
+    incremental.plan(nav, config, files)
+    return nav
 
 
 def on_page_markdown(markdown, page, config, files) -> str:
@@ -24,7 +42,8 @@ def on_page_markdown(markdown, page, config, files) -> str:
 
     Inspired by https://github.com/fralau/mkdocs_macros_plugin
     """
-    env = mkdocs_jinja.get_env(page, config, files)
+    context_hooks.profile.start(page.file.src_uri)
+    incremental.start(page.file.src_uri)
     context = dict(
         page=page,
         config=config,
@@ -35,8 +54,11 @@ def on_page_markdown(markdown, page, config, files) -> str:
     )
     context_hooks.on_shared_page_context(context, page, config, files)
     context_hooks.on_docs_page_context(context, page, config, files)
-    template = env.from_string(markdown)
-    return template.render(**context)
+    template = config["docs_env"].from_page(page, markdown)
+    markdown = template.render(**context)
+    context_hooks.profile.stop(page.file.src_uri)
+    incremental.stop(page.file.src_uri)
+    return markdown
 
 
 def on_env(env, config, files):
@@ -52,12 +74,21 @@ def on_env(env, config, files):
 
 
 def on_page_context(context, page, config, nav):
+    context_hooks.profile.start(page.file.src_uri)
+    incremental.start(page.file.src_uri)
     context.update(config["shared_context"])
     context.update(config["theme_context"])
     context_hooks.on_shared_page_context(context, page, config, context["pages"])
     context_hooks.on_theme_page_context(context, page, config, context["pages"])
 
 
+def on_post_page(output, page, config):
+    context_hooks.profile.stop(page.file.src_uri)
+    incremental.stop(page.file.src_uri)
+    incremental.record(page.file)
+    return output
+
+
 def on_post_build(config):
     api_dir = Path(config["site_dir"]) / "api"
     api_dir.mkdir(parents=True, exist_ok=True)
@@ -66,3 +97,5 @@ def on_post_build(config):
     api.build_events_honza_ics(api_dir, config)
     api.build_podcast_xml(api_dir, config)
     api.build_czechitas_csv(api_dir, config)
+    context_hooks.profile.report()
+    incremental.save(config["site_dir"])
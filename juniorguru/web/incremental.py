@@ -0,0 +1,203 @@
+import json
+from datetime import date
+from pathlib import Path
+
+from mkdocs.structure.files import File, Files
+from mkdocs.structure.nav import Navigation
+
+from juniorguru.lib import loggers
+from juniorguru.lib.fingerprints import fingerprint, fingerprint_table, hash_text
+from juniorguru.models.base import db
+
+
+MANIFEST_VERSION = 1
+
+CONTEXT_KEY = "(context)"
+
+PACKAGE_DIR = Path(__file__).parent.parent
+
+WEB_DIR = PACKAGE_DIR / "web"
+
+GLOBAL_FILES = [
+    WEB_DIR / "mkdocs.yml",
+    f"{WEB_DIR}/*.py",
+    f"{WEB_DIR}/macros/**/*",
+    f"{WEB_DIR}/theme/**/*",
+    f"{WEB_DIR}/docs_templates/**/*",
+    f"{PACKAGE_DIR}/lib/**/*.py",
+    f"{PACKAGE_DIR}/models/**/*.py",
+]
+
+
+logger = loggers.from_path(__file__)
+
+
+class IncrementalBuild:
+    """
+    Re-renders only pages whose inputs changed since the previous build, if enabled
+
+    For every rendered page it records a manifest entry with hashes of
+    the page source, of the inputs shared by all pages (code, macros,
+    theme templates, navigation, today's date, tables read when building
+    the context), and of each database table the page read while being
+    rendered. The next build into the same site directory skips pages
+    with matching entries, leaving their previous output in place.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.manifest_path = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.manifest = {}
+        self.entries = {}
+        self.sources = {}
+        self.globals = None
+        self.tables = {}
+        self.decisions = {}
+        self.table_fingerprints = {}
+
+    def load(self) -> None:
+        self.reset()
+        if not self.enabled:
+            return
+        try:
+            data = json.loads(Path(self.manifest_path).read_text())
+        except (FileNotFoundError, ValueError):
+            logger["incremental"].info(
+                "No previous build manifest, rendering all pages"
+            )
+            return
+        if data.get("version") == MANIFEST_VERSION:
+            self.manifest = data["pages"]
+
+    def save(self, site_dir: str | Path) -> None:
+        if not self.enabled:
+            return
+        pages = {}
+        for src_uri in sorted(self.sources):
+            if src_uri in self.entries:
+                pages[src_uri] = self.entries[src_uri]
+            elif self.decisions.get(src_uri) is False:
+                pages[src_uri] = self.manifest[src_uri]
+        for src_uri in self.manifest.keys() - self.sources.keys():
+            dest_path = Path(site_dir) / self.manifest[src_uri]["dest"]
+            logger["incremental"].debug(f"Removing stale {dest_path}")
+            dest_path.unlink(missing_ok=True)
+        path = Path(self.manifest_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(dict(version=MANIFEST_VERSION, pages=pages)))
+        logger["incremental"].info(
+            f"Rendered {len(self.entries)} pages, "
+            f"kept {len(pages) - len(self.entries)} unchanged pages"
+        )
+
+    def start(self, name: str) -> None:
+        if self.enabled:
+            db.start_recording_reads()
+
+    def stop(self, name: str) -> None:
+        if self.enabled:
+            self.tables.setdefault(name, set()).update(db.stop_recording_reads())
+
+    def plan(self, nav: Navigation, config: dict, files: Files) -> None:
+        """Fingerprints inputs of all pages and decides which need to be rendered"""
+        if not self.enabled:
+            return
+        doc_files = files.documentation_pages()
+        for file in doc_files:
+            # Reading sources of all pages up front also makes titles of
+            # pages which won't be rendered available to the navigation
+            file.page.read_source(config)
+            self.sources[file.src_uri] = hash_text(
+                json.dumps(file.page.meta, default=str) + file.page.markdown
+            )
+        self.globals = hash_text(
+            json.dumps(
+                dict(
+                    files=fingerprint(files=GLOBAL_FILES),
+                    today=date.today().isoformat(),
+                    urls=[(file.src_uri, file.url) for file in doc_files],
+                    nav=[serialize_nav_item(item) for item in nav.items],
+                    tables=self.fingerprint_tables(self.tables.get(CONTEXT_KEY, ())),
+                )
+            )
+        )
+
+        # Pages list headings of other pages in the same top-level section
+        # of the navigation, so if any of them changes, all of them need
+        # to be rendered again
+        groups = {}
+        for file in doc_files:
+            groups.setdefault(get_nav_root(file.page), []).append(file)
+        for group_files in groups.values():
+            is_modified = any(self._is_modified(file) for file in group_files)
+            for file in group_files:
+                self.decisions[file.src_uri] = is_modified
+
+    def is_modified(self, file: File) -> bool:
+        return self.decisions.get(file.src_uri, True)
+
+    def _is_modified(self, file: File) -> bool:
+        try:
+            entry = self.manifest[file.src_uri]
+        except KeyError:
+            return True
+        if not Path(file.abs_dest_path).is_file():
+            return True
+        if entry["source"] != self.sources.get(file.src_uri):
+            return True
+        if entry["globals"] != self.globals:
+            return True
+        return entry["tables"] != self.fingerprint_tables(entry["tables"])
+
+    def record(self, file: File) -> None:
+        if not self.enabled:
+            return
+        self.entries[file.src_uri] = dict(
+            dest=file.dest_uri,
+            source=self.sources.get(file.src_uri),
+            globals=self.globals,
+            tables=self.fingerprint_tables(self.tables.get(file.src_uri, ())),
+        )
+
+    def fingerprint_tables(self, table_names) -> dict[str, str]:
+        fingerprints = {}
+        for table_name in sorted(table_names):
+            if table_name not in self.table_fingerprints:
+                self.table_fingerprints[table_name] = fingerprint_table(db, table_name)
+            fingerprints[table_name] = self.table_fingerprints[table_name]
+        return fingerprints
+
+
+incremental = IncrementalBuild()
+
+
+def monkey_patch() -> None:
+    # Monkey patch the File class so that when MkDocs performs a 'dirty'
+    # build, it decides whether pages need to be rendered according to
+    # the manifest, not according to modification times of the files
+    _file_is_modified = File.is_modified
+
+    def is_modified(self: File) -> bool:
+        if incremental.enabled and self.is_documentation_page():
+            return incremental.is_modified(self)
+        return _file_is_modified(self)
+
+    File.is_modified = is_modified
+
+
+def get_nav_root(page) -> int:
+    item = page
+    while item.parent:
+        item = item.parent
+    return id(item)
+
+
+def serialize_nav_item(item) -> list:
+    return [
+        item.title,
+        getattr(item, "url", None),
+        [serialize_nav_item(child) for child in getattr(item, "children", None) or []],
+    ]
@@ -0,0 +1,27 @@
+import httpx
+import pytest
+from diskcache import Cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = Cache(tmp_path / "cache")
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def requests():
+    return []
+
+
+@pytest.fixture
+def mock_client(requests):
+    def mock_client(handle):
+        def handler(request):
+            requests.append(request)
+            return handle(request)
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    return mock_client
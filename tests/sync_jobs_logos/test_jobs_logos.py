@@ -1,10 +1,15 @@
+from datetime import timedelta
+from functools import partial
 from pathlib import Path
 
+import httpx
 import pytest
 from PIL import Image
 
+from juniorguru.sync import jobs_logos
 from juniorguru.sync.jobs_logos import (
     SIZE_PX,
+    Fetcher,
     choose_user_agent,
     convert_image,
     sort_key,
@@ -14,6 +19,34 @@ from juniorguru.sync.jobs_logos import (
 
 FIXTURES_DIR = Path(__file__).parent
 
+IMAGE_URL = "https://example.com/logo.png"
+
+
+@pytest.fixture
+def logos_dir(tmp_path, monkeypatch):
+    logos_dir = tmp_path / "logos"
+    logos_dir.mkdir()
+    monkeypatch.setattr(jobs_logos, "LOGOS_DIR", logos_dir)
+    return logos_dir
+
+
+@pytest.fixture
+def create_fetcher(cache, mock_client):
+    def create_fetcher(handle):
+        fetcher = Fetcher(mock_client(handle), cache=cache)
+        # Bypass the persistent cache of icon URLs, which tests shouldn't touch
+        fetcher.fetch_icon_urls_cached = partial(
+            Fetcher.fetch_icon_urls_cached.__wrapped__, fetcher
+        )
+        return fetcher
+
+    return create_fetcher
+
+
+def respond_with_logo(request):
+    content = (FIXTURES_DIR / "logo.png").read_bytes()
+    return httpx.Response(200, content=content, headers={"ETag": '"abc"'})
+
 
 def _debug(image):
     image.save(FIXTURES_DIR / "logo-converted.png", "PNG")
@@ -192,3 +225,103 @@ def test_unique_skips_none():
 )
 def test_choose_user_agent(url, expected):
     assert choose_user_agent(url) == expected
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image(logos_dir, create_fetcher):
+    fetcher = create_fetcher(respond_with_logo)
+    image_url, image_path, orig_width, orig_height = await fetcher.download_image(
+        IMAGE_URL
+    )
+
+    assert image_url == IMAGE_URL
+    assert image_path.parent == logos_dir
+    assert Image.open(image_path).size == (SIZE_PX, SIZE_PX)
+    assert (orig_width, orig_height) == Image.open(FIXTURES_DIR / "logo.png").size
+    assert fetcher.stats.converted == 1
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image_fresh(logos_dir, create_fetcher, requests):
+    await create_fetcher(respond_with_logo).download_image(IMAGE_URL)
+    fetcher = create_fetcher(respond_with_logo)
+    result = await fetcher.download_image(IMAGE_URL)
+
+    assert result[1] is not None
+    assert len(requests) == 1
+    assert fetcher.stats.fresh == 1
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image_restores_missing_file(logos_dir, create_fetcher):
+    _, image_path, _, _ = await create_fetcher(respond_with_logo).download_image(
+        IMAGE_URL
+    )
+    image_path.unlink()
+    await create_fetcher(respond_with_logo).download_image(IMAGE_URL)
+
+    assert image_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image_not_modified(
+    logos_dir, cache, create_fetcher, requests, monkeypatch
+):
+    await create_fetcher(respond_with_logo).download_image(IMAGE_URL)
+    monkeypatch.setattr(jobs_logos, "REVALIDATE_AFTER", timedelta(0))
+    fetcher = create_fetcher(lambda request: httpx.Response(304))
+    result = await fetcher.download_image(IMAGE_URL)
+
+    assert result[1] is not None
+    assert requests[-1].headers["If-None-Match"] == '"abc"'
+    assert fetcher.stats.not_modified == 1
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image_unchanged(logos_dir, create_fetcher, monkeypatch):
+    await create_fetcher(respond_with_logo).download_image(IMAGE_URL)
+    monkeypatch.setattr(jobs_logos, "REVALIDATE_AFTER", timedelta(0))
+    fetcher = create_fetcher(respond_with_logo)
+    result = await fetcher.download_image(IMAGE_URL)
+
+    assert result[1] is not None
+    assert fetcher.stats.unchanged == 1
+    assert fetcher.stats.converted == 0
+
+
+@pytest.mark.asyncio
+async def test_fetcher_download_image_fails(logos_dir, create_fetcher):
+    fetcher = create_fetcher(lambda request: httpx.Response(404))
+    result = await fetcher.download_image(IMAGE_URL)
+
+    assert result == (IMAGE_URL, None, None, None)
+    assert fetcher.stats.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_fetcher_fetch_icon_urls(create_fetcher):
+    html = (
+        "<html><head>"
+        '<link rel="icon" href="/static/icon.png" sizes="32x32">'
+        '<link rel="apple-touch-icon" href="https://cdn.example.com/touch.png">'
+        "</head><body></body></html>"
+    )
+    fetcher = create_fetcher(
+        lambda request: httpx.Response(
+            200, text=html, headers={"Content-Type": "text/html"}
+        )
+    )
+    urls = await fetcher.fetch_icon_urls("https://example.com/jobs/")
+
+    assert sorted(urls) == [
+        "https://cdn.example.com/touch.png",
+        "https://example.com/favicon.ico",
+        "https://example.com/static/icon.png",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetcher_fetch_icon_urls_fails(create_fetcher):
+    fetcher = create_fetcher(lambda request: httpx.Response(500))
+
+    assert await fetcher.fetch_icon_urls("https://example.com") == []
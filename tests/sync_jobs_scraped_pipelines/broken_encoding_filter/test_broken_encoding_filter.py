@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pytest
 
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 from juniorguru.sync.jobs_scraped.pipelines.broken_encoding_filter import process
 
 
@@ -15,10 +15,9 @@ assert len(fixtures_raising) > 0, "No fixtures found"
 
 
 @pytest.mark.parametrize("description_html", fixtures_raising)
-@pytest.mark.asyncio
-async def test_broken_encoding_filter_raising(description_html: str):
+def test_broken_encoding_filter_raising(description_html: str):
     with pytest.raises(DropItem):
-        await process(dict(description_html=description_html))
+        process(dict(description_html=description_html))
 
 
 fixtures_passing = [
@@ -30,6 +29,5 @@ assert len(fixtures_passing) > 0, "No fixtures found"
 
 
 @pytest.mark.parametrize("description_html", fixtures_passing)
-@pytest.mark.asyncio
-async def test_broken_encoding_filter_passing(description_html: str):
-    await process(dict(description_html=description_html))
+def test_broken_encoding_filter_passing(description_html: str):
+    process(dict(description_html=description_html))
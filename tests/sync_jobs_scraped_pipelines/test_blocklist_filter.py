@@ -1,28 +1,24 @@
 import pytest
 
-from juniorguru.sync.jobs_scraped import DropItem
+from juniorguru.lib.pipeline import DropItem
 from juniorguru.sync.jobs_scraped.pipelines.blocklist_filter import process
 
 
-@pytest.mark.asyncio
-async def test_blocklist_filter_lets_junior_through():
-    await process(dict(title="Junior Python Developer"))
+def test_blocklist_filter_lets_junior_through():
+    process(dict(title="Junior Python Developer"))
 
 
-@pytest.mark.asyncio
-async def test_blocklist_filter_lets_junior_senior_through():
-    await process(dict(title="Python Developer, Junior/Senior"))
+def test_blocklist_filter_lets_junior_senior_through():
+    process(dict(title="Python Developer, Junior/Senior"))
 
 
-@pytest.mark.asyncio
-async def test_blocklist_filter_lets_senior_junior_through():
-    await process(dict(title="Python Developer, Senior/Junior"))
+def test_blocklist_filter_lets_senior_junior_through():
+    process(dict(title="Python Developer, Senior/Junior"))
 
 
-@pytest.mark.asyncio
-async def test_blocklist_filter_blocks_senior():
+def test_blocklist_filter_blocks_senior():
     with pytest.raises(DropItem):
-        await process(dict(title="Senior Python Developer"))
+        process(dict(title="Senior Python Developer"))
 
 
 @pytest.mark.parametrize(
@@ -36,7 +32,6 @@ async def test_blocklist_filter_blocks_senior():
         "Programátor(ka) strojů",
     ],
 )
-@pytest.mark.asyncio
-async def test_blocklist_filter_drops_machine_programmers(title):
+def test_blocklist_filter_drops_machine_programmers(title):
     with pytest.raises(DropItem):
-        await process(dict(title=title))
+        process(dict(title=title))
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from juniorguru.cli.check_links import (
+    HostLimit,
+    LinkChecker,
+    get_external_urls,
+    is_excluded_reason,
+    is_excluded_url,
+)
+
+
+@pytest.fixture
+def create_checker(cache, mock_client):
+    def create_checker(handle, **kwargs):
+        client = mock_client(handle)
+        return LinkChecker(client, cache=cache, retry_delay=0, host_delay=0, **kwargs)
+
+    return create_checker
+
+
+def format_requests(requests: list[httpx.Request]) -> list[str]:
+    return [f"{request.method} {request.url}" for request in requests]
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.jobs.cz/rpd/123456/", True),
+        ("https://www.facebook.com/search/top?q=junior", True),
+        ("https://www.reddit.com/r/learnpython/", True),
+        ("https://www.facebook.com/groups/pyonieri", False),
+        ("https://www.jobs.cz/prace/", False),
+    ],
+)
+def test_is_excluded_url(url: str, expected: bool):
+    assert is_excluded_url(url) is expected
+
+
+@pytest.mark.parametrize(
+    "reason, expected",
+    [
+        ("HTTP_999", True),
+        ("HTTP_503", True),
+        ("TIMEOUT", True),
+        ("ERRNO_ENOTFOUND", True),
+        ("HTTP_404", False),
+        ("HTTP_410", False),
+    ],
+)
+def test_is_excluded_reason(reason: str, expected: bool):
+    assert is_excluded_reason(reason) is expected
+
+
+def test_get_external_urls():
+    entry = dict(
+        links=[
+            "https://example.com/page#section",
+            "https://example.com/page",
+            "../podcast/",
+            "mailto:honza@junior.guru",
+        ],
+        images=["http://example.com/image.png", "/static/image.png", None],
+    )
+
+    assert get_external_urls(entry) == {
+        "https://example.com/page",
+        "http://example.com/image.png",
+    }
+
+
+@pytest.mark.asyncio
+async def test_link_checker_healthy(create_checker, requests):
+    checker = create_checker(lambda request: httpx.Response(200))
+
+    assert await checker.check("https://example.com") is None
+    assert format_requests(requests) == ["HEAD https://example.com"]
+
+
+@pytest.mark.asyncio
+async def test_link_checker_falls_back_to_get(create_checker, requests):
+    def handle(request):
+        return httpx.Response(405 if request.method == "HEAD" else 200)
+
+    checker = create_checker(handle)
+
+    assert await checker.check("https://example.com") is None
+    assert format_requests(requests) == [
+        "HEAD https://example.com",
+        "GET https://example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_link_checker_broken(create_checker, requests):
+    checker = create_checker(lambda request: httpx.Response(404))
+
+    assert await checker.check("https://example.com") == "HTTP_404"
+    assert format_requests(requests) == [
+        "HEAD https://example.com",
+        "GET https://example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_link_checker_timeout(create_checker):
+    def handle(request):
+        raise httpx.ReadTimeout("Timeout", request=request)
+
+    checker = create_checker(handle)
+
+    assert await checker.check("https://example.com") == "TIMEOUT"
+
+
+@pytest.mark.asyncio
+async def test_link_checker_uses_cache(create_checker, requests):
+    checker = create_checker(lambda request: httpx.Response(200))
+    await checker.check("https://example.com")
+    await checker.check("https://example.com")
+
+    assert format_requests(requests) == ["HEAD https://example.com"]
+    assert checker.stats.cached == 1
+
+
+@pytest.mark.asyncio
+async def test_link_checker_ignores_cache(create_checker, requests):
+    checker = create_checker(lambda request: httpx.Response(200), use_cache=False)
+    await checker.check("https://example.com")
+    await checker.check("https://example.com")
+
+    assert format_requests(requests) == [
+        "HEAD https://example.com",
+        "HEAD https://example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_link_checker_rechecks_failures(create_checker, requests):
+    await create_checker(lambda request: httpx.Response(503)).check(
+        "https://example.com"
+    )
+    requests.clear()
+    checker = create_checker(lambda request: httpx.Response(200))
+
+    assert await checker.check("https://example.com") is None
+    assert format_requests(requests) == ["HEAD https://example.com"]
+    assert checker.stats.cached == 0
+
+
+@pytest.mark.asyncio
+async def test_link_checker_rechecks_cached_failures(create_checker, cache, requests):
+    cache.set("https://example.com", dict(reason="HTTP_503", checked_at=0))
+    checker = create_checker(lambda request: httpx.Response(200))
+
+    assert await checker.check("https://example.com") is None
+    assert format_requests(requests) == ["HEAD https://example.com"]
+
+
+@pytest.mark.asyncio
+async def test_link_checker_retries_temporary_failures(create_checker, requests):
+    responses = iter([503, 503, 503, 200])
+
+    checker = create_checker(lambda request: httpx.Response(next(responses)), retries=3)
+
+    assert await checker.check("https://example.com") is None
+    assert checker.stats.retried == 1
+
+
+@pytest.mark.asyncio
+async def test_link_checker_doesnt_retry_permanent_failures(create_checker, requests):
+    checker = create_checker(lambda request: httpx.Response(404), retries=3)
+
+    assert await checker.check("https://example.com") == "HTTP_404"
+    assert len(requests) == 2
+    assert checker.stats.retried == 0
+
+
+@pytest.mark.asyncio
+async def test_host_limit_spaces_out_requests():
+    host_limit = HostLimit(concurrency=2, delay=0.05)
+    started_at = []
+
+    async def request():
+        async with host_limit:
+            started_at.append(time.monotonic())
+
+    await asyncio.gather(request(), request(), request())
+
+    assert started_at[1] - started_at[0] >= 0.04
+    assert started_at[2] - started_at[1] >= 0.04
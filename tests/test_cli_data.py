@@ -1,8 +1,22 @@
+import os
+from operator import itemgetter
+from pathlib import Path
 from textwrap import dedent
 
 import pytest
+from diskcache import Cache
+from sqlite_utils import Database
 
-from juniorguru.cli.data import get_row_updates, make_schema_idempotent
+from juniorguru.cli.data import (
+    backup_database,
+    create_changeset,
+    is_modified,
+    make_schema_idempotent,
+    merge_databases,
+    parse_snapshot_line,
+    take_snapshot,
+)
+from juniorguru.lib.fingerprints import hash_bytes
 
 
 def test_make_schema_idempotent():
@@ -40,39 +54,226 @@ def test_make_schema_idempotent_raises():
         )
 
 
+@pytest.fixture
+def merge(tmp_path):
+    def merge(rows_from, rows_to, pk='"a"'):
+        path_from, path_to = tmp_path / "from.db", tmp_path / "to.db"
+        for path, rows in [(path_from, rows_from), (path_to, rows_to)]:
+            db = Database(path)
+            db.execute(
+                'CREATE TABLE "items" ("a" INTEGER NOT NULL, "b" INTEGER, '
+                f'"c" INTEGER, "d" INTEGER, PRIMARY KEY ({pk}));'
+            )
+            db["items"].insert_all(rows)
+            db.close()
+        merge_databases(path_from, path_to)
+        return list(Database(path_to)["items"].rows)
+
+    return merge
+
+
 @pytest.mark.parametrize(
     "row_from, row_to, expected",
     [
-        (dict(), dict(), dict()),
-        (dict(a=1, b=2, c=3), dict(a=1, b=2, c=3), dict()),
-        (dict(a=None, b=None, c=3), dict(a=None, b=None, c=3), dict()),
-        (dict(a=1, b=2, c=3), dict(a=1, b=None, c=3), dict(b=2)),
-        (dict(a=None, b=None, c=3), dict(a=1, b=2, c=3), dict()),
-        (dict(a=None, b=42, c=3, d=None), dict(a=1, b=None, c=3, d=None), dict(b=42)),
+        (dict(a=1, b=2, c=3), dict(a=1, b=2, c=3), dict(a=1, b=2, c=3)),
+        (dict(a=1, b=None, c=3), dict(a=1, b=None, c=3), dict(a=1, b=None, c=3)),
+        (dict(a=1, b=2, c=3), dict(a=1, b=None, c=3), dict(a=1, b=2, c=3)),
+        (dict(a=1, b=None, c=None), dict(a=1, b=2, c=3), dict(a=1, b=2, c=3)),
+        (
+            dict(a=1, b=42, c=3, d=None),
+            dict(a=1, b=None, c=3, d=None),
+            dict(a=1, b=42, c=3, d=None),
+        ),
     ],
 )
-def test_get_row_updates(row_from, row_to, expected):
-    assert get_row_updates(row_from, row_to) == expected
+def test_merge_databases_fills_nulls(merge, row_from, row_to, expected):
+    row_from.setdefault("d", None)
+    row_to.setdefault("d", None)
+    expected.setdefault("d", None)
 
+    assert merge([row_from], [row_to]) == [expected]
 
-@pytest.mark.parametrize(
-    "row_from, row_to",
-    [
-        (dict(a=1, b=2, c=3), dict(a=1, b=42, c=3)),
-    ],
-)
-def test_get_row_updates_raises_conflict(row_from, row_to):
+
+def test_merge_databases_inserts_new_rows(merge):
+    rows = merge(
+        [dict(a=1, b=2, c=3, d=None), dict(a=2, b=4, c=6, d=8)],
+        [dict(a=1, b=2, c=3, d=None), dict(a=3, b=6, c=9, d=12)],
+    )
+
+    assert sorted(rows, key=itemgetter("a")) == [
+        dict(a=1, b=2, c=3, d=None),
+        dict(a=2, b=4, c=6, d=8),
+        dict(a=3, b=6, c=9, d=12),
+    ]
+
+
+def test_merge_databases_composite_primary_key(merge):
+    rows = merge(
+        [dict(a=1, b=1, c=None, d=4), dict(a=1, b=2, c=5, d=None)],
+        [dict(a=1, b=1, c=3, d=None)],
+        pk='"a", "b"',
+    )
+
+    assert sorted(rows, key=itemgetter("a", "b")) == [
+        dict(a=1, b=1, c=3, d=4),
+        dict(a=1, b=2, c=5, d=None),
+    ]
+
+
+def test_merge_databases_raises_conflict(merge):
     with pytest.raises(RuntimeError):
-        get_row_updates(row_from, row_to)
+        merge([dict(a=1, b=2, c=3, d=None)], [dict(a=1, b=42, c=3, d=None)])
+
+
+def test_merge_databases_conflict_keeps_target_intact(tmp_path, merge):
+    with pytest.raises(RuntimeError):
+        merge(
+            [dict(a=1, b=2, c=3, d=None), dict(a=2, b=None, c=None, d=None)],
+            [dict(a=1, b=42, c=3, d=None)],
+        )
+
+    assert list(Database(tmp_path / "to.db")["items"].rows) == [
+        dict(a=1, b=42, c=3, d=None)
+    ]
+
+
+def test_merge_databases_diskcache(tmp_path):
+    path_from, path_to = tmp_path / "from", tmp_path / "to"
+    with Cache(path_from) as cache_from, Cache(path_to) as cache_to:
+        cache_to.set("a", "old", expire=100)
+        cache_to.set("b", "to")
+        cache_from.set("a", "new")
+        cache_from.set("c", "from")
+        db_from = Database(path_from / "cache.db")
+        db_from["Cache"].update(
+            next(db_from["Cache"].rows_where("key = ?", ["a"]))["rowid"],
+            dict(store_time=10_000_000_000),
+        )
+        db_from.close()
+
+    merge_databases(path_from / "cache.db", path_to / "cache.db")
+
+    with Cache(path_to) as cache:
+        assert {key: cache[key] for key in cache.iterkeys()} == dict(
+            a="new", b="to", c="from"
+        )
+        assert cache.get("a", expire_time=True)[1] is not None
+
+
+def test_take_snapshot(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "c.txt").write_text("Hello")
+    (tmp_path / "d.txt").write_text("World!")
+
+    assert sorted((path, size) for path, _, size in take_snapshot(tmp_path)) == [
+        (Path("a/b/c.txt"), 5),
+        (Path("d.txt"), 6),
+    ]
+
+
+def test_take_snapshot_prunes_excluded_dirs(tmp_path, monkeypatch):
+    (tmp_path / "node_modules" / "x").mkdir(parents=True)
+    (tmp_path / "node_modules" / "x" / "index.js").write_text("")
+    (tmp_path / "src" / "node_modules").mkdir(parents=True)
+    (tmp_path / "src" / "node_modules" / "index.js").write_text("")
+    (tmp_path / "file.txt").write_text("")
+    scanned = []
+    scandir = os.scandir
+
+    def scandir_spy(path):
+        scanned.append(Path(path).relative_to(tmp_path))
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir_spy)
+    paths = [path for path, _, _ in take_snapshot(tmp_path, ["node_modules"])]
+
+    assert sorted(paths) == [Path("file.txt"), Path("src/node_modules/index.js")]
+    assert Path("node_modules") not in scanned
+
+
+def test_parse_snapshot_line():
+    assert parse_snapshot_line("a/b c.txt = 1704067200.5 42 -\n") == (
+        Path("a/b c.txt"),
+        (1704067200.5, 42, None),
+    )
+
+
+def test_parse_snapshot_line_with_hash():
+    assert parse_snapshot_line("a.txt = 1704067200.5 42 abc123\n") == (
+        Path("a.txt"),
+        (1704067200.5, 42, "abc123"),
+    )
 
 
 @pytest.mark.parametrize(
-    "row_from, row_to",
+    "mtime, size, expected",
     [
-        (dict(a=1, b=2, c=3, d=4), dict(a=1, b=2, c=3)),
-        (dict(a=1, b=2, c=3), dict(a=1, b=2, c=3, d=4)),
+        (100, 5, False),
+        (100, 6, True),
+        (200, 5, True),
     ],
 )
-def test_get_row_updates_raises_inconsistence(row_from, row_to):
-    with pytest.raises(ValueError):
-        get_row_updates(row_from, row_to)
+def test_is_modified(tmp_path, mtime, size, expected):
+    path = tmp_path / "file.txt"
+    path.write_text("Hello")
+
+    assert is_modified(path, mtime, size, 100, 5, None) is expected
+
+
+def test_is_modified_compares_hash_if_only_mtime_differs(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("Hello")
+    hash = hash_bytes(b"Hello")
+
+    assert is_modified(path, 200, 5, 100, 5, hash) is False
+    assert is_modified(path, 200, 5, 100, 5, "abc123") is True
+
+
+def test_create_changeset(tmp_path):
+    path = tmp_path / "data.db"
+    db = Database(path)
+    db.execute('CREATE TABLE "a" ("id" INTEGER NOT NULL PRIMARY KEY, "x" TEXT);')
+    db.execute('CREATE TABLE "b" ("id" INTEGER NOT NULL PRIMARY KEY, "x" TEXT);')
+    db.execute('CREATE INDEX "a_x" ON "a" ("x");')
+    db["a"].insert_all([dict(id=1, x="one"), dict(id=2, x=None)])
+    db["b"].insert_all([dict(id=1, x="one")])
+    db.close()
+    backup_database(path, tmp_path / "baseline.db")
+
+    db = Database(path)
+    db["a"].insert(dict(id=3, x="three"))
+    db["a"].update(2, dict(x="two"))
+    db.execute('CREATE TABLE "c" ("id" INTEGER NOT NULL PRIMARY KEY, "x" TEXT);')
+    db.close()
+    rows_count = create_changeset(
+        path, tmp_path / "baseline.db", tmp_path / "changeset.db"
+    )
+    changeset = Database(tmp_path / "changeset.db")
+
+    assert rows_count == 2
+    assert changeset.table_names() == ["a", "c"]
+    assert list(changeset["a"].rows) == [dict(id=2, x="two"), dict(id=3, x="three")]
+    assert changeset["a"].indexes[0].name == "a_x"
+
+
+def test_create_changeset_merges_like_whole_database(tmp_path):
+    path = tmp_path / "data.db"
+    db = Database(path)
+    db.execute('CREATE TABLE "a" ("id" INTEGER NOT NULL PRIMARY KEY, "x" TEXT);')
+    db["a"].insert_all([dict(id=1, x="one"), dict(id=2, x=None)])
+    db.close()
+    backup_database(path, tmp_path / "baseline.db")
+    backup_database(path, tmp_path / "target.db")
+
+    db = Database(path)
+    db["a"].insert(dict(id=3, x="three"))
+    db["a"].update(2, dict(x="two"))
+    db.close()
+    create_changeset(path, tmp_path / "baseline.db", tmp_path / "changeset.db")
+    merge_databases(tmp_path / "changeset.db", tmp_path / "target.db")
+
+    assert list(Database(tmp_path / "target.db")["a"].rows) == [
+        dict(id=1, x="one"),
+        dict(id=2, x="two"),
+        dict(id=3, x="three"),
+    ]
@@ -1,6 +1,14 @@
+import asyncio
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
 import pytest
+from PIL import Image
+from playwright.async_api import Error as PlaywrightError
 
 from juniorguru.cli import screenshots
+from juniorguru.lib.fingerprints import hash_bytes
 
 
 @pytest.mark.parametrize(
@@ -36,3 +44,256 @@ def test_parse_yt_id(url, expected):
 def test_parse_yt_id_raises():
     with pytest.raises(ValueError):
         screenshots.parse_yt_id("https://junior.guru")
+
+
+def test_parse_doc():
+    entry = dict(
+        screenshots=[
+            ("https://example.com", "/static/screenshots/example.webp"),
+            ("../club/", "/static/screenshots/club.webp"),
+        ]
+    )
+
+    assert list(screenshots.parse_doc(Path("public/podcast/index.html"), entry)) == [
+        ("https://example.com", screenshots.SCREENSHOTS_DIR / "example.webp"),
+        (
+            "https://junior.guru/podcast/../club",
+            screenshots.SCREENSHOTS_DIR / "club.webp",
+        ),
+    ]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return screenshots.ScreenshotsIndex(tmp_path / "screenshots.jsonl")
+
+
+@pytest.fixture
+def image_bytes():
+    image = Image.effect_noise((800, 450), 100).convert("RGB")
+    stream = BytesIO()
+    image.save(stream, "PNG")
+    return stream.getvalue()
+
+
+def test_screenshots_index_save_load(index):
+    index.record(
+        "https://example.com", Path("example.webp"), b"...", datetime(2023, 1, 1)
+    )
+    index.save()
+
+    assert screenshots.ScreenshotsIndex(index.path).load().entries == {
+        "https://example.com": dict(
+            url="https://example.com",
+            image="example.webp",
+            captured_at="2023-01-01T00:00:00",
+            hash=hash_bytes(b"..."),
+            size=3,
+        )
+    }
+
+
+def test_screenshots_index_load_missing_file(index):
+    assert len(index.load()) == 0
+
+
+def test_screenshots_index_prune(index):
+    index.record("https://example.com/1", Path("1.webp"), b"...")
+    index.record("https://example.com/2", Path("2.webp"), b"...")
+
+    assert index.prune(["https://example.com/2", "https://example.com/3"]) == 1
+    assert list(index.entries) == ["https://example.com/2"]
+
+
+@pytest.mark.parametrize(
+    "captured_at, expected",
+    [
+        (datetime(2023, 1, 1), True),
+        (datetime(2023, 3, 1), False),
+    ],
+)
+def test_screenshots_index_is_expired(index, captured_at: datetime, expected: bool):
+    screenshot = ("https://example.com", Path("example.webp"))
+    index.record(*screenshot, b"...", captured_at)
+
+    assert index.is_expired(screenshot, datetime(2023, 3, 15)) is expected
+
+
+def test_screenshots_index_is_expired_unknown_url(index):
+    screenshot = ("https://example.com", Path("example.webp"))
+
+    assert index.is_expired(screenshot, datetime(2023, 3, 15)) is False
+
+
+def test_screenshots_index_is_captured(index, tmp_path):
+    screenshot = ("https://example.com", tmp_path / "example.webp")
+    screenshot[1].write_bytes(b"...")
+    index.record(*screenshot, b"...")
+
+    assert index.is_captured(screenshot) is True
+
+
+@pytest.mark.parametrize("image_bytes", [b"!!!", b"...."])
+def test_screenshots_index_is_captured_changed_file(index, tmp_path, image_bytes):
+    screenshot = ("https://example.com", tmp_path / "example.webp")
+    screenshot[1].write_bytes(image_bytes)
+    index.record(*screenshot, b"...")
+
+    assert index.is_captured(screenshot) is False
+
+
+def test_screenshots_index_is_captured_missing_file(index, tmp_path):
+    screenshot = ("https://example.com", tmp_path / "example.webp")
+    index.record(*screenshot, b"...")
+
+    assert index.is_captured(screenshot) is False
+
+
+def test_screenshots_index_is_captured_unknown_url(index, tmp_path):
+    screenshot = ("https://example.com", tmp_path / "example.webp")
+    screenshot[1].write_bytes(b"...")
+
+    assert index.is_captured(screenshot) is False
+
+
+def test_group_by_domain():
+    assert screenshots.group_by_domain(
+        {
+            ("https://www.example.com/2", Path("2.webp")),
+            ("https://pyladies.cz", Path("3.webp")),
+            ("https://example.com/1", Path("1.webp")),
+        }
+    ) == [
+        [
+            ("https://example.com/1", Path("1.webp")),
+            ("https://www.example.com/2", Path("2.webp")),
+        ],
+        [("https://pyladies.cz", Path("3.webp"))],
+    ]
+
+
+def test_capture_stats():
+    stats = screenshots.CaptureStats()
+    stats.record("https://example.com/1", 1)
+    stats.record("https://www.example.com/2", 2)
+    stats.record("https://pyladies.cz", 4)
+
+    assert [
+        (domain, timing.count, timing.time) for domain, timing in stats.slowest()
+    ] == [("pyladies.cz", 1, 4), ("example.com", 2, 3)]
+
+
+class FakePage:
+    def __init__(self, context, image_bytes):
+        self.context = context
+        self.image_bytes = image_bytes
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def goto(self, url, wait_until):
+        if self.context.browser.crashes:
+            self.context.browser.crashes -= 1
+            self.closed = True
+        if self.closed:
+            raise PlaywrightError("Target closed")
+        if url == "https://example.com/broken":
+            raise PlaywrightError("Broken")
+        self.context.urls.append(url)
+
+    async def evaluate(self, script, *args):
+        pass
+
+    async def screenshot(self):
+        return self.image_bytes
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = []
+        self.urls = []
+        self.closed = False
+
+    async def new_page(self):
+        if self.closed:
+            raise PlaywrightError("Target closed")
+        self.pages.append(FakePage(self, self.browser.image_bytes))
+        return self.pages[-1]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, image_bytes, crashes=0):
+        self.image_bytes = image_bytes
+        self.crashes = crashes
+        self.contexts = []
+
+    async def new_context(self):
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+
+@pytest.mark.asyncio
+async def test_shoot_pages_worker(index, image_bytes, tmp_path):
+    queue = asyncio.Queue()
+    for domain_screenshots in screenshots.group_by_domain(
+        {
+            ("https://example.com/1", tmp_path / "1.webp"),
+            ("https://example.com/broken", tmp_path / "broken.webp"),
+            ("https://pyladies.cz", tmp_path / "2.webp"),
+        }
+    ):
+        queue.put_nowait(domain_screenshots)
+    browser = FakeBrowser(image_bytes)
+    stats = screenshots.CaptureStats()
+    await asyncio.gather(
+        screenshots.shoot_pages_worker(browser, queue, index, stats),
+        screenshots.shoot_pages_worker(browser, queue, index, stats),
+    )
+
+    assert [context.urls for context in browser.contexts] == [
+        ["https://example.com/1"],
+        ["https://pyladies.cz"],
+    ]
+    assert all(context.closed for context in browser.contexts)
+    assert sorted(index.entries) == ["https://example.com/1", "https://pyladies.cz"]
+    assert index.is_captured(("https://pyladies.cz", tmp_path / "2.webp"))
+    assert stats.failed == ["https://example.com/broken"]
+
+
+@pytest.mark.asyncio
+async def test_shoot_pages_worker_replaces_closed_page(index, image_bytes, tmp_path):
+    queue = asyncio.Queue()
+    queue.put_nowait([("https://example.com/1", tmp_path / "1.webp")])
+    queue.put_nowait([("https://pyladies.cz", tmp_path / "2.webp")])
+    browser = FakeBrowser(image_bytes, crashes=1)
+    stats = screenshots.CaptureStats()
+    await screenshots.shoot_pages_worker(browser, queue, index, stats)
+
+    context = browser.contexts[0]
+    assert len(context.pages) == 2
+    assert context.pages[0].closed
+    assert context.urls == ["https://example.com/1", "https://pyladies.cz"]
+    assert sorted(index.entries) == ["https://example.com/1", "https://pyladies.cz"]
+    assert stats.failed == []
+
+
+@pytest.mark.asyncio
+async def test_warm_page_replaces_closed_context(image_bytes):
+    browser = FakeBrowser(image_bytes)
+    warm_page = screenshots.WarmPage(browser)
+    page = await warm_page.get()
+    await page.context.close()
+    await warm_page.renew()
+    await warm_page.get()
+
+    assert len(browser.contexts) == 2
+    assert browser.contexts[0].closed
+    assert len(browser.contexts[1].pages) == 1
@@ -1,4 +1,17 @@
-from juniorguru.cli.sync import default_from_env, get_parallel_chains
+import pytest
+
+from juniorguru.cli.sync import (
+    NS_IN_MIN,
+    default_from_env,
+    estimate_durations,
+    get_balanced_chains,
+    get_chain_duration,
+    get_job_chains,
+    get_parallel_chains,
+    get_ready_commands,
+    get_run_args,
+    get_topological_order,
+)
 
 
 def test_get_parallel_chains():
@@ -53,6 +66,144 @@ def test_get_parallel_chains_exclude():
     ]
 
 
+def test_get_job_chains_sync_1():
+    dependencies = {"a": [], "b": ["a"], "c": [], "d": ["c"]}
+
+    assert get_job_chains(dependencies, "sync-1") == [["a"], ["c"]]
+
+
+def test_get_job_chains_sync_2():
+    dependencies = {"a": [], "b": ["a"], "c": [], "d": ["c"]}
+
+    assert get_job_chains(dependencies, "sync-2") == [["b"], ["d"]]
+
+
+def test_get_job_chains_unknown_job():
+    with pytest.raises(ValueError):
+        get_job_chains({"a": []}, "sync-3")
+
+
+def test_get_chain_duration():
+    durations = {"a": 1, "b": 2, "c": 4}
+
+    assert get_chain_duration(["a", "c"], durations) == 5
+
+
+def test_get_balanced_chains():
+    chains = [["a"], ["b", "c"], ["d"], ["e"]]
+    durations = {"a": 10, "b": 3, "c": 4, "d": 2, "e": 1}
+
+    assert get_balanced_chains(chains, durations, 2) == [["a"], ["b", "c", "d", "e"]]
+
+
+def test_get_balanced_chains_minimizes_makespan():
+    chains = [["a"], ["b"], ["c"], ["d"], ["e"]]
+    durations = {"a": 7, "b": 6, "c": 5, "d": 4, "e": 3}
+
+    assert get_balanced_chains(chains, durations, 2) == [
+        ["a", "d", "e"],
+        ["b", "c"],
+    ]
+
+
+def test_get_balanced_chains_more_nodes_than_chains():
+    chains = [["a"], ["b"]]
+    durations = {"a": 1, "b": 1}
+
+    assert get_balanced_chains(chains, durations, 3) == [["a"], ["b"]]
+
+
+def test_estimate_durations():
+    history = {"a": [1, 3, 100], "b": [4]}
+
+    assert estimate_durations(history) == {"a": 3, "b": 4}
+
+
+def test_estimate_durations_unknown_command_gets_median():
+    history = {"a": [2], "b": [4], "c": [10], "d": []}
+
+    assert estimate_durations(history)["d"] == 4
+
+
+def test_estimate_durations_no_history():
+    assert estimate_durations({"a": []}) == {"a": NS_IN_MIN}
+
+
+def test_get_ready_commands():
+    dependencies = {"a": [], "b": ["a"], "c": [], "d": ["a", "c"]}
+
+    assert get_ready_commands(dependencies, {"b", "c", "d"}, {"a"}) == ["c", "b"]
+
+
+def test_get_ready_commands_prioritizes_commands_with_dependants():
+    dependencies = {"a": [], "b": ["c"], "c": [], "d": ["c"]}
+
+    assert get_ready_commands(dependencies, {"a", "c"}, set()) == ["c", "a"]
+
+
+def test_get_ready_commands_waits_for_all_dependencies():
+    dependencies = {"a": [], "b": [], "c": ["a", "b"]}
+
+    assert get_ready_commands(dependencies, {"b", "c"}, {"a"}) == ["b"]
+
+
+def test_get_topological_order():
+    dependencies = {"a": ["b"], "b": [], "c": ["a"], "d": []}
+
+    assert get_topological_order(dependencies) == ["b", "d", "a", "c"]
+
+
+def test_get_topological_order_done():
+    dependencies = {"a": ["b"], "b": [], "c": ["a"], "d": []}
+
+    assert get_topological_order(dependencies, done={"b"}) == ["a", "d", "c"]
+
+
+def test_get_topological_order_unknown_dependency():
+    dependencies = {"a": ["x"], "b": []}
+
+    with pytest.raises(ValueError):
+        get_topological_order(dependencies)
+
+
+def test_get_run_args():
+    params = dict(
+        id=123, allow_mutations=False, mutate=("discord", "google"), incremental=True
+    )
+
+    assert get_run_args(params) == [
+        "--id",
+        "123",
+        "--keep-image-templates-cache",
+        "--mutate",
+        "discord",
+        "--mutate",
+        "google",
+    ]
+
+
+def test_get_run_args_allow_mutations():
+    params = dict(id=123, allow_mutations=True, mutate=(), incremental=True)
+
+    assert get_run_args(params) == [
+        "--id",
+        "123",
+        "--keep-image-templates-cache",
+        "--allow-mutations",
+    ]
+
+
+def test_get_run_args_full():
+    params = dict(id=123, allow_mutations=False, mutate=(), incremental=False)
+
+    assert get_run_args(params) == [
+        "--id",
+        "123",
+        "--keep-image-templates-cache",
+        "--full",
+    ]
+
+
 def test_default_from_env(monkeypatch):
     monkeypatch.setenv("FOO", "something")
     env_reader = default_from_env("FOO")
@@ -1,8 +1,25 @@
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
-from juniorguru.cli.web import resolve_path
+from juniorguru.cli.web import (
+    get_post_process_key,
+    get_post_processed_entry,
+    hash_assets,
+    hash_file,
+    needs_post_processing,
+    post_process_html,
+    resolve_path,
+)
+
+
+@pytest.fixture
+def hyphenator():
+    def hyphenate(documents):
+        return [document.replace("dog", "d&shy;og") for document in documents]
+
+    return SimpleNamespace(hyphenate=hyphenate)
 
 
 @pytest.mark.parametrize(
@@ -31,3 +48,93 @@ def test_resolve_path_raises():
             Path("public/jobs/region/liberec/index.html"),
             "https://example.com",
         )
+
+
+def test_post_process_html(tmp_path, hyphenator):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "index.css").write_text("body { color: red }")
+    html_path = tmp_path / "index.html"
+    html_path.write_text(
+        "<html><head><link rel='stylesheet' href='static/index.css'></head>"
+        "<body><div class='document'>dog</div><p>dog</p>"
+        "<div class='document'>hotdog</div></body></html>"
+    )
+    html_text = post_process_html(tmp_path, html_path, hyphenator)
+
+    assert 'href="static/index.css?hash=' in html_text
+    assert '<div class="document">d\xadog</div><p>dog</p>' in html_text
+    assert '<div class="document">hotd\xadog</div>' in html_text
+
+
+def test_get_post_process_key(tmp_path):
+    html_path = tmp_path / "index.html"
+    html_path.write_text("<p>dog</p>")
+    key1 = get_post_process_key(tmp_path, html_path, "abc")
+    key2 = get_post_process_key(tmp_path, html_path, "abc")
+    key3 = get_post_process_key(tmp_path, html_path, "xyz")
+    html_path.write_text("<p>cat</p>")
+    key4 = get_post_process_key(tmp_path, html_path, "abc")
+
+    assert key1 == key2
+    assert key1 != key3
+    assert key1 != key4
+
+
+@pytest.mark.parametrize(
+    "stylesheets, scripts, documents, expected",
+    [
+        ([], [], 0, False),
+        (["static/index.css"], [], 0, True),
+        ([], ["static/index.js"], 0, True),
+        ([], [], 2, True),
+    ],
+)
+def test_needs_post_processing(
+    stylesheets: list[str], scripts: list[str], documents: int, expected: bool
+):
+    entry = dict(stylesheets=stylesheets, scripts=scripts, documents=documents)
+
+    assert needs_post_processing(entry) is expected
+
+
+def test_get_post_processed_entry():
+    entry = dict(
+        ids=["section"],
+        stylesheets=["static/index.css", "https://example.com/font.css"],
+        scripts=["/static/index.js"],
+        documents=1,
+    )
+
+    assert get_post_processed_entry(entry) == dict(
+        ids=["section"],
+        stylesheets=["https://example.com/font.css"],
+        scripts=[],
+        documents=1,
+    )
+
+
+@pytest.mark.parametrize("filename", ["index.css", "index.js"])
+def test_hash_assets_changes_with_assets(tmp_path, filename):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "index.css").write_text("body { color: red }")
+    (tmp_path / "static" / "index.js").write_text("alert('dog')")
+    hash_file.cache_clear()
+    hash1 = hash_assets(tmp_path)
+    (tmp_path / "static" / filename).write_text("/* changed */")
+    hash_file.cache_clear()
+    hash2 = hash_assets(tmp_path)
+
+    assert hash1 != hash2
+
+
+def test_post_process_key_changes_with_css(tmp_path):
+    (tmp_path / "index.css").write_text("body { color: red }")
+    html_path = tmp_path / "index.html"
+    html_path.write_text("<link rel='stylesheet' href='index.css'>")
+    hash_file.cache_clear()
+    key1 = get_post_process_key(tmp_path, html_path, hash_assets(tmp_path))
+    (tmp_path / "index.css").write_text("body { color: blue }")
+    hash_file.cache_clear()
+    key2 = get_post_process_key(tmp_path, html_path, hash_assets(tmp_path))
+
+    assert key1 != key2
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import pytest
+from diskcache import Cache
+from diskcache.core import ENOVAL
+
+from juniorguru.lib import cache as cache_module
+from juniorguru.lib.cache import CACHE_DIR, KeyLocks, MemoryCache, cache, get_stats
+
+
+@pytest.fixture
+def disk_cache(tmp_path, monkeypatch):
+    disk_cache = Cache(tmp_path, tag_index=True)
+    monkeypatch.setitem(cache_module._cache_instances, CACHE_DIR, disk_cache)
+    monkeypatch.setattr(cache_module, "_memory_cache", MemoryCache())
+    yield disk_cache
+    disk_cache.close()
+
+
+def test_memory_cache_get_set():
+    memory_cache = MemoryCache()
+    memory_cache.set("dog", {"name": "Rex"})
+
+    assert memory_cache.get("dog") == {"name": "Rex"}
+
+
+def test_memory_cache_get_missing():
+    memory_cache = MemoryCache()
+
+    assert memory_cache.get("dog") is ENOVAL
+
+
+def test_memory_cache_returns_copies():
+    memory_cache = MemoryCache()
+    memory_cache.set("dog", {"name": "Rex"})
+    memory_cache.get("dog")["name"] = "Max"
+
+    assert memory_cache.get("dog") == {"name": "Rex"}
+
+
+def test_memory_cache_expire_at():
+    memory_cache = MemoryCache()
+    memory_cache.set("dog", "Rex", expire_at=0)
+
+    assert memory_cache.get("dog") is ENOVAL
+
+
+def test_memory_cache_ttl():
+    memory_cache = MemoryCache(ttl=-1)
+    memory_cache.set("dog", "Rex")
+
+    assert memory_cache.get("dog") is ENOVAL
+
+
+def test_memory_cache_evicts_least_recently_used():
+    memory_cache = MemoryCache(max_bytes=len(cache_module.pickle.dumps("x" * 100)) * 2)
+    memory_cache.set("a", "a" * 100)
+    memory_cache.set("b", "b" * 100)
+    memory_cache.get("a")
+    memory_cache.set("c", "c" * 100)
+
+    assert memory_cache.get("a") == "a" * 100
+    assert memory_cache.get("b") is ENOVAL
+    assert memory_cache.get("c") == "c" * 100
+
+
+def test_memory_cache_skips_too_large_values():
+    memory_cache = MemoryCache(max_bytes=10)
+    memory_cache.set("dog", "Rex" * 100)
+
+    assert len(memory_cache) == 0
+
+
+def test_key_locks_removes_released_locks():
+    locks = KeyLocks()
+    with locks.hold("a"):
+        with locks.hold("b"):
+            assert len(locks) == 2
+
+    assert len(locks) == 0
+
+
+def test_key_locks_excludes_holders_of_same_key():
+    locks = KeyLocks()
+    events = []
+
+    def hold():
+        with locks.hold("a"):
+            events.append("second")
+
+    with locks.hold("a"):
+        thread = threading.Thread(target=hold)
+        thread.start()
+        thread.join(0.1)
+        events.append("first")
+    thread.join()
+
+    assert events == ["first", "second"]
+    assert len(locks) == 0
+
+
+def test_cache_sync(disk_cache):
+    calls = []
+
+    @cache(tag="test-sync")
+    def fn(name):
+        calls.append(name)
+        return name.upper()
+
+    assert [fn("rex"), fn("rex"), fn("max")] == ["REX", "REX", "MAX"]
+    assert calls == ["rex", "max"]
+    assert get_stats()["test-sync"].memory_hits == 1
+
+
+def test_cache_sync_disk_hit(disk_cache):
+    @cache(tag="test-sync-disk")
+    def fn(name):
+        return name.upper()
+
+    fn("rex")
+    cache_module._memory_cache.clear()
+    fn("rex")
+
+    assert get_stats()["test-sync-disk"].disk_hits == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_async(disk_cache):
+    calls = []
+
+    @cache(tag="test-async")
+    async def fn(name):
+        calls.append(name)
+        return name.upper()
+
+    assert [await fn("rex"), await fn("rex"), await fn("max")] == ["REX", "REX", "MAX"]
+    assert calls == ["rex", "max"]
+
+
+@pytest.mark.asyncio
+async def test_cache_async_shares_in_flight_computation(disk_cache):
+    calls = []
+
+    @cache(tag="test-async-shared")
+    async def fn(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return name.upper()
+
+    results = await asyncio.gather(fn("rex"), fn("rex"), fn("rex"))
+
+    assert results == ["REX", "REX", "REX"]
+    assert calls == ["rex"]
+    assert get_stats()["test-async-shared"].shared == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_async_shares_exceptions(disk_cache):
+    calls = []
+
+    @cache(tag="test-async-exception")
+    async def fn(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        raise ValueError(name)
+
+    results = await asyncio.gather(fn("rex"), fn("rex"), return_exceptions=True)
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert calls == ["rex"]
+
+
+@pytest.mark.asyncio
+async def test_cache_async_no_store_when_expire_is_zero(disk_cache):
+    calls = []
+
+    @cache(expire=0, tag="test-async-expire")
+    async def fn(name):
+        calls.append(name)
+        return name.upper()
+
+    await fn("rex")
+    await fn("rex")
+
+    assert calls == ["rex", "rex"]
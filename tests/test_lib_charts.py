@@ -149,3 +149,80 @@ def test_milestones_label_respects_nbsp():
     annotation = result["annotations"]["velikonocni-pondeli-label"]
 
     assert annotation["content"] == ["Velikonoční pondělí"]
+
+
+def test_daily_series_sum():
+    series = charts.DailySeries(
+        [
+            (date(2020, 3, 1), 100),
+            (date(2020, 1, 15), 10),
+            (date(2020, 1, 31), 1),
+            (date(2020, 2, 1), 1000),
+        ]
+    )
+
+    assert series.sum(date(2020, 1, 1), date(2020, 1, 31)) == 11
+    assert series.sum(date(2020, 1, 31), date(2020, 3, 1)) == 1101
+
+
+def test_daily_series_count():
+    series = charts.DailySeries(
+        [
+            (date(2020, 1, 15), 10),
+            (date(2020, 1, 15), 20),
+            (date(2020, 2, 1), 30),
+        ]
+    )
+
+    assert series.count(date(2020, 1, 1), date(2020, 1, 31)) == 2
+
+
+def test_daily_series_out_of_range():
+    series = charts.DailySeries([(date(2020, 1, 15), 10)])
+
+    assert series.sum(date(2021, 1, 1), date(2021, 12, 31)) == 0
+    assert series.count(date(2021, 1, 1), date(2021, 12, 31)) == 0
+
+
+def test_daily_series_empty():
+    series = charts.DailySeries()
+
+    assert series.sum(date(2020, 1, 1), date(2020, 1, 31)) == 0
+    assert series.count(date(2020, 1, 1), date(2020, 1, 31)) == 0
+
+
+def test_daily_breakdown_sum():
+    breakdown = charts.DailyBreakdown(
+        [
+            (date(2020, 1, 15), "dogs", 10),
+            (date(2020, 1, 20), "cats", 0),
+            (date(2020, 1, 25), "dogs", 5),
+            (date(2020, 2, 1), "birds", 1),
+        ]
+    )
+
+    assert breakdown.sum(date(2020, 1, 1), date(2020, 1, 31)) == {
+        "dogs": 15,
+        "cats": 0,
+    }
+    assert breakdown.total.sum(date(2020, 1, 1), date(2020, 2, 29)) == 16
+
+
+def test_ttm_count_avg():
+    series = charts.DailySeries([(date(2020, 1, 15), 1)] * 13)
+
+    assert charts.ttm_count_avg(series)(date(2020, 12, 31)) == 2
+
+
+def test_ttm_count_ptc():
+    total = charts.DailySeries([(date(2020, 1, 15), 1)] * 3)
+    part = charts.DailySeries([(date(2020, 1, 15), 1)])
+
+    assert charts.ttm_count_ptc(part, total)(date(2020, 12, 31)) == 34
+
+
+def test_ttm_count_ptc_zero():
+    total = charts.DailySeries()
+    part = charts.DailySeries()
+
+    assert charts.ttm_count_ptc(part, total)(date(2020, 12, 31)) == 0
@@ -0,0 +1,113 @@
+import pytest
+from diskcache import Cache
+from peewee import CharField, IntegerField
+
+from juniorguru.lib.fingerprints import (
+    dump_tables,
+    expand_paths,
+    fingerprint,
+    fingerprint_table,
+    hash_bytes,
+    hash_file,
+    hash_text,
+    restore_tables,
+)
+from juniorguru.models.base import BaseModel
+
+from testing_utils import prepare_test_db
+
+
+class Dog(BaseModel):
+    name = CharField()
+    age = IntegerField(null=True)
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([Dog])
+
+
+def test_fingerprint_files(tmp_path):
+    path = tmp_path / "dogs.yml"
+    path.write_text("- name: Rex\n")
+    fingerprint1 = fingerprint(files=[path])
+    fingerprint2 = fingerprint(files=[path])
+    path.write_text("- name: Max\n")
+    fingerprint3 = fingerprint(files=[path])
+
+    assert fingerprint1 == fingerprint2
+    assert fingerprint1 != fingerprint3
+
+
+def test_fingerprint_tables(test_db):
+    Dog.create(name="Rex")
+    fingerprint1 = fingerprint(tables=[Dog])
+    fingerprint2 = fingerprint(tables=[Dog])
+    Dog.create(name="Max")
+    fingerprint3 = fingerprint(tables=[Dog])
+
+    assert fingerprint1 == fingerprint2
+    assert fingerprint1 != fingerprint3
+
+
+def test_fingerprint_missing_table(test_db):
+    test_db.drop_tables([Dog])
+
+    assert fingerprint(tables=[Dog])
+
+
+def test_fingerprint_table(test_db):
+    Dog.create(name="Rex")
+    fingerprint1 = fingerprint_table(test_db, "dog")
+    Dog.create(name="Max")
+    fingerprint2 = fingerprint_table(test_db, "dog")
+
+    assert fingerprint1 != fingerprint2
+    assert fingerprint_table(test_db, "cat")
+
+
+def test_fingerprint_cache_tags(tmp_path):
+    cache = Cache(tmp_path, tag_index=True)
+    cache.set("dog", "Rex", tag="dogs")
+    fingerprint1 = fingerprint(cache_tags=["dogs"], cache_dir=tmp_path)
+    cache.set("cat", "Tom", tag="cats")
+    fingerprint2 = fingerprint(cache_tags=["dogs"], cache_dir=tmp_path)
+    cache.set("dog", "Max", tag="dogs")
+    fingerprint3 = fingerprint(cache_tags=["dogs"], cache_dir=tmp_path)
+    cache.close()
+
+    assert fingerprint1 == fingerprint2
+    assert fingerprint1 != fingerprint3
+
+
+def test_expand_paths(tmp_path):
+    (tmp_path / "b.yml").write_text("")
+    (tmp_path / "a.yml").write_text("")
+    (tmp_path / "c.txt").write_text("")
+
+    assert expand_paths([f"{tmp_path}/*.yml"]) == [
+        tmp_path / "a.yml",
+        tmp_path / "b.yml",
+    ]
+
+
+def test_dump_and_restore_tables(test_db):
+    Dog.create(name="Rex", age=3)
+    Dog.create(name="Max")
+    data = dump_tables([Dog])
+    Dog.delete().execute()
+    Dog.create(name="Garfield")
+    restore_tables([Dog], data)
+
+    assert [(dog.id, dog.name, dog.age) for dog in Dog.select()] == [
+        (1, "Rex", 3),
+        (2, "Max", None),
+    ]
+
+
+def test_hash_helpers_agree(tmp_path):
+    path = tmp_path / "dogs.yml"
+    path.write_text("- name: Rex\n")
+
+    assert hash_file(path) == hash_text("- name: Rex\n")
+    assert hash_text("- name: Rex\n") == hash_bytes(b"- name: Rex\n")
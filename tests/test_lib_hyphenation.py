@@ -0,0 +1,43 @@
+import sys
+
+import pytest
+
+from juniorguru.lib.hyphenation import Hyphenator
+
+
+FAKE_WORKER = """
+import json, sys
+for line in sys.stdin:
+    documents = json.loads(line)
+    print(json.dumps([document.replace("dog", "d-og") for document in documents]))
+    sys.stdout.flush()
+"""
+
+
+@pytest.fixture
+def hyphenator():
+    with Hyphenator([sys.executable, "-c", FAKE_WORKER]) as hyphenator:
+        yield hyphenator
+
+
+def test_hyphenator(hyphenator):
+    assert hyphenator.hyphenate(["<p>dog</p>", "<p>\ncat\n</p>"]) == [
+        "<p>d-og</p>",
+        "<p>\ncat\n</p>",
+    ]
+
+
+def test_hyphenator_keeps_running(hyphenator):
+    hyphenator.hyphenate(["<p>dog</p>"])
+
+    assert hyphenator.hyphenate(["<p>žluťoučký dog</p>"]) == ["<p>žluťoučký d-og</p>"]
+
+
+def test_hyphenator_empty(hyphenator):
+    assert hyphenator.hyphenate([]) == []
+
+
+def test_hyphenator_worker_exits():
+    with Hyphenator([sys.executable, "-c", "pass"]) as hyphenator:
+        with pytest.raises(RuntimeError):
+            hyphenator.hyphenate(["<p>dog</p>"])
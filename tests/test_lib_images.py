@@ -1,4 +1,11 @@
+import os
+import threading
+from io import BytesIO
+from pathlib import Path
+
 import pytest
+from PIL import Image
+from playwright.sync_api import Error as PlaywrightError
 
 from juniorguru.lib import images
 
@@ -13,3 +20,219 @@ from juniorguru.lib import images
 )
 def test_is_image_mimetype(mimetype, expected):
     assert images.is_image_mimetype(mimetype) == expected
+
+
+@pytest.fixture
+def renderer(tmp_path, monkeypatch):
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "index.css").write_text("")
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "dog.jinja").write_text("<p>{{ name|upper }}</p>")
+    monkeypatch.setattr(images, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(images, "TEMPLATES_DIR", tmp_path / "templates")
+    renderer = images.Renderer()
+    monkeypatch.setattr(renderer, "screenshot", fake_screenshot)
+    return renderer
+
+
+def fake_screenshot(width, height, html_path):
+    stream = BytesIO()
+    Image.new("RGB", (width * 2, height * 3)).save(stream, "PNG")
+    return stream.getvalue()
+
+
+def test_renderer_render(renderer):
+    image_bytes = renderer.render(100, 50, "dog.jinja", dict(name="Rex"))
+
+    with Image.open(BytesIO(image_bytes)) as image:
+        assert image.size == (100, 50)
+    assert "<p>REX</p>" in [
+        path.read_text() for path in images.CACHE_DIR.glob("*-dog.jinja")
+    ]
+
+
+def test_renderer_metrics(renderer):
+    renderer.render(100, 50, "dog.jinja", dict(name="Rex"))
+    renderer.render(100, 50, "dog.jinja", dict(name="Max"))
+
+    assert renderer.images_count == 2
+    assert renderer.images_per_sec > 0
+    assert renderer.avg_latency > 0
+
+
+def test_renderer_restarts_browser_after_error(renderer, monkeypatch):
+    calls = []
+
+    def screenshot(width, height, html_path):
+        calls.append(html_path)
+        if len(calls) == 1:
+            raise PlaywrightError("Browser has been closed")
+        return fake_screenshot(width, height, html_path)
+
+    monkeypatch.setattr(renderer, "screenshot", screenshot)
+    renderer.render(100, 50, "dog.jinja", dict(name="Rex"))
+
+    assert len(calls) == 2
+
+
+def test_renderer_missing_cache(renderer, tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "CACHE_DIR", tmp_path / "missing")
+
+    with pytest.raises(FileNotFoundError):
+        renderer.render(100, 50, "dog.jinja", dict(name="Rex"))
+
+
+def test_get_renderer_reuses_renderer_in_thread():
+    assert images.get_renderer() is images.get_renderer()
+
+
+def test_get_renderer_creates_renderer_per_thread():
+    renderers = []
+    thread = threading.Thread(target=lambda: renderers.append(images.get_renderer()))
+    thread.start()
+    thread.join()
+
+    assert renderers[0] is not images.get_renderer()
+
+
+@pytest.fixture
+def render_cache(tmp_path, monkeypatch, renderer):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "dog.svg").write_text("<svg></svg>")
+    (tmp_path / "templates" / "avatar.jinja").write_text(
+        "<img src='{{ images_dir }}/{{ path }}'>"
+    )
+    monkeypatch.setattr(images, "IMAGES_DIR", tmp_path / "images")
+    monkeypatch.setattr(images, "get_renderer", lambda: renderer)
+    render_cache = images.RenderCache(tmp_path / "renders")
+    monkeypatch.setattr(images, "render_cache", render_cache)
+    return render_cache
+
+
+def test_render_image_file(render_cache, renderer, tmp_path):
+    image_path = images.render_image_file(
+        100, 50, "dog.jinja", dict(name="Rex"), tmp_path / "output", prefix="rex"
+    )
+
+    assert image_path.parent == tmp_path / "output"
+    assert image_path.name.startswith("rex-")
+    assert render_cache.get(image_path.stem.removeprefix("rex-")) == (
+        image_path.read_bytes()
+    )
+    assert renderer.images_count == 1
+
+
+def test_render_image_file_reuses_render_cache(render_cache, renderer, tmp_path):
+    images.render_image_file(100, 50, "dog.jinja", dict(name="Rex"), tmp_path / "a")
+    image_path = images.render_image_file(
+        100, 50, "dog.jinja", dict(name="Rex"), tmp_path / "b"
+    )
+
+    assert image_path.exists()
+    assert renderer.images_count == 1
+
+
+def test_render_image_file_context_changes(render_cache, tmp_path):
+    image_path1 = images.render_image_file(
+        100, 50, "dog.jinja", dict(name="Rex"), tmp_path
+    )
+    image_path2 = images.render_image_file(
+        100, 50, "dog.jinja", dict(name="Max"), tmp_path
+    )
+
+    assert image_path1 != image_path2
+
+
+def test_get_render_key_template_changes(render_cache):
+    key1 = images.get_render_key(100, 50, "<p>Rex</p>")
+    key2 = images.get_render_key(100, 50, "<p>REX</p>")
+    key3 = images.get_render_key(200, 50, "<p>Rex</p>")
+
+    assert len({key1, key2, key3}) == 3
+
+
+def test_get_render_key_css_changes(render_cache, tmp_path):
+    key1 = images.get_render_key(100, 50, "<p>Rex</p>")
+    (tmp_path / "cache" / "index.css").write_text("p { color: red }")
+    images.get_css_hash.cache_clear()
+    key2 = images.get_render_key(100, 50, "<p>Rex</p>")
+
+    assert key1 != key2
+
+
+def test_get_render_key_referenced_image_changes(render_cache, tmp_path):
+    html = f"<img src='{images.IMAGES_DIR.absolute()}/dog.svg'>"
+    key1 = images.get_render_key(100, 50, html)
+    (tmp_path / "images" / "dog.svg").write_text("<svg><circle/></svg>")
+    key2 = images.get_render_key(100, 50, html)
+
+    assert key1 != key2
+
+
+def test_get_render_key_ignores_images_dir_location(
+    render_cache, tmp_path, monkeypatch
+):
+    key1 = images.get_render_key(
+        100, 50, f"<img src='{images.IMAGES_DIR.absolute()}/dog.svg'>"
+    )
+    (tmp_path / "elsewhere").mkdir()
+    (tmp_path / "elsewhere" / "dog.svg").write_text("<svg></svg>")
+    monkeypatch.setattr(images, "IMAGES_DIR", tmp_path / "elsewhere")
+    key2 = images.get_render_key(
+        100, 50, f"<img src='{images.IMAGES_DIR.absolute()}/dog.svg'>"
+    )
+
+    assert key1 == key2
+
+
+def test_render_cache_collect_garbage(render_cache):
+    render_cache.set("old", b"old")
+    render_cache.set("new", b"new")
+    os.utime(render_cache.cache_dir / "old.png", (0, 0))
+    render_cache.collect_garbage()
+
+    assert render_cache.get("old") is None
+    assert render_cache.get("new") == b"new"
+
+
+def test_render_cache_collect_garbage_tolerates_concurrent_removal(
+    render_cache, monkeypatch
+):
+    render_cache.set("old", b"old")
+    os.utime(render_cache.cache_dir / "old.png", (0, 0))
+    path_glob, path_unlink = Path.glob, Path.unlink
+
+    def glob(self, pattern):
+        # Another process removed this image after it got listed
+        return [*path_glob(self, pattern), self / "gone.png"]
+
+    def unlink(self, missing_ok=False):
+        # Another process removed this image before this one got to it
+        path_unlink(self, missing_ok=True)
+        path_unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, "glob", glob)
+    monkeypatch.setattr(Path, "unlink", unlink)
+    render_cache.collect_garbage()
+
+    assert render_cache.get("old") is None
+
+
+def test_posters_cache_cleanup(tmp_path):
+    (tmp_path / "old.png").write_bytes(b"")
+    (tmp_path / "new.png").write_bytes(b"")
+    posters = images.PostersCache(tmp_path)
+    posters.init()
+    posters.record(tmp_path / "new.png")
+    posters.cleanup()
+
+    assert sorted(path.name for path in tmp_path.glob("*.png")) == ["new.png"]
+
+
+def test_posters_cache_clear(tmp_path):
+    (tmp_path / "old.png").write_bytes(b"")
+    posters = images.PostersCache(tmp_path)
+    posters.init(clear=True)
+    posters.cleanup()
+
+    assert list(tmp_path.glob("*.png")) == []
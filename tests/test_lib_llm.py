@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from juniorguru.lib import llm
+
+
+@pytest.fixture
+def classifier(monkeypatch):
+    classifier = llm.BatchClassifier("Classify!", batch_size=2, batch_delay=0.01)
+    cache = {}
+    monkeypatch.setattr(classifier, "get_cached", cache.get)
+    monkeypatch.setattr(classifier, "set_cached", cache.__setitem__)
+    monkeypatch.setattr(classifier, "get_cached_single", lambda text: None)
+    return classifier
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    batches = []
+
+    async def ask_for_json_batch(system_prompt, user_prompts):
+        batches.append(user_prompts)
+        return [dict(text=prompt) for prompt in user_prompts]
+
+    monkeypatch.setattr(llm, "ask_for_json_batch", ask_for_json_batch)
+    return batches
+
+
+@pytest.mark.parametrize(
+    "text1, text2",
+    [
+        ("Junior Python Developer", "junior python developer"),
+        ("Junior Python Developer", "Junior  Python\nDeveloper "),
+        ("Junior Python Developer!", "Junior Python Developer"),
+        (
+            "Apply at https://example.com/jobs/1",
+            "Apply at https://example.com/jobs/2",
+        ),
+    ],
+)
+def test_get_fingerprint_same(text1, text2):
+    assert llm.get_fingerprint(text1) == llm.get_fingerprint(text2)
+
+
+def test_get_fingerprint_different():
+    assert llm.get_fingerprint("Junior Python Developer") != llm.get_fingerprint(
+        "Senior Python Developer"
+    )
+
+
+@pytest.mark.asyncio
+async def test_token_limit_waits_for_tokens():
+    limit = llm.TokenLimit(max_tokens=100)
+    events = []
+
+    async def reserve(name, tokens, delay):
+        async with limit.reserve(tokens):
+            events.append(f"{name} start")
+            await asyncio.sleep(delay)
+            events.append(f"{name} end")
+
+    await asyncio.gather(reserve("a", 60, 0.02), reserve("b", 60, 0))
+
+    assert events == ["a start", "a end", "b start", "b end"]
+
+
+@pytest.mark.asyncio
+async def test_token_limit_lets_small_requests_run_concurrently():
+    limit = llm.TokenLimit(max_tokens=100)
+    events = []
+
+    async def reserve(name, tokens, delay):
+        async with limit.reserve(tokens):
+            events.append(f"{name} start")
+            await asyncio.sleep(delay)
+            events.append(f"{name} end")
+
+    await asyncio.gather(reserve("a", 40, 0.02), reserve("b", 40, 0))
+
+    assert events == ["a start", "b start", "b end", "a end"]
+
+
+@pytest.mark.asyncio
+async def test_token_limit_caps_large_requests():
+    limit = llm.TokenLimit(max_tokens=100)
+
+    async with limit.reserve(1000):
+        assert limit.tokens == 100
+    assert limit.tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_packs_texts_to_batches(classifier, batches):
+    results = await asyncio.gather(
+        *[classifier.classify(text) for text in ["a", "b", "c"]]
+    )
+
+    assert results == [dict(text="a"), dict(text="b"), dict(text="c")]
+    assert batches == [["a", "b"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_flushes_batch_exceeding_tokens(classifier, batches):
+    classifier.batch_tokens = 10
+    await asyncio.gather(*[classifier.classify(text) for text in ["a" * 40, "b"]])
+
+    assert batches == [["a" * 40], ["b"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_coalesces_duplicates(classifier, batches):
+    results = await asyncio.gather(
+        *[classifier.classify(text) for text in ["Python Job", "python  job!"]]
+    )
+
+    assert results == [dict(text="Python Job"), dict(text="Python Job")]
+    assert batches == [["Python Job"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_uses_cache(classifier, batches):
+    await classifier.classify("Python Job")
+    result = await classifier.classify("python job")
+
+    assert result == dict(text="Python Job")
+    assert batches == [["Python Job"]]
+    assert classifier.cached_count == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_uses_cache_of_single_requests(
+    cache, batches, monkeypatch
+):
+    monkeypatch.setattr(llm, "get_cache", lambda: cache)
+    cache.set(llm.ask_for_json.__cache_key__("Classify!", "Python Job"), dict(a=1))
+    classifier = llm.BatchClassifier("Classify!", batch_delay=0.01)
+    result1 = await classifier.classify("Python Job")
+    result2 = await classifier.classify("JavaScript Job")
+
+    assert result1 == dict(a=1)
+    assert result2 == dict(text="JavaScript Job")
+    assert batches == [["JavaScript Job"]]
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_asks_again_for_missing_reply(classifier, monkeypatch):
+    async def ask_for_json_batch(system_prompt, user_prompts):
+        return [dict(text=user_prompts[0]), None]
+
+    async def ask_for_json(system_prompt, user_prompt):
+        return dict(text=user_prompt, again=True)
+
+    monkeypatch.setattr(llm, "ask_for_json_batch", ask_for_json_batch)
+    monkeypatch.setattr(llm, "ask_for_json", ask_for_json)
+    results = await asyncio.gather(*[classifier.classify(text) for text in ["a", "b"]])
+
+    assert results == [dict(text="a"), dict(text="b", again=True)]
+
+
+@pytest.mark.asyncio
+async def test_batch_classifier_raises(classifier, monkeypatch):
+    async def ask_for_json_batch(system_prompt, user_prompts):
+        raise ValueError("Failed")
+
+    monkeypatch.setattr(llm, "ask_for_json_batch", ask_for_json_batch)
+    results = await asyncio.gather(
+        *[classifier.classify(text) for text in ["a", "b"]], return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert len(classifier.in_flight) == 0
@@ -1,8 +1,27 @@
 from operator import itemgetter
 
 import pytest
+from diskcache import Cache
+
+from juniorguru.lib import locations
+from juniorguru.lib.locations import (
+    RateLimit,
+    cache_geocoding,
+    fetch_locations,
+    fetch_locations_bulk,
+    get_region,
+    normalize_location,
+    optimize_geocoding,
+    to_locations,
+)
+
 
-from juniorguru.lib.locations import fetch_locations, get_region, optimize_geocoding
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = Cache(tmp_path)
+    monkeypatch.setattr(locations, "get_cache", lambda: cache)
+    yield cache
+    cache.close()
 
 
 def test_locations():
@@ -111,3 +130,93 @@ def test_optimize_geocoding(location_raw, expected):
         return GEOCODED_ADDRESS
 
     assert optimize_geocoding(geocode)(location_raw) == expected
+
+
+def test_fetch_locations_bulk():
+    calls = []
+
+    def geocode(location_raw):
+        calls.append(location_raw)
+        if location_raw == "???":
+            return None
+        return {"place": location_raw, "region": "Kraj Vysočina", "country": "Česko"}
+
+    results = fetch_locations_bulk(["Jihlava", "???", "Třebíč", "Jihlava"], geocode)
+
+    assert sorted(calls) == ["???", "Jihlava", "Třebíč"]
+    assert results == {
+        "???": None,
+        "Jihlava": ("Jihlava", "Jihlava"),
+        "Třebíč": ("Třebíč", "Jihlava"),
+    }
+
+
+def test_to_locations():
+    results = to_locations([("Brno", "Brno"), None, ("Brno", "Brno")])
+
+    assert results == [{"name": "Brno", "region": "Brno"}]
+
+
+@pytest.mark.parametrize(
+    "location_raw, expected",
+    [
+        ("Brno", "brno"),
+        ("  Ústí nad   Labem ", "ústí nad labem"),
+        ("Ústí nad\nLabem", "ústí nad labem"),
+    ],
+)
+def test_normalize_location(location_raw, expected):
+    assert normalize_location(location_raw) == expected
+
+
+def test_cache_geocoding(cache):
+    calls = []
+
+    @cache_geocoding
+    def geocode(location_raw):
+        calls.append(location_raw)
+        return GEOCODED_ADDRESS
+
+    assert geocode("Řevnice") == GEOCODED_ADDRESS
+    assert geocode(" řevnice") == GEOCODED_ADDRESS
+    assert calls == ["Řevnice"]
+
+
+def test_cache_geocoding_caches_empty_results(cache):
+    calls = []
+
+    @cache_geocoding
+    def geocode(location_raw):
+        calls.append(location_raw)
+        return None
+
+    assert geocode("???") is None
+    assert geocode("???") is None
+    assert calls == ["???"]
+
+
+def test_cache_geocoding_does_not_cache_errors(cache):
+    calls = []
+
+    @cache_geocoding
+    def geocode(location_raw):
+        calls.append(location_raw)
+        raise locations.GeocodeError()
+
+    with pytest.raises(locations.GeocodeError):
+        geocode("Řevnice")
+    with pytest.raises(locations.GeocodeError):
+        geocode("Řevnice")
+    assert calls == ["Řevnice", "Řevnice"]
+
+
+def test_rate_limit(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(locations.time, "monotonic", lambda: 100)
+    monkeypatch.setattr(locations.time, "sleep", sleeps.append)
+    rate_limit = RateLimit(4)
+
+    for _ in range(3):
+        rate_limit.wait()
+
+    assert sleeps == [0.25, 0.5]
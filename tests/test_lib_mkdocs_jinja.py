@@ -0,0 +1,106 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from diskcache import Cache
+from jinja2 import Environment, nodes
+
+from juniorguru.lib.cache import BytecodeCache
+from juniorguru.lib.mkdocs_jinja import DocsEnvironment, PagesLoader
+
+
+@pytest.fixture
+def config(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "macros").mkdir()
+    (tmp_path / "macros" / "macros.html").write_text(
+        "{% macro title() %}{{ page.title }}{% endmacro %}"
+    )
+    return {"docs_dir": str(tmp_path / "docs")}
+
+
+@pytest.fixture
+def bytecode_cache(tmp_path):
+    cache = Cache(tmp_path / "cache")
+    yield BytecodeCache(cache)
+    cache.close()
+
+
+def create_page(src_uri, title="Page"):
+    return SimpleNamespace(file=SimpleNamespace(src_uri=src_uri), title=title)
+
+
+def test_pages_loader_names_sources_by_hash():
+    loader = PagesLoader()
+
+    assert loader.add("Hello", "a.md") == loader.add("Hello", "b.md")
+    assert loader.add("Hello", "a.md") != loader.add("Hello!", "a.md")
+
+
+def test_docs_environment_passes_page_through_context(config, bytecode_cache):
+    env = DocsEnvironment(config, bytecode_cache=bytecode_cache)
+    markdown = "{% from 'macros.html' import title with context %}# {{ title() }}"
+
+    assert (
+        env.from_page(create_page("a.md"), markdown).render(
+            page=create_page("a.md", title="Dogs")
+        )
+        == "# Dogs"
+    )
+    assert (
+        env.from_page(create_page("b.md"), markdown).render(
+            page=create_page("b.md", title="Cats")
+        )
+        == "# Cats"
+    )
+
+
+def test_docs_environment_reuses_compiled_pages(config, bytecode_cache):
+    env = DocsEnvironment(config, bytecode_cache=bytecode_cache)
+    page = create_page("a.md")
+
+    assert env.from_page(page, "Hello") is env.from_page(page, "Hello")
+
+
+def test_docs_environment_caches_bytecode_of_pages(config, bytecode_cache):
+    DocsEnvironment(config, bytecode_cache=bytecode_cache).from_page(
+        create_page("a.md"), "Hello {{ name }}"
+    )
+    keys_count = len(list(bytecode_cache.cache.iterkeys()))
+    template = DocsEnvironment(config, bytecode_cache=bytecode_cache).from_page(
+        create_page("a.md"), "Hello {{ name }}"
+    )
+
+    assert keys_count == 1
+    assert len(list(bytecode_cache.cache.iterkeys())) == 1
+    assert template.render(name="Rex") == "Hello Rex"
+
+
+WEB_DIR = Path(__file__).parent.parent / "juniorguru" / "web"
+
+
+def uses_md_filter(template: nodes.Template) -> bool:
+    return any(node.name == "md" for node in template.find_all(nodes.Filter))
+
+
+def test_pages_import_macros_using_md_with_context():
+    # The 'md' filter needs the page from the context, so macros using it
+    # fail to render if they're imported without the context
+    env = Environment()
+    macros_dir = WEB_DIR / "macros"
+    md_macros = {
+        str(path.relative_to(macros_dir))
+        for path in macros_dir.glob("**/*.html")
+        if uses_md_filter(env.parse(path.read_text()))
+    }
+    imports_without_context = []
+    for path in sorted((WEB_DIR / "docs").glob("**/*.md")):
+        template = env.parse(path.read_text())
+        for node in template.find_all((nodes.FromImport, nodes.Import)):
+            if node.template.value in md_macros and not node.with_context:
+                imports_without_context.append(
+                    f"{path.relative_to(WEB_DIR)}: {node.template.value}"
+                )
+
+    assert md_macros
+    assert imports_without_context == []
@@ -0,0 +1,108 @@
+import pytest
+
+from juniorguru.lib.pipeline import DropItem, Pipeline
+
+
+def double(item: dict) -> dict:
+    item["number"] *= 2
+    return item
+
+
+def drop_odd(item: dict) -> dict:
+    if item["number"] % 2:
+        raise DropItem("Odd number")
+    return item
+
+
+def fail(item: dict) -> dict:
+    raise ValueError("Failed")
+
+
+async def increment(item: dict) -> dict:
+    item["number"] += 1
+    return item
+
+
+async def drop_big(item: dict) -> dict:
+    if item["number"] > 10:
+        raise DropItem("Big number")
+    return item
+
+
+def test_pipeline_groups_consecutive_cpu_bound_steps():
+    pipeline = Pipeline(
+        [
+            ("double", double),
+            ("drop_odd", drop_odd),
+            ("increment", increment),
+            ("drop_big", drop_big),
+            ("double_again", double),
+        ]
+    )
+
+    assert [[name for name, _ in stage.steps] for stage in pipeline.stages] == [
+        ["double", "drop_odd"],
+        ["increment"],
+        ["drop_big"],
+        ["double_again"],
+    ]
+    assert [stage.is_cpu_bound for stage in pipeline.stages] == [
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run():
+    items = []
+    pipeline = Pipeline(
+        [
+            ("increment", increment),
+            ("drop_odd", drop_odd),
+            ("double", double),
+            ("drop_big", drop_big),
+        ],
+        in_flight=3,
+        workers=2,
+    )
+    await pipeline.run((dict(number=i) for i in range(10)), items.append)
+
+    assert sorted(item["number"] for item in items) == [4, 8]
+    assert pipeline.count == 10
+    assert pipeline.drops == 8
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_stats():
+    pipeline = Pipeline(
+        [
+            ("increment", increment),
+            ("drop_odd", drop_odd),
+            ("double", double),
+            ("drop_big", drop_big),
+        ],
+        in_flight=3,
+        workers=2,
+    )
+    await pipeline.run((dict(number=i) for i in range(10)), lambda item: None)
+
+    assert {
+        name: (stats.count, stats.drops) for name, stats in pipeline.stats.items()
+    } == {
+        "increment": (10, 0),
+        "drop_odd": (10, 5),
+        "double": (5, 0),
+        "drop_big": (5, 3),
+    }
+
+
+@pytest.mark.asyncio
+async def test_pipeline_run_raises():
+    items = []
+    pipeline = Pipeline([("fail", fail)], in_flight=3, workers=2)
+
+    with pytest.raises(ValueError):
+        await pipeline.run((dict(number=i) for i in range(10)), items.append)
+    assert items == []
@@ -0,0 +1,82 @@
+from pathlib import Path
+
+import pytest
+from diskcache import Cache
+
+from juniorguru.lib.fingerprints import hash_text
+from juniorguru.lib.site_index import SiteIndex, parse_html
+
+
+HTML = """
+<html>
+    <head>
+        <link rel="stylesheet" href="../static/index.css">
+        <link rel="stylesheet" href="https://example.com/font.css">
+        <script src="/static/index.js"></script>
+    </head>
+    <body>
+        <a name="top"></a>
+        <h2 id="section">Section</h2>
+        <a href="../podcast/">Podcast</a>
+        <a href="#section">Section</a>
+        <img src="../static/placeholder.png" data-src="../static/logo.png">
+        <img src="/static/photo.jpg">
+        <div data-screenshot-source-url="https://example.com"
+             data-screenshot-image-url="static/screenshots/example.webp"></div>
+        <div class="document">Text</div>
+    </body>
+</html>
+"""
+
+
+@pytest.fixture
+def output_path(tmp_path):
+    output_path = tmp_path / "public"
+    (output_path / "about").mkdir(parents=True)
+    (output_path / "index.html").write_text(HTML)
+    (output_path / "about" / "index.html").write_text("<p>About</p>")
+    return output_path
+
+
+def test_parse_html():
+    assert parse_html(HTML.encode()) == dict(
+        names=["top"],
+        ids=["section"],
+        links=["../podcast/", "#section"],
+        images=["../static/logo.png", "/static/photo.jpg"],
+        screenshots=[("https://example.com", "static/screenshots/example.webp")],
+        stylesheets=["../static/index.css", "https://example.com/font.css"],
+        scripts=["/static/index.js"],
+        documents=1,
+    )
+
+
+def test_site_index_build(output_path: Path, cache: Cache):
+    site_index = SiteIndex(output_path, cache=cache).build(workers=2)
+
+    assert [path for path, entry in site_index] == [
+        output_path / "about" / "index.html",
+        output_path / "index.html",
+    ]
+    assert site_index.parsed_count == 2
+    assert cache[hash_text(HTML)] == parse_html(HTML.encode())
+
+
+def test_site_index_build_parses_only_changed_files(output_path: Path, cache: Cache):
+    SiteIndex(output_path, cache=cache).build(workers=2)
+    (output_path / "about" / "index.html").write_text("<p id='about'>About</p>")
+    site_index = SiteIndex(output_path, cache=cache).build(workers=2)
+
+    assert site_index.parsed_count == 1
+    assert dict(site_index)[output_path / "about" / "index.html"]["ids"] == ["about"]
+
+
+def test_site_index_record(output_path: Path, cache: Cache):
+    site_index = SiteIndex(output_path, cache=cache).build(workers=2)
+    html_path = output_path / "about" / "index.html"
+    html_path.write_text("<p>About!</p>")
+    site_index.record(html_path, "<p>About!</p>", dict(ids=["recorded"]))
+    site_index = SiteIndex(output_path, cache=cache).build(workers=2)
+
+    assert site_index.parsed_count == 0
+    assert dict(site_index)[html_path] == dict(ids=["recorded"])
@@ -1,8 +1,10 @@
+import subprocess
+import sys
 from datetime import date, datetime, time
 
 import pytest
 
-from juniorguru.models.base import json_dumps
+from juniorguru.models.base import SqliteDatabase, json_dumps
 
 
 @pytest.mark.parametrize(
@@ -39,3 +41,88 @@ def test_json_dumps_item():
         '"employment_types": ["full-time"]'
         "}"
     )
+
+
+@pytest.fixture
+def recording_db(tmp_path):
+    recording_db = SqliteDatabase(tmp_path / "test.db")
+    recording_db.execute_sql("CREATE TABLE dog (name TEXT)")
+    recording_db.execute_sql("CREATE TABLE cat (name TEXT)")
+    yield recording_db
+    recording_db.close()
+
+
+def test_recording_reads(recording_db):
+    recording_db.start_recording_reads()
+    recording_db.execute_sql("SELECT * FROM dog")
+
+    assert recording_db.stop_recording_reads() == {"dog"}
+
+
+def test_recording_reads_of_repeated_query(recording_db):
+    recording_db.execute_sql("SELECT * FROM dog JOIN cat")
+    recording_db.start_recording_reads()
+    recording_db.execute_sql("SELECT * FROM dog JOIN cat")
+
+    assert recording_db.stop_recording_reads() == {"dog", "cat"}
+
+
+def test_recording_reads_stops(recording_db):
+    recording_db.start_recording_reads()
+    recording_db.stop_recording_reads()
+    recording_db.execute_sql("SELECT * FROM dog")
+    recording_db.start_recording_reads()
+
+    assert recording_db.stop_recording_reads() == set()
+
+
+def test_recording_reads_new_connection(recording_db):
+    recording_db.close()
+    recording_db.start_recording_reads()
+    with recording_db.connection_context():
+        recording_db.execute_sql("SELECT * FROM cat")
+
+    assert recording_db.stop_recording_reads() == {"cat"}
+
+
+WRITER_SCRIPT = """
+import sys
+import time
+
+from juniorguru.models.base import db
+
+db.database = sys.argv[3]
+with db.connection_context():
+    with db.atomic("IMMEDIATE"):
+        db.execute_sql("INSERT INTO dog VALUES (?)", (sys.argv[1],))
+        print("locked", flush=True)
+        time.sleep(float(sys.argv[2]))
+"""
+
+
+def test_db_concurrent_writers(tmp_path):
+    db_path = tmp_path / "test.db"
+    test_db = SqliteDatabase(db_path, pragmas={"journal_mode": "wal"})
+    test_db.execute_sql("CREATE TABLE dog (name TEXT)")
+    test_db.close()
+
+    # The first writer holds the lock longer than SQLite's usual timeout
+    writer1 = subprocess.Popen(
+        [sys.executable, "-c", WRITER_SCRIPT, "Rex", "6", str(db_path)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert writer1.stdout.readline().strip() == "locked"
+    writer2 = subprocess.run(
+        [sys.executable, "-c", WRITER_SCRIPT, "Max", "0", str(db_path)],
+        capture_output=True,
+        text=True,
+    )
+    writer1.communicate()
+
+    assert writer1.returncode == 0
+    assert writer2.returncode == 0, writer2.stderr
+    assert test_db.execute_sql("SELECT name FROM dog").fetchall() == [
+        ("Rex",),
+        ("Max",),
+    ]
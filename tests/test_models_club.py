@@ -750,3 +750,56 @@ def test_last_bot_message_filters_by_emoji_and_text(test_db, juniorguru_bot):
     create_message(3, juniorguru_bot, content="🔥 ghi", channel_id=123)
 
     assert ClubMessage.last_bot_message(123, "🔥", "ab") == message1
+
+
+def test_message_content_size_by_months_matches_content_size_by_month(
+    test_db, juniorguru_bot
+):
+    user = create_user(1)
+    create_message(
+        1,
+        user,
+        content="hello",
+        created_at=datetime(2023, 1, 5),
+        created_month="2023-01",
+    )
+    create_message(
+        2,
+        user,
+        content="hello!",
+        created_at=datetime(2023, 1, 31),
+        created_month="2023-01",
+    )
+    create_message(
+        3, user, content="hi", created_at=datetime(2023, 2, 1), created_month="2023-02"
+    )
+    create_message(
+        4,
+        user,
+        content="private",
+        created_at=datetime(2023, 2, 2),
+        created_month="2023-02",
+        is_private=True,
+    )
+    create_message(
+        5,
+        juniorguru_bot,
+        content="beep",
+        created_at=datetime(2023, 2, 3),
+        created_month="2023-02",
+    )
+    create_message(
+        6,
+        user,
+        content="fun",
+        created_at=datetime(2023, 3, 4),
+        created_month="2023-03",
+        channel_id=ClubChannelID.FUN,
+    )
+    months = [date(2022, 12, 1), date(2023, 1, 1), date(2023, 2, 1), date(2023, 3, 1)]
+    content_sizes = ClubMessage.content_size_by_months()
+
+    assert [content_sizes.get(f"{month:%Y-%m}", 0) for month in months] == [
+        ClubMessage.content_size_by_month(month) for month in months
+    ]
+    assert content_sizes == {"2023-01": 11, "2023-02": 2}
@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 
 import pytest
 
+from juniorguru.lib import charts
 from juniorguru.models.club import ClubUser
 from juniorguru.models.event import Event, EventSpeaking
 
@@ -136,3 +137,32 @@ def test_url(test_db):
     event = create_event(1)
 
     assert event.url == "https://junior.guru/events/1/"
+
+
+def test_series_match_per_month_queries(test_db):
+    members = [create_member(i) for i in range(4)]
+    members[0].has_feminine_name = True
+    members[0].save()
+    members[1].has_feminine_name = True
+    members[1].save()
+    starts = [
+        datetime(2021, 1, 31, 23, 30),
+        datetime(2021, 2, 1, 0, 30),
+        datetime(2021, 2, 15, 18),
+        datetime(2022, 2, 1, 18),
+    ]
+    for i, start_at in enumerate(starts):
+        event = create_event(i, start_at=start_at)
+        EventSpeaking.create(event=event, speaker=members[i])
+    months = charts.months(date(2021, 1, 1), date(2022, 3, 31))
+
+    assert charts.per_month(charts.monthly_count(Event.start_series()), months) == (
+        charts.per_month(Event.count_by_month, months)
+    )
+    assert charts.per_month(charts.ttm_count_avg(Event.start_series()), months) == (
+        charts.per_month(Event.count_by_month_ttm, months)
+    )
+    assert charts.per_month(
+        charts.ttm_count_ptc(EventSpeaking.women_series(), EventSpeaking.series()),
+        months,
+    ) == charts.per_month(EventSpeaking.women_ptc_ttm, months)
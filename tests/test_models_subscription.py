@@ -1,8 +1,8 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 import pytest
 
-from juniorguru.models.subscription import SubscriptionActivity
+from juniorguru.models.subscription import SubscriptionActivity, SubscriptionState
 
 from testing_utils import prepare_test_db
 
@@ -21,7 +21,7 @@ def create_activity(
 
 @pytest.fixture
 def test_db():
-    yield from prepare_test_db([SubscriptionActivity])
+    yield from prepare_test_db([SubscriptionActivity, SubscriptionState])
 
 
 def test_account_subscribed_at(test_db):
@@ -68,3 +68,58 @@ def test_account_subscribed_days_duplicate_deactivation(test_db):
     assert SubscriptionActivity.account_subscribed_days(1, today=today) == (
         (date(2023, 1, 31) - date(2021, 3, 4)).days
     )
+
+
+def test_state_build(test_db):
+    create_activity(1, "trial_start", datetime(2023, 2, 22, 10))
+    create_activity(1, "order", datetime(2023, 2, 22, 10))
+    create_activity(1, "trial_end", datetime(2023, 3, 8, 10))
+    create_activity(1, "order", datetime(2023, 3, 8, 11))
+    create_activity(1, "deactivation", datetime(2023, 4, 10))
+    SubscriptionState.build()
+
+    assert [
+        (state.type, state.valid_from, state.valid_to)
+        for state in SubscriptionState.select().order_by(SubscriptionState.id)
+    ] == [
+        ("trial_start", date(2023, 2, 22), date(2023, 3, 8)),
+        ("order", date(2023, 2, 22), date(2023, 3, 8)),
+        ("order", date(2023, 3, 8), date(2023, 4, 10)),
+        ("deactivation", date(2023, 4, 10), None),
+    ]
+    assert {state.subscribed_on for state in SubscriptionState.select()} == {
+        date(2023, 2, 22)
+    }
+
+
+def test_state_listing_matches_latest_listing(test_db):
+    create_activity(1, "trial_start", datetime(2023, 2, 22, 10))
+    create_activity(1, "order", datetime(2023, 2, 22, 10))
+    create_activity(1, "trial_end", datetime(2023, 3, 8, 10))
+    create_activity(1, "order", datetime(2023, 3, 8, 11))
+    create_activity(1, "deactivation", datetime(2023, 4, 10))
+    create_activity(1, "order", datetime(2023, 5, 17))
+    create_activity(2, "order", datetime(2023, 3, 31, 23, 59))
+    create_activity(2, "deactivation", datetime(2023, 4, 1))
+    create_activity(2, "deactivation", datetime(2023, 4, 30))
+    create_activity(3, "order", datetime(2023, 4, 15))
+    SubscriptionState.build()
+
+    for day in range(0, 120, 3):
+        on = date(2023, 2, 20) + timedelta(days=day)
+        assert sorted(a.id for a in SubscriptionActivity.listing(on)) == sorted(
+            a.id for a in SubscriptionActivity.latest_listing(on)
+        ), on
+
+
+def test_active_duration_avg(test_db):
+    create_activity(1, "order", datetime(2023, 3, 1))
+    create_activity(1, "deactivation", datetime(2023, 4, 1))
+    create_activity(2, "order", datetime(2023, 3, 1))
+    create_activity(2, "order", datetime(2023, 4, 1))
+    create_activity(3, "order", datetime(2023, 4, 1))
+    SubscriptionState.build()
+
+    assert SubscriptionActivity.active_duration_avg(date(2023, 4, 16)) == (
+        ((46 / 30) + (15 / 30)) / 2
+    )
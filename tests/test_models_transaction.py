@@ -2,14 +2,15 @@ from datetime import date, timedelta
 
 import pytest
 
-from juniorguru.models.transaction import Transaction
+from juniorguru.lib import charts
+from juniorguru.models.transaction import Transaction, TransactionMonth
 
 from testing_utils import prepare_test_db
 
 
 @pytest.fixture
 def test_db():
-    yield from prepare_test_db([Transaction])
+    yield from prepare_test_db([Transaction, TransactionMonth])
 
 
 def create_transaction(id, **kwargs):
@@ -21,6 +22,15 @@ def create_transaction(id, **kwargs):
     )
 
 
+def add_transaction(id, **kwargs):
+    Transaction.add(
+        id=id,
+        happened_on=kwargs.get("happened_on", date.today() - timedelta(days=3)),
+        category=kwargs.get("category", "memberships"),
+        amount=kwargs.get("amount", 1038),
+    )
+
+
 def test_listing_sorts_from_newest_to_oldest(test_db):
     t1 = create_transaction("1", happened_on=date(2021, 8, 31))
     t2 = create_transaction("2", happened_on=date(2021, 8, 1))
@@ -33,6 +43,50 @@ def test_listing_sorts_from_newest_to_oldest(test_db):
     ]
 
 
+@pytest.fixture
+def transactions(test_db):
+    add_transaction("1", happened_on=date(2020, 1, 15), amount=1000)
+    add_transaction("2", happened_on=date(2020, 1, 31), amount=-333)
+    add_transaction("3", happened_on=date(2020, 2, 1), amount=50, category="tax")
+    add_transaction("4", happened_on=date(2020, 2, 29), amount=-99, category="tax")
+    add_transaction(
+        "5", happened_on=date(2020, 4, 3), amount=2000, category="partnerships"
+    )
+    add_transaction("6", happened_on=date(2021, 2, 28), amount=-7, category="marketing")
+    add_transaction("7", happened_on=date(2021, 3, 1), amount=0)
+
+
+MONTHS = charts.months(date(2019, 12, 1), date(2021, 4, 15))
+
+
+def test_incomes_breakdown_series_matches_revenue(transactions):
+    incomes = Transaction.incomes_breakdown_series()
+
+    assert charts.per_month(charts.monthly_sum(incomes.total), MONTHS) == (
+        charts.per_month(Transaction.revenue, MONTHS)
+    )
+    assert charts.per_month(charts.ttm_sum_avg(incomes.total), MONTHS) == (
+        charts.per_month(Transaction.revenue_ttm, MONTHS)
+    )
+    assert charts.per_month_breakdown(charts.monthly_sum(incomes), MONTHS) == (
+        charts.per_month_breakdown(Transaction.revenue_breakdown, MONTHS)
+    )
+
+
+def test_costs_breakdown_series_matches_cost(transactions):
+    costs = Transaction.costs_breakdown_series()
+
+    assert charts.per_month(charts.monthly_sum(costs.total), MONTHS) == (
+        charts.per_month(Transaction.cost, MONTHS)
+    )
+    assert charts.per_month(charts.ttm_sum_avg(costs.total), MONTHS) == (
+        charts.per_month(Transaction.cost_ttm, MONTHS)
+    )
+    assert charts.per_month_breakdown(charts.monthly_sum(costs), MONTHS) == (
+        charts.per_month_breakdown(Transaction.cost_breakdown, MONTHS)
+    )
+
+
 # def test_ttm_listing_uses_today_implicitly(test_db):
 #     t1 = create_transaction(happened_on=date.today())
 #     create_transaction(happened_on=date.today() + timedelta(days=1))
@@ -163,3 +217,36 @@ def test_listing_sorts_from_newest_to_oldest(test_db):
 #     create_transaction(amount=-300, category='d', happened_on=date(2020, 11, 9))
 
 #     assert Transaction.profit_monthly(date(2020, 12, 12)) == 30
+
+
+def test_ttm_at_any_day_matches_transactions(transactions):
+    incomes = Transaction.incomes_breakdown_series()
+    costs = Transaction.costs_breakdown_series()
+
+    for day in range(0, 550, 4):
+        on = date(2020, 1, 1) + timedelta(days=day)
+
+        assert Transaction.revenue_ttm(on) == charts.ttm_sum_avg(incomes.total)(on)
+        assert Transaction.cost_ttm(on) == charts.ttm_sum_avg(costs.total)(on)
+        assert Transaction.revenue_ttm_breakdown(on) == {
+            category: -(-value // 12)
+            for category, value in incomes.sum(*charts.ttm_range(on)).items()
+        }
+
+
+def test_add_replaces_transaction_in_rollup(test_db):
+    add_transaction("1", happened_on=date(2020, 1, 15), amount=1000)
+    add_transaction("2", happened_on=date(2020, 1, 20), amount=500)
+    add_transaction("1", happened_on=date(2020, 2, 15), amount=-300)
+
+    assert Transaction.revenue(date(2020, 1, 1)) == 500
+    assert Transaction.revenue_breakdown(date(2020, 2, 1)) == {}
+    assert Transaction.cost_breakdown(date(2020, 2, 1)) == {"memberships": 300}
+
+
+def test_deserialize_records_rollup(test_db):
+    Transaction.deserialize(
+        '{"_id": "1", "amount": 1000, "category": "jobs", "happened_on": "2020-01-15"}'
+    )
+
+    assert Transaction.revenue_breakdown(date(2020, 1, 1)) == {"jobs": 1000}
@@ -1,10 +1,30 @@
+import asyncio
 import logging
 from collections import namedtuple
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 
 import pytest
+from discord.utils import time_snowflake
 
-from juniorguru.sync.club_content.crawler import get_channel_logger, get_history_after
+from juniorguru.sync.club_content.crawler import (
+    AdaptiveLimiter,
+    RateLimitHandler,
+    chunk_payloads,
+    get_channel_logger,
+    get_chunk_id,
+    get_expected_work,
+    get_fetch_boundary,
+    get_history_after,
+    load_cached_payloads,
+    measure_requests,
+    merge_payloads,
+    store_cached_payloads,
+)
+
+
+def create_payload(dt: datetime, content: str = "") -> dict:
+    return dict(id=str(time_snowflake(dt)), content=content)
 
 
 def test_get_history_after_given_naive_datetime():
@@ -37,3 +57,200 @@ def test_get_channel_logger_thread():
     channel_logger = get_channel_logger(logger, thread)
 
     assert channel_logger.name == "test_get_channel_logger.1.2"
+
+
+def test_get_fetch_boundary_no_index():
+    assert get_fetch_boundary(None, datetime(2023, 8, 1, tzinfo=timezone.utc)) is None
+
+
+def test_get_fetch_boundary_high_water_mark_before_edits_window():
+    high_water_mark = time_snowflake(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    index = dict(high_water_mark=high_water_mark)
+
+    assert (
+        get_fetch_boundary(index, datetime(2023, 8, 1, tzinfo=timezone.utc))
+        == high_water_mark
+    )
+
+
+def test_get_fetch_boundary_high_water_mark_within_edits_window():
+    high_water_mark = time_snowflake(datetime(2023, 8, 15, tzinfo=timezone.utc))
+    index = dict(high_water_mark=high_water_mark)
+    edits_window_at = datetime(2023, 8, 1, tzinfo=timezone.utc)
+
+    assert (
+        get_fetch_boundary(index, edits_window_at)
+        == time_snowflake(edits_window_at) - 1
+    )
+
+
+def test_get_chunk_id():
+    message_id = time_snowflake(datetime(2023, 8, 15, tzinfo=timezone.utc))
+
+    assert get_chunk_id(message_id) == "2023-08"
+
+
+def test_chunk_payloads():
+    payload1 = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    payload2 = create_payload(datetime(2023, 8, 1, tzinfo=timezone.utc))
+    payload3 = create_payload(datetime(2023, 8, 2, tzinfo=timezone.utc))
+
+    assert chunk_payloads([payload1, payload2, payload3]) == {
+        "2023-07": [payload1],
+        "2023-08": [payload2, payload3],
+    }
+
+
+def test_merge_payloads_fetched_overwrite_cached():
+    payload1 = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc), "old")
+    payload2 = create_payload(datetime(2023, 8, 1, tzinfo=timezone.utc), "cached")
+    payload2_edited = dict(payload2, content="edited")
+
+    assert merge_payloads([payload1, payload2], [payload2_edited], None) == [
+        payload2_edited,
+        payload1,
+    ]
+
+
+def test_merge_payloads_prunes_payloads_before_after():
+    payload1 = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    payload2 = create_payload(datetime(2023, 8, 1, tzinfo=timezone.utc))
+
+    assert merge_payloads(
+        [payload1], [payload2], datetime(2023, 7, 15, tzinfo=timezone.utc)
+    ) == [payload2]
+
+
+def test_store_and_load_cached_payloads(cache):
+    payload1 = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    payload2 = create_payload(datetime(2023, 8, 1, tzinfo=timezone.utc))
+    store_cached_payloads(cache, 123, None, [payload2, payload1], 1)
+    index = cache.get("message-payloads:123")
+
+    assert index["high_water_mark"] == int(payload2["id"])
+    assert index["chunks"] == ["2023-07", "2023-08"]
+    assert load_cached_payloads(cache, 123, index["chunks"]) == [payload1, payload2]
+
+
+def test_store_cached_payloads_deletes_empty_chunks(cache):
+    payload1 = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    payload2 = create_payload(datetime(2023, 8, 1, tzinfo=timezone.utc))
+    store_cached_payloads(cache, 123, None, [payload2, payload1], 1)
+    index = cache.get("message-payloads:123")
+    store_cached_payloads(cache, 123, index, [payload2], 1)
+
+    assert cache.get("message-payloads:123")["chunks"] == ["2023-08"]
+    assert cache.get("message-payloads:123:2023-07") is None
+
+
+def test_load_cached_payloads_missing_chunk(cache):
+    payload = create_payload(datetime(2023, 7, 1, tzinfo=timezone.utc))
+    store_cached_payloads(cache, 123, None, [payload], 1)
+    cache.delete("message-payloads:123:2023-07")
+
+    assert load_cached_payloads(cache, 123, ["2023-07"]) is None
+
+
+@pytest.mark.parametrize(
+    "last_message_id, high_water_mark, expected",
+    [
+        (None, None, 0),
+        (None, 100, 0),
+        (150, None, 150),
+        (150, 100, 50),
+        (100, 150, 0),
+    ],
+)
+def test_get_expected_work(last_message_id, high_water_mark, expected):
+    assert get_expected_work(last_message_id, high_water_mark) == expected
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_increases():
+    limiter = AdaptiveLimiter(2, 4)
+    for _ in range(5):
+        async with limiter:
+            pass
+
+    assert limiter.limit == 4
+    assert limiter.max_reached == 4
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_decreases_on_rate_limit():
+    limiter = AdaptiveLimiter(1, 16)
+    for _ in range(7):
+        async with limiter:
+            pass
+    async with limiter:
+        limiter.record_rate_limit()
+
+    assert limiter.limit == 4
+    assert limiter.max_reached == 8
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_stays_on_high_latency():
+    limiter = AdaptiveLimiter(2, 4, latency_threshold=1)
+    limiter.record_latency(5)
+    async with limiter:
+        pass
+
+    assert limiter.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_limits_concurrency():
+    limiter = AdaptiveLimiter(2, 2)
+    active = []
+
+    async def task():
+        async with limiter:
+            active.append(limiter.active)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[task() for _ in range(5)])
+
+    assert max(active) == 2
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limiter_measure():
+    limiter = AdaptiveLimiter(1, 1)
+
+    async def request():
+        return 42
+
+    assert await limiter.measure(request)() == 42
+    assert limiter.requests_count == 1
+
+
+def test_rate_limit_handler():
+    limiter = AdaptiveLimiter(1, 1)
+    handler = RateLimitHandler(limiter)
+    logger = logging.getLogger("test_rate_limit_handler")
+    logger.addHandler(handler)
+    logger.warning("We are being rate limited. Retrying in 1.00 seconds.")
+    logger.warning("Something else")
+    logger.removeHandler(handler)
+
+    assert limiter.rate_limits_count == 1
+
+
+def test_measure_requests_restores_client_after_error():
+    async def request():
+        return 42
+
+    limiter = AdaptiveLimiter(1, 1)
+    client = SimpleNamespace(http=SimpleNamespace(request=request))
+    http_logger = logging.getLogger("discord.http")
+    handlers = list(http_logger.handlers)
+
+    with pytest.raises(RuntimeError):
+        with measure_requests(client, limiter):
+            assert client.http.request is not request
+            assert len(http_logger.handlers) == len(handlers) + 1
+            raise RuntimeError()
+
+    assert client.http.request is request
+    assert http_logger.handlers == handlers
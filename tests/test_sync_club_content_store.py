@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from juniorguru.sync.club_content.store import Batch, Store
+
+
+def test_batch():
+    batch = Batch(
+        [
+            ("users", {"id": 1}),
+            ("messages", {"id": 2}),
+            ("users", {"id": 3}),
+            ("dm_channels", (4, 1)),
+        ]
+    )
+
+    assert batch.users == [{"id": 1}, {"id": 3}]
+    assert batch.messages == [{"id": 2}]
+    assert batch.pins == []
+    assert batch.dm_channels == [(4, 1)]
+    assert len(batch) == 4
+
+
+@pytest.mark.asyncio
+async def test_store_coalesces_rows_into_batches(monkeypatch):
+    batches = []
+    store = Store(batch_size=2)
+    monkeypatch.setattr(store, "write", batches.append)
+
+    for i in range(5):
+        await store.queue.put(("users", {"id": i}))
+    await store.close()
+    await asyncio.wait_for(store.run(), timeout=1)
+
+    assert [[row["id"] for row in batch.users] for batch in batches] == [
+        [0, 1],
+        [2, 3],
+        [4],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_store_finishes_on_close(monkeypatch):
+    batches = []
+    store = Store()
+    monkeypatch.setattr(store, "write", batches.append)
+    store_task = asyncio.create_task(store.run())
+
+    await store.queue.put(("users", {"id": 1}))
+    await store.close()
+    await asyncio.wait_for(store_task, timeout=1)
+
+    assert len(batches) == 1
+    assert store.queue.empty()
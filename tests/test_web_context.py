@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+from peewee import CharField
+
+from juniorguru.models.base import BaseModel
+from juniorguru.web import context as context_module
+from juniorguru.web.context import ContextProfile, snapshot
+
+from testing_utils import prepare_test_db
+
+
+class Dog(BaseModel):
+    name = CharField()
+
+
+@pytest.fixture
+def test_db():
+    yield from prepare_test_db([Dog])
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake_db = SimpleNamespace(queries_count=0)
+    monkeypatch.setattr(context_module, "db", fake_db)
+    return fake_db
+
+
+def test_snapshot_evaluates_queries(test_db):
+    Dog.create(name="Rex")
+    context = dict(dogs=Dog.select(), count=1, names=["Rex"])
+    snapshot(context)
+    Dog.create(name="Max")
+
+    assert [dog.name for dog in context["dogs"]] == ["Rex"]
+    assert isinstance(context["dogs"], tuple)
+    assert context["count"] == 1
+    assert context["names"] == ["Rex"]
+
+
+def test_context_profile_counts_queries(fake_db):
+    profile = ContextProfile()
+    profile.enabled = True
+    profile.start("index.md")
+    fake_db.queries_count += 3
+    profile.stop("index.md")
+    profile.start("index.md")
+    fake_db.queries_count += 2
+    profile.stop("index.md")
+    profile.start("club.md")
+    profile.stop("club.md")
+
+    assert profile.queries == {"index.md": 5, "club.md": 0}
+
+
+def test_context_profile_disabled(fake_db):
+    profile = ContextProfile()
+    profile.start("index.md")
+    fake_db.queries_count += 3
+    profile.stop("index.md")
+
+    assert profile.queries == {}
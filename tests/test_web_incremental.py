@@ -0,0 +1,115 @@
+import pytest
+from mkdocs.commands.build import build
+from mkdocs.config import load_config
+from mkdocs.structure.files import File
+
+from juniorguru.web.incremental import incremental, monkey_patch
+
+
+HOOKS = """
+from juniorguru.web.incremental import incremental
+
+
+def on_pre_build(config):
+    incremental.load()
+
+
+def on_nav(nav, config, files):
+    incremental.plan(nav, config, files)
+    return nav
+
+
+def on_page_markdown(markdown, page, config, files):
+    incremental.start(page.file.src_uri)
+    incremental.stop(page.file.src_uri)
+    return markdown
+
+
+def on_post_page(output, page, config):
+    incremental.record(page.file)
+    return output
+
+
+def on_post_build(config):
+    incremental.save(config["site_dir"])
+"""
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setattr(File, "is_modified", File.is_modified)
+    monkeypatch.setattr(incremental, "enabled", True)
+    monkeypatch.setattr(incremental, "manifest_path", tmp_path / "manifest.json")
+    monkey_patch()
+
+    (tmp_path / "docs" / "handbook").mkdir(parents=True)
+    (tmp_path / "docs" / "index.md").write_text("# Home\n")
+    (tmp_path / "docs" / "about.md").write_text("# About\n")
+    (tmp_path / "docs" / "handbook" / "index.md").write_text("# Handbook\n")
+    (tmp_path / "docs" / "handbook" / "cv.md").write_text("# CV\n")
+    (tmp_path / "hooks.py").write_text(HOOKS)
+    (tmp_path / "mkdocs.yml").write_text(
+        "site_name: Test\nhooks:\n  - hooks.py\ntheme:\n  name: mkdocs\n"
+    )
+    yield tmp_path
+    incremental.reset()
+
+
+def build_project(project):
+    config = load_config(str(project / "mkdocs.yml"), site_dir=str(project / "site"))
+    build(config, dirty=True)
+    return sorted(incremental.entries)
+
+
+def test_incremental_renders_all_pages_first(project):
+    assert build_project(project) == [
+        "about.md",
+        "handbook/cv.md",
+        "handbook/index.md",
+        "index.md",
+    ]
+
+
+def test_incremental_skips_unchanged_pages(project):
+    build_project(project)
+
+    assert build_project(project) == []
+    assert (project / "site" / "about" / "index.html").is_file()
+
+
+def test_incremental_renders_changed_page(project):
+    build_project(project)
+    (project / "docs" / "about.md").write_text("# About\n\nHello!\n")
+
+    assert build_project(project) == ["about.md"]
+
+
+def test_incremental_renders_changed_page_with_its_navigation_section(project):
+    build_project(project)
+    (project / "docs" / "handbook" / "cv.md").write_text("# CV\n\n## Tips\n")
+
+    assert build_project(project) == ["handbook/cv.md", "handbook/index.md"]
+
+
+def test_incremental_renders_page_with_missing_output(project):
+    build_project(project)
+    (project / "site" / "about" / "index.html").unlink()
+
+    assert build_project(project) == ["about.md"]
+
+
+def test_incremental_removes_output_of_removed_page(project):
+    build_project(project)
+    (project / "docs" / "about.md").unlink()
+    build_project(project)
+
+    assert not (project / "site" / "about" / "index.html").exists()
+
+
+def test_incremental_keeps_titles_of_skipped_pages_in_navigation(project):
+    build_project(project)
+    (project / "docs" / "about.md").write_text("# About\n\nHello!\n")
+    build_project(project)
+    html = (project / "site" / "about" / "index.html").read_text()
+
+    assert ">CV</a>" in html